@@ -52,6 +52,10 @@ try:
     import server
     if hasattr(server, 'PromptServer') and server.PromptServer.instance and server.PromptServer.instance.loop:
         server.PromptServer.instance.loop.call_soon(_deferred_init)
+        # HTTP接口需要在ComfyUI把routes加入应用之前注册，不能放到延迟初始化中
+        if APP_CONFIG.http_api_enabled:
+            from .routes import register_routes
+            register_routes(server.PromptServer.instance)
     else:
         logger.error("[KY_monitor Node] 无法调度监控初始化: PromptServer或其循环在导入时未就绪")
 except ImportError:
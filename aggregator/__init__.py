@@ -0,0 +1,17 @@
+"""集群聚合器: 合并多个ComfyUI实例(各自运行KY_monitor)发布到Redis的状态
+
+独立运行，不依赖ComfyUI，只使用共用的 common 包: 在插件目录(custom_nodes/KY_monitor)下执行 python -m aggregator --help
+"""
+from .state import ClusterState, InstanceState
+from .consumer import RedisConsumer, decode_records
+from .publisher import ClusterPublisher
+from .server import create_app
+
+__all__ = [
+    'ClusterState',
+    'InstanceState',
+    'RedisConsumer',
+    'decode_records',
+    'ClusterPublisher',
+    'create_app'
+]
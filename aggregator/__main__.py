@@ -0,0 +1,75 @@
+import os
+import argparse
+import threading
+import logging
+
+from .state import ClusterState
+from .consumer import RedisConsumer
+from .publisher import ClusterPublisher
+from .server import create_app
+
+logger = logging.getLogger("KY_monitor_aggregator")
+
+
+def parse_args(argv=None):
+    # Redis连接参数默认与监控端使用相同的环境变量
+    env = os.environ.get
+    parser = argparse.ArgumentParser(prog="python -m aggregator", description="合并多个KY_monitor实例的状态")
+    parser.add_argument("--redis-host", default=env("KY_MONITOR_REDIS_HOST", "localhost"))
+    parser.add_argument("--redis-port", type=int, default=int(env("KY_MONITOR_REDIS_PORT", "6379")))
+    parser.add_argument("--redis-password", default=env("KY_MONITOR_REDIS_PASSWORD"))
+    parser.add_argument("--redis-db", type=int, default=int(env("KY_MONITOR_REDIS_DB", "0")))
+    parser.add_argument("--channel", action="append", default=None,
+                        help="订阅的pubsub频道，可重复；默认 KY_MONITOR_REDIS_CHANNEL_NAME 或 comfyui_monitor")
+    parser.add_argument("--stream", action="append", default=[], help="读取的Stream，可重复")
+    parser.add_argument("--stale-seconds", type=float, default=150, help="超过该时间无消息视为stale")
+    parser.add_argument("--down-seconds", type=float, default=600, help="超过该时间无消息视为down")
+    parser.add_argument("--forget-seconds", type=float, default=86400, help="超过该时间无消息从视图中移除")
+    parser.add_argument("--http-host", default="0.0.0.0")
+    parser.add_argument("--http-port", type=int, default=8190, help="HTTP端口，0 表示不提供HTTP接口")
+    parser.add_argument("--publish-channel", default=None, help="把合并状态发布到该频道，默认不发布")
+    parser.add_argument("--publish-interval", type=float, default=1.0)
+    parser.add_argument("--keyframe-seconds", type=float, default=30)
+    args = parser.parse_args(argv)
+    if args.channel is None:
+        args.channel = [] if args.stream else [env("KY_MONITOR_REDIS_CHANNEL_NAME", "comfyui_monitor")]
+    return args
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+
+    import redis
+    client = redis.Redis(host=args.redis_host, port=args.redis_port, password=args.redis_password, db=args.redis_db)
+
+    state = ClusterState(stale_seconds=args.stale_seconds, down_seconds=args.down_seconds,
+                         forget_seconds=args.forget_seconds)
+    consumer = RedisConsumer(client, state, channels=args.channel, streams=args.stream)
+    publisher = None
+    if args.publish_channel:
+        publisher = ClusterPublisher(client, state, channel=args.publish_channel,
+                                     interval=args.publish_interval, keyframe_seconds=args.keyframe_seconds)
+
+    if not args.http_port:
+        consumer.start()
+        if publisher is not None:
+            publisher.start()
+        logger.info("聚合器已启动(无HTTP接口)，按Ctrl+C退出")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if publisher is not None:
+                publisher.stop()
+            consumer.stop()
+        return
+
+    from aiohttp import web
+    logger.info(f"聚合器HTTP接口: http://{args.http_host}:{args.http_port}/cluster")
+    web.run_app(create_app(state, consumer, publisher), host=args.http_host, port=args.http_port, print=None)
+
+
+if __name__ == "__main__":
+    main()
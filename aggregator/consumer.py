@@ -0,0 +1,138 @@
+import json
+import threading
+import logging
+
+try:
+    from ..common.compression import decompress_payload
+except ImportError:
+    # python -m aggregator 时 aggregator 是顶层包，common 同样按顶层包导入
+    from common.compression import decompress_payload
+
+logger = logging.getLogger("KY_monitor_aggregator_consumer")
+
+
+def decode_records(payload):
+    """把发布的载荷(单条记录或记录列表的JSON，可能带压缩信封)解码为记录列表，无法解析时返回空列表"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8", errors="surrogateescape")
+    try:
+        payload = decompress_payload(bytes(payload))
+    except Exception as e:
+        logger.warning(f"解压载荷失败: {e}")
+        return []
+    payload = payload.decode("utf-8", errors="replace")
+    try:
+        decoded = json.loads(payload)
+    except (TypeError, ValueError):
+        return []
+    if isinstance(decoded, dict):
+        return [decoded]
+    return decoded if isinstance(decoded, list) else []
+
+
+class RedisConsumer:
+    """从各实例共用的Redis频道/Stream读取记录并应用到 ClusterState
+
+    channels 为 pubsub 频道(各实例的 redis_channel_name)，streams 为 Stream 名(redis_stream_name)，
+    两者可同时配置，每种方式一个后台线程。Stream 从启动时的最新位置开始读取，
+    实例状态在收到下一个完整快照(关键帧)后完整。client 可注入，便于用替身测试。
+    """
+
+    def __init__(self, client, state, channels=(), streams=(), block_ms=1000, batch_size=500):
+        self.client = client
+        self.state = state
+        self.channels = list(channels)
+        self.streams = list(streams)
+        self.block_ms = block_ms
+        self.batch_size = batch_size
+        self.received = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        if self.channels:
+            self._spawn(self._run_pubsub, "pubsub")
+        if self.streams:
+            self._spawn(self._run_streams, "streams")
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def stats(self) -> dict:
+        return {"received": self.received, "errors": self.errors,
+                "channels": self.channels, "streams": self.streams}
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=f"KY_aggregator-{name}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _apply(self, payload):
+        records = decode_records(payload)
+        self.received += len(records)
+        self.state.apply(records)
+
+    def _run_pubsub(self):
+        pubsub = None
+        while not self._stop.is_set():
+            try:
+                if pubsub is None:
+                    pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(*self.channels)
+                    logger.info(f"已订阅频道: {', '.join(self.channels)}")
+                message = pubsub.get_message(timeout=self.block_ms / 1000.0)
+                if message and message.get("type") == "message":
+                    self._apply(message["data"])
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"读取Redis频道失败: {e}")
+                pubsub = self._close(pubsub)
+                self._stop.wait(1.0)
+        self._close(pubsub)
+
+    def _run_streams(self):
+        last_ids = None
+        while not self._stop.is_set():
+            try:
+                if last_ids is None:
+                    last_ids = {stream: self._latest_id(stream) for stream in self.streams}
+                    logger.info(f"开始读取Stream: {', '.join(self.streams)}")
+                response = self.client.xread(last_ids, count=self.batch_size, block=self.block_ms)
+                records = []
+                for stream, entries in response or ():
+                    if isinstance(stream, bytes):
+                        stream = stream.decode()
+                    for entry_id, fields in entries:
+                        last_ids[stream] = entry_id
+                        payload = fields.get(b"data", fields.get("data"))
+                        if payload is not None:
+                            records.extend(decode_records(payload))
+                if records:
+                    # 一次读取的所有记录在同一次加锁中应用
+                    self.received += len(records)
+                    self.state.apply(records)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"读取Redis Stream失败: {e}")
+                self._stop.wait(1.0)
+
+    def _latest_id(self, stream):
+        entries = self.client.xrevrange(stream, count=1)
+        return entries[0][0] if entries else "0-0"
+
+    @staticmethod
+    def _close(pubsub):
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+        return None
+
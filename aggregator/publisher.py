@@ -0,0 +1,76 @@
+import json
+import time
+import threading
+import logging
+
+logger = logging.getLogger("KY_monitor_aggregator_publisher")
+
+
+class ClusterPublisher:
+    """把合并后的集群状态发布回Redis
+
+    每 interval 秒刷新健康状态，有变化时向 channel 发布只含变化实例的增量
+    (ky_monitor.cluster_delta)，每 keyframe_seconds 秒发布一次完整快照(ky_monitor.cluster)，
+    完整快照同时写入 <channel>:snapshot 键，新的订阅方可以先读取该键再订阅增量。
+    """
+
+    SNAPSHOT_EVENT = "ky_monitor.cluster"
+    DELTA_EVENT = "ky_monitor.cluster_delta"
+
+    def __init__(self, client, state, channel="comfyui_monitor:cluster", interval=1.0, keyframe_seconds=30):
+        self.client = client
+        self.state = state
+        self.channel = channel
+        self.interval = max(0.05, float(interval))
+        self.keyframe_seconds = keyframe_seconds
+        self.published = 0
+        self.errors = 0
+        self._published_version = None
+        self._last_keyframe_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="KY_aggregator-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def publish_once(self, now):
+        """发布一次(有变化时)，返回发布的事件名或None"""
+        self.state.refresh()
+        keyframe_due = self._last_keyframe_at is None or now - self._last_keyframe_at >= self.keyframe_seconds
+        if keyframe_due:
+            snapshot = self.state.snapshot()
+            payload = json.dumps([{"event": self.SNAPSHOT_EVENT, "data": snapshot}], ensure_ascii=False)
+            pipe = self.client.pipeline(transaction=False)
+            pipe.publish(self.channel, payload)
+            pipe.set(f"{self.channel}:snapshot", payload)
+            pipe.execute()
+            self._last_keyframe_at = now
+            self._published_version = snapshot["version"]
+            self.published += 1
+            return self.SNAPSHOT_EVENT
+        if self.state.version == self._published_version:
+            return None
+        changes = self.state.changes(self._published_version)
+        payload = json.dumps([{"event": self.DELTA_EVENT, "data": changes}], ensure_ascii=False)
+        self.client.publish(self.channel, payload)
+        self._published_version = changes["version"]
+        self.published += 1
+        return self.DELTA_EVENT
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish_once(time.monotonic())
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"发布集群状态失败: {e}")
@@ -0,0 +1,67 @@
+import json
+import logging
+
+logger = logging.getLogger("KY_monitor_aggregator_server")
+
+
+def _json_response(web, payload, status=200, headers=None):
+    return web.Response(
+        body=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+        status=status,
+        content_type="application/json",
+        headers=headers,
+    )
+
+
+def create_app(state, consumer=None, publisher=None):
+    """合并视图的HTTP接口(aiohttp应用)
+
+    - GET /cluster: 全部实例与汇总，ETag 为状态 version，未变化时返回304
+    - GET /cluster/instances/{instance_id}: 单个实例
+    - GET /health: 聚合器自身状态
+    """
+    from aiohttp import web
+
+    async def cluster(request):
+        state.refresh()
+        etag = f'W/"{state.version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        snapshot = state.snapshot()
+        return _json_response(web, snapshot, headers={"ETag": f'W/"{snapshot["version"]}"'})
+
+    async def instance(request):
+        state.refresh()
+        view = state.instance(request.match_info["instance_id"])
+        if view is None:
+            return _json_response(web, {"error": "instance not found"}, status=404)
+        return _json_response(web, view)
+
+    async def health(request):
+        payload = {"instances": len(state), "version": state.version, "unattributed": state.unattributed}
+        if consumer is not None:
+            payload["consumer"] = consumer.stats()
+        if publisher is not None:
+            payload["publisher"] = {"published": publisher.published, "errors": publisher.errors}
+        return _json_response(web, payload)
+
+    app = web.Application()
+    app.router.add_get("/cluster", cluster)
+    app.router.add_get("/cluster/instances/{instance_id}", instance)
+    app.router.add_get("/health", health)
+
+    async def on_startup(app):
+        if consumer is not None:
+            consumer.start()
+        if publisher is not None:
+            publisher.start()
+
+    async def on_cleanup(app):
+        if publisher is not None:
+            publisher.stop()
+        if consumer is not None:
+            consumer.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
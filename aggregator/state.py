@@ -0,0 +1,127 @@
+import time
+import threading
+import logging
+
+try:
+    from ..common.instance_state import InstanceState, HEALTH_UP, HEALTH_STALE, HEALTH_DOWN
+except ImportError:
+    # python -m aggregator 时 aggregator 是顶层包，common 同样按顶层包导入
+    from common.instance_state import InstanceState, HEALTH_UP, HEALTH_STALE, HEALTH_DOWN
+
+logger = logging.getLogger("KY_monitor_aggregator_state")
+
+
+class ClusterState:
+    """多个实例的合并状态
+
+    按记录中的 instance_id 分发到各实例，没有 instance_id 的记录被忽略。
+    每次有实例状态或健康状态变化 version 加一，snapshot() 只重新生成变化过的实例条目；
+    changes(since) 返回某个 version 之后变化的实例，供增量转发。
+    健康状态按最后一次收到记录的时间判断: 超过 stale_seconds 为 stale，超过 down_seconds 为 down，
+    超过 forget_seconds 后从视图中移除。
+    """
+
+    def __init__(self, stale_seconds=150, down_seconds=600, forget_seconds=86400, clock=time.time):
+        self.stale_seconds = stale_seconds
+        self.down_seconds = max(down_seconds, stale_seconds)
+        self.forget_seconds = max(forget_seconds, self.down_seconds)
+        self._clock = clock
+        self.instances = {}
+        self.version = 0
+        self.unattributed = 0
+        # 已移除的实例 -> 移除时的 version
+        self._removed = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.instances)
+
+    def apply(self, records) -> int:
+        """应用一批记录，返回状态发生变化的记录数"""
+        changed = 0
+        now = self._clock()
+        with self._lock:
+            for record in records:
+                if not isinstance(record, dict):
+                    continue
+                instance_id = record.get("instance_id")
+                if instance_id is None:
+                    self.unattributed += 1
+                    continue
+                instance = self.instances.get(instance_id)
+                if instance is None:
+                    instance = self.instances[instance_id] = InstanceState(instance_id)
+                    self._removed.pop(instance_id, None)
+                    logger.info(f"发现新实例: {instance_id}")
+                if instance.apply(record, now) or instance.health != HEALTH_UP:
+                    instance.health = HEALTH_UP
+                    self._touch(instance)
+                    changed += 1
+        return changed
+
+    def refresh(self) -> bool:
+        """按当前时间重新判断各实例健康状态，返回是否有变化"""
+        now = self._clock()
+        changed = False
+        with self._lock:
+            for instance_id, instance in list(self.instances.items()):
+                if now - instance.last_seen > self.forget_seconds:
+                    del self.instances[instance_id]
+                    self.version += 1
+                    self._removed[instance_id] = self.version
+                    changed = True
+                    logger.info(f"实例 {instance_id} 长时间无消息，已移除")
+                    continue
+                health = instance.health_at(now, self.stale_seconds, self.down_seconds)
+                if health != instance.health:
+                    if health != HEALTH_UP:
+                        logger.warning(f"实例 {instance_id} 健康状态变为 {health}")
+                    instance.health = health
+                    self._touch(instance)
+                    changed = True
+        return changed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            views = {instance_id: instance.view() for instance_id, instance in self.instances.items()}
+            version = self.version
+        return {
+            "version": version,
+            "generated_at": self._clock(),
+            "totals": self._totals(views.values()),
+            "instances": views,
+        }
+
+    def instance(self, instance_id):
+        with self._lock:
+            instance = self.instances.get(instance_id)
+            return instance.view() if instance is not None else None
+
+    def changes(self, since) -> dict:
+        """since 之后变化的实例条目与被移除的实例ID"""
+        with self._lock:
+            views = {instance_id: instance.view() for instance_id, instance in self.instances.items()
+                     if instance.version > since}
+            removed = [instance_id for instance_id, version in self._removed.items() if version > since]
+            version = self.version
+            totals = self._totals([instance.view() for instance in self.instances.values()])
+        return {"version": version, "since": since, "totals": totals, "instances": views, "removed": removed}
+
+    def _touch(self, instance):
+        self.version += 1
+        instance.version = self.version
+        instance._view = None
+
+    @staticmethod
+    def _totals(views) -> dict:
+        totals = {"instances": 0, HEALTH_UP: 0, HEALTH_STALE: 0, HEALTH_DOWN: 0,
+                  "running": 0, "waiting": 0, "queue_depth": 0}
+        for view in views:
+            totals["instances"] += 1
+            totals[view["health"]] += 1
+            if view["health"] == HEALTH_DOWN:
+                continue
+            totals["running"] += view["running_count"]
+            totals["waiting"] += view["waiting_count"]
+            totals["queue_depth"] += view["queue_depth"]
+        return totals
@@ -0,0 +1,21 @@
+"""在ComfyUI之外加载本包，供基准脚本使用
+
+包在ComfyUI中以 custom_nodes/<目录名> 的形式加载，目录名不固定；这里把仓库根目录
+注册为 KY_monitor 包但不执行其 __init__.py(那里会调度监控启动)，子模块照常导入。
+"""
+import os
+import sys
+import types
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "KY_monitor"
+
+
+def load_package():
+    package = sys.modules.get(PACKAGE_NAME)
+    if package is None:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [REPO_ROOT]
+        package.__package__ = PACKAGE_NAME
+        sys.modules[PACKAGE_NAME] = package
+    return package
@@ -0,0 +1,54 @@
+"""载荷压缩基准: 各算法/级别在典型 success 记录上的压缩耗时、解压耗时与节省的字节数
+
+用法: python benchmarks/bench_compression.py [--nodes 100,300,1000] [--number 50]
+zstd 需要 Python 3.14+ 或 zstandard 库，未安装时跳过。
+"""
+import argparse
+import json
+import timeit
+
+from _bootstrap import load_package
+from bench_encoding import build_success_payload
+
+load_package()
+from KY_monitor.notifications.compression import PayloadCompressor, codec_available, decompress_payload  # noqa: E402
+
+CASES = (
+    ("zlib", 1), ("zlib", -1), ("zlib", 9),
+    ("gzip", 1), ("gzip", -1),
+    ("zstd", 1), ("zstd", -1), ("zstd", 9),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", default="100,300,1000", help="逗号分隔的工作流节点数")
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    for nodes in [int(n) for n in args.nodes.split(",")]:
+        data = json.dumps(build_success_payload(nodes), ensure_ascii=False).encode("utf-8")
+        print(f"\npayload: {nodes} nodes, {len(data) / 1024:.1f} KB")
+        print(f"{'codec':<12}{'bytes':>10}{'saved':>9}{'compress':>14}{'decompress':>14}{'MB/s':>9}")
+        for codec, level in CASES:
+            label = codec + " " + ("default" if level < 0 else str(level))
+            if not codec_available(codec):
+                print(f"{label:<12}{'not installed':>14}")
+                continue
+            compressor = PayloadCompressor(codec, threshold=0, level=level)
+            compressed = compressor.compress(data)
+            assert decompress_payload(compressed) == data
+            compress_time = timeit.timeit(lambda: compressor.compress(data), number=args.number) / args.number
+            decompress_time = timeit.timeit(lambda: decompress_payload(compressed), number=args.number) / args.number
+            print(
+                f"{label:<12}"
+                f"{len(compressed):>10}"
+                f"{1 - len(compressed) / len(data):>9.1%}"
+                f"{compress_time * 1e3:>11.3f} ms"
+                f"{decompress_time * 1e3:>11.3f} ms"
+                f"{len(data) / compress_time / 1e6:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
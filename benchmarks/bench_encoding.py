@@ -0,0 +1,79 @@
+"""序列化基准: 每个渠道各自 json.dumps 与只序列化一次(各JSON后端)的对比
+
+用法: python benchmarks/bench_encoding.py [--nodes 300] [--channels 2] [--number 200]
+"""
+import argparse
+import json
+import timeit
+
+from _bootstrap import load_package
+
+load_package()
+from KY_monitor.notifications.encoding import PayloadEncoder, load_json_backend  # noqa: E402
+
+
+def build_success_payload(nodes=300, images=8):
+    """构造接近真实的 success 记录: 完整prompt图、全部outputs与messages"""
+    prompt_graph = {}
+    for i in range(nodes):
+        prompt_graph[str(i)] = {
+            "class_type": "KSampler" if i % 10 == 0 else "CLIPTextEncode",
+            "inputs": {
+                "seed": 123456789 + i,
+                "steps": 30,
+                "cfg": 7.5,
+                "sampler_name": "dpmpp_2m",
+                "scheduler": "karras",
+                "text": "a highly detailed photograph of a mountain lake at sunrise, " * 3,
+                "model": [str(max(0, i - 1)), 0],
+            },
+            "_meta": {"title": f"Node {i}"},
+        }
+    outputs = {
+        str(i): {"images": [{"filename": f"ComfyUI_{i:05d}_{j}.png", "subfolder": "", "type": "output"} for j in range(images)]}
+        for i in range(0, nodes, 25)
+    }
+    messages = [
+        ["execution_start", {"prompt_id": "bench", "timestamp": 1700000000000}],
+        ["execution_cached", {"nodes": [str(i) for i in range(nodes // 3)], "prompt_id": "bench", "timestamp": 1700000000001}],
+        ["execution_success", {"prompt_id": "bench", "timestamp": 1700000060000}],
+    ]
+    info = {"prompt_id": "bench", "status": "success", "outputs": outputs, "messages": messages, "prompts": [0, "bench", prompt_graph, {}, []]}
+    data = {
+        "queue_status": {"running": 1, "waiting": 40, "completed": 1000},
+        "prompts": [{"prompt_id": "bench", "status": "success", "info": info}]
+        + [{"prompt_id": f"w{i}", "position": i, "client_id": "c", "status": "waiting"} for i in range(40)],
+    }
+    return [{"event": "ky_monitor.queue", "data": data}]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=300)
+    parser.add_argument("--channels", type=int, default=2, help="需要字节载荷的渠道数(Redis/RocketMQ)")
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    payload = build_success_payload(args.nodes)
+    size = len(json.dumps(payload).encode("utf-8"))
+    print(f"payload: {args.nodes} nodes, {size / 1024:.1f} KB, {args.channels} byte channels, {args.number} broadcasts")
+
+    def per_channel_dumps():
+        for _ in range(args.channels):
+            json.dumps(payload)
+
+    baseline = timeit.timeit(per_channel_dumps, number=args.number) / args.number
+    print(f"{'per-channel json.dumps':<28}{baseline * 1e3:>10.3f} ms/broadcast  1.00x")
+
+    for backend in ("json", "orjson", "msgspec"):
+        name, _ = load_json_backend(backend)
+        if name != backend:
+            print(f"{'encode once (' + backend + ')':<28}{'not installed':>10}")
+            continue
+        encoder = PayloadEncoder(backend)
+        elapsed = timeit.timeit(lambda: encoder.encode(payload), number=args.number) / args.number
+        print(f"{'encode once (' + backend + ')':<28}{elapsed * 1e3:>10.3f} ms/broadcast  {baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
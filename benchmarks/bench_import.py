@@ -0,0 +1,92 @@
+"""冷启动导入基准: 用 python -X importtime 测量导入 monitor_logic 的耗时，以及是否加载了Broker客户端库
+
+在全新子进程中导入，server/execution 用空的占位模块代替(它们在ComfyUI中早已加载，不计入成本)，
+所有渠道保持默认配置(Redis/RocketMQ 关闭)。
+
+用法:
+    python benchmarks/bench_import.py                    # 测量当前工作区
+    python benchmarks/bench_import.py --baseline HEAD~1  # 同时测量某个git版本作为对照
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from _bootstrap import REPO_ROOT, PACKAGE_NAME
+
+BROKER_MODULES = ("redis", "rocketmq", "rocketmq_client")
+
+_CHILD = r"""
+import json, sys, types
+server = types.ModuleType("server")
+class PromptServer:
+    instance = None
+server.PromptServer = PromptServer
+sys.modules["server"] = server
+sys.modules["execution"] = types.ModuleType("execution")
+package = types.ModuleType({name!r})
+package.__path__ = [{root!r}]
+sys.modules[{name!r}] = package
+result = {{"error": None}}
+try:
+    import {name}.monitor_logic
+except Exception as e:
+    result["error"] = f"{{type(e).__name__}}: {{e}}"
+result["brokers"] = [m for m in {brokers!r} if m in sys.modules]
+print(json.dumps(result))
+"""
+
+
+def measure(root, runs):
+    code = _CHILD.format(name=PACKAGE_NAME, root=root, brokers=BROKER_MODULES)
+    env = dict(os.environ, KY_MONITOR_REDIS_ENABLED="false", KY_MONITOR_ROCKETMQ_ENABLED="false")
+    samples, result = [], None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              capture_output=True, text=True, env=env, cwd=tempfile.gettempdir())
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        # importtime 行格式: "import time: self [us] | cumulative | imported package"
+        total = 0
+        for line in proc.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if not name.startswith(" "):
+                continue
+            # 只累加顶层导入(名称前无额外缩进)
+            if name[1:2] != " ":
+                total += int(cumulative)
+        samples.append(total)
+    return statistics.median(samples), result
+
+
+def export_revision(rev, target):
+    archive = subprocess.run(["git", "-C", REPO_ROOT, "archive", rev], capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", target], input=archive.stdout, check=True)
+
+
+def report(label, median_us, result):
+    status = result["error"] or "ok"
+    brokers = ", ".join(result["brokers"]) or "-"
+    print(f"{label:<24}{median_us / 1000:>10.1f} ms   brokers loaded: {brokers:<24} {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", help="作为对照的git版本，例如 HEAD~1")
+    args = parser.parse_args()
+
+    print(f"{'tree':<24}{'median':>10}      (python -X importtime, {args.runs} runs, channels disabled)")
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_revision(args.baseline, tmp)
+            report(args.baseline, *measure(tmp, args.runs))
+    report("working tree", *measure(REPO_ROOT, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""get_queue_status 与广播路径的离线基准
+
+使用 fake_comfy 中的 PromptServer/PromptQueue 替身生成 N 个等待prompt、M 个节点的工作流和 H 条历史，
+逐 tick 推进执行节点并周期性完成prompt，记录:
+  - get_queue_status 与整个 tick(构建+裁剪+编码+发送) 的耗时分位数
+  - 每 tick 的内存分配峰值(tracemalloc，单独一轮以免影响计时)
+  - 序列化后的载荷大小
+结果写为JSON，可用 --compare 与之前的结果逐项对比。
+
+用法:
+    python benchmarks/bench_queue_status.py --output results/HEAD.json
+    python benchmarks/bench_queue_status.py --case 500,300,10000 --compare results/HEAD.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from _bootstrap import REPO_ROOT, load_package
+import fake_comfy
+
+# 基准在配置加载前固定发送路径: 同步发送到计数渠道，不启用PromptServer渠道
+os.environ.setdefault("KY_MONITOR_DISPATCH_ASYNC", "false")
+os.environ.setdefault("KY_MONITOR_PROMPT_SERVER_ENABLED", "false")
+os.environ.setdefault("KY_MONITOR_REDIS_ENABLED", "false")
+os.environ.setdefault("KY_MONITOR_ROCKETMQ_ENABLED", "false")
+
+DEFAULT_CASES = ["10,50,100", "100,200,1000", "500,500,10000"]
+
+
+class CountingChannel:
+    """只做序列化并记录字节数的渠道"""
+
+    def __init__(self):
+        self.sizes = []
+
+    def send(self, info_data_list):
+        from KY_monitor.notifications.encoding import encode_payload
+        self.sizes.append(len(encode_payload(info_data_list)))
+
+    def is_enabled(self):
+        return True
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "p50": round(pick(0.50), 4),
+        "p95": round(pick(0.95), 4),
+        "p99": round(pick(0.99), 4),
+        "max": round(ordered[-1], 4),
+        "mean": round(statistics.fmean(ordered), 4),
+    }
+
+
+def make_monitor(monitor_logic, manager, pending, nodes, history):
+    loop = asyncio.new_event_loop()
+    prompt_server = fake_comfy.FakePromptServer(loop)
+    fake_comfy.install_fake_modules(prompt_server)
+    prompt = fake_comfy.populate(prompt_server, pending=pending, nodes=nodes, history=history)
+    channel = CountingChannel()
+    manager.ACTIVE_CHANNELS = [channel]
+    monitor = monitor_logic.ComfyMonitor(loop=loop, rate=5)
+    # 历史中已有的记录视为启动前完成，不计入tick
+    monitor.history_cursor.seek_end(prompt_server.prompt_queue)
+    return loop, prompt_server, prompt, channel, monitor
+
+
+def advance(prompt_server, prompt, tick, nodes, complete_every):
+    """推进一个tick: 切换当前执行节点，每 complete_every 个tick完成一个prompt并追加一个新prompt"""
+    queue = prompt_server.prompt_queue
+    prompt_server.last_node_id = str(tick % nodes)
+    if complete_every and tick % complete_every == complete_every - 1:
+        running = next(iter(queue.currently_running.values()), None)
+        if running is not None:
+            queue.task_done(running[1], fake_comfy.make_history_item(running[1], prompt))
+        extra_data = dict(running[3]) if running is not None else {}
+        queue.put((queue.task_counter, f"n{tick}", prompt, extra_data, ["9"]))
+        queue.start_next()
+
+
+def run_case(monitor_logic, manager, pending, nodes, history, ticks, complete_every):
+    # 计时轮
+    loop, prompt_server, prompt, channel, monitor = make_monitor(monitor_logic, manager, pending, nodes, history)
+    build_times = []
+    original_get_queue_status = monitor.get_queue_status
+
+    def timed_get_queue_status():
+        started = time.perf_counter()
+        result = original_get_queue_status()
+        build_times.append((time.perf_counter() - started) * 1000)
+        return result
+    monitor.get_queue_status = timed_get_queue_status
+
+    tick_times = []
+    for tick in range(ticks):
+        advance(prompt_server, prompt, tick, nodes, complete_every)
+        started = time.perf_counter()
+        loop.run_until_complete(monitor.publish_status())
+        tick_times.append((time.perf_counter() - started) * 1000)
+    payload_sizes = list(channel.sizes)
+    loop.close()
+
+    # 内存分配轮
+    loop, prompt_server, prompt, channel, monitor = make_monitor(monitor_logic, manager, pending, nodes, history)
+    peaks = []
+    tracemalloc.start()
+    for tick in range(ticks):
+        advance(prompt_server, prompt, tick, nodes, complete_every)
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        loop.run_until_complete(monitor.publish_status())
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append((peak - baseline) / 1024)
+    tracemalloc.stop()
+    loop.close()
+
+    return {
+        "params": {"pending": pending, "nodes": nodes, "history": history, "ticks": ticks, "complete_every": complete_every},
+        "get_queue_status_ms": percentiles(build_times),
+        "tick_ms": percentiles(tick_times),
+        "alloc_peak_kb": percentiles(peaks),
+        "payload_bytes": percentiles(payload_sizes) if payload_sizes else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "-C", REPO_ROOT, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current, previous):
+    print(f"\n{'case / metric':<48}{'previous':>12}{'current':>12}{'change':>10}")
+    for case, result in current["cases"].items():
+        old = previous.get("cases", {}).get(case)
+        if not old:
+            continue
+        for metric in ("get_queue_status_ms", "tick_ms", "alloc_peak_kb", "payload_bytes"):
+            for stat in ("p50", "p95"):
+                new_value = (result.get(metric) or {}).get(stat)
+                old_value = (old.get(metric) or {}).get(stat)
+                if new_value is None or not old_value:
+                    continue
+                change = (new_value - old_value) / old_value * 100
+                print(f"{case + ' ' + metric + '.' + stat:<48}{old_value:>12.3f}{new_value:>12.3f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--case", action="append", help="pending,nodes,history，可重复；默认三档")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--complete-every", type=int, default=5)
+    parser.add_argument("--output", help="结果JSON路径")
+    parser.add_argument("--compare", help="与之前保存的结果JSON对比")
+    args = parser.parse_args()
+
+    load_package()
+    fake_comfy.install_fake_modules()
+    from KY_monitor import monitor_logic
+    from KY_monitor.notifications import manager
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "cases": {},
+    }
+    print(f"{'case (pending,nodes,history)':<30}{'build p50/p95 ms':>20}{'tick p50/p95 ms':>20}{'alloc p50 KB':>14}{'payload p50 B':>15}")
+    for case in args.case or DEFAULT_CASES:
+        pending, nodes, history = (int(v) for v in case.split(","))
+        result = run_case(monitor_logic, manager, pending, nodes, history, args.ticks, args.complete_every)
+        results["cases"][case] = result
+        payload = (result["payload_bytes"] or {}).get("p50", 0)
+        print(f"{case:<30}"
+              f"{result['get_queue_status_ms']['p50']:>11.3f}/{result['get_queue_status_ms']['p95']:<8.3f}"
+              f"{result['tick_ms']['p50']:>11.3f}/{result['tick_ms']['p95']:<8.3f}"
+              f"{result['alloc_peak_kb']['p50']:>14.1f}{payload:>15.0f}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n结果已写入 {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""ComfyUI PromptServer/PromptQueue 的离线替身，数据结构与 ComfyUI 的 execution.PromptQueue 保持一致
+
+队列条目为 (number, prompt_id, prompt, extra_data, outputs_to_execute)，
+history 为按完成顺序插入的 {prompt_id: {"prompt", "outputs", "status"}}。
+"""
+import copy
+import sys
+import threading
+import types
+
+
+def make_workflow(nodes):
+    """生成包含 nodes 个节点的 prompt 图与 extra_pnginfo.workflow"""
+    prompt = {}
+    workflow_nodes = []
+    for i in range(nodes):
+        class_type = "KSampler" if i % 10 == 5 else ("VAEDecode" if i % 10 == 6 else "CLIPTextEncode")
+        prompt[str(i)] = {
+            "class_type": class_type,
+            "inputs": {"seed": i, "steps": 20, "cfg": 7.0, "text": "a photo of a cat, highly detailed", "clip": [str(max(0, i - 1)), 0]},
+        }
+        workflow_nodes.append({"id": i, "type": class_type, "order": i, "mode": 0, "inputs": [], "outputs": []})
+    return prompt, {"workflow": {"nodes": workflow_nodes, "links": [], "version": 0.4}}
+
+
+def make_history_item(prompt_id, prompt, status="success", images=4, timestamp=1700000000000):
+    messages = [["execution_start", {"prompt_id": prompt_id, "timestamp": timestamp}]]
+    if status == "error":
+        messages.append(["execution_error", {
+            "prompt_id": prompt_id, "node_id": "5", "node_type": "KSampler",
+            "exception_type": "RuntimeError", "exception_message": "CUDA out of memory",
+            "traceback": ["  File \"execution.py\", line 151, in recursive_execute\n", "  File \"nodes.py\", line 1206, in sample\n"],
+            "timestamp": timestamp + 5000,
+        }])
+    else:
+        messages.append(["execution_success", {"prompt_id": prompt_id, "timestamp": timestamp + 30000}])
+    outputs = {"9": {"images": [{"filename": f"{prompt_id}_{i:05d}.png", "subfolder": "", "type": "output"} for i in range(images)]}}
+    return {
+        "prompt": [0, prompt_id, prompt, {}, ["9"]],
+        "outputs": outputs if status == "success" else {},
+        "status": {"status_str": status, "completed": status == "success", "messages": messages},
+    }
+
+
+class FakePromptQueue:
+    def __init__(self):
+        self.mutex = threading.RLock()
+        self.queue = []
+        self.currently_running = {}
+        self.history = {}
+        self.task_counter = 0
+
+    def put(self, item):
+        with self.mutex:
+            self.queue.append(item)
+            self.task_counter += 1
+
+    def get_current_queue(self):
+        with self.mutex:
+            running = [copy.copy(item) for item in self.currently_running.values()]
+            return running, copy.copy(self.queue)
+
+    def start_next(self):
+        """把队首移入 currently_running，返回其 prompt_id"""
+        with self.mutex:
+            if not self.queue:
+                return None
+            item = self.queue.pop(0)
+            self.currently_running[item[0]] = item
+            return item[1]
+
+    def task_done(self, prompt_id, history_item, max_history=10000):
+        with self.mutex:
+            for number, item in list(self.currently_running.items()):
+                if item[1] == prompt_id:
+                    del self.currently_running[number]
+            if len(self.history) >= max_history:
+                self.history.pop(next(iter(self.history)))
+            self.history[prompt_id] = history_item
+
+
+class FakePromptServer:
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.prompt_queue = FakePromptQueue()
+        self.last_node_id = None
+        self.client_id = None
+        self.sent_events = 0
+
+    def send_sync(self, event, data, sid=None):
+        self.sent_events += 1
+
+
+def install_fake_modules(prompt_server=None):
+    """注册假的 server/execution 模块，须在导入 monitor_logic 之前调用"""
+    server = sys.modules.get("server")
+    if server is None or not hasattr(server, "PromptServer"):
+        server = types.ModuleType("server")
+
+        class PromptServer:
+            instance = None
+        server.PromptServer = PromptServer
+        sys.modules["server"] = server
+    sys.modules.setdefault("execution", types.ModuleType("execution"))
+    if prompt_server is not None:
+        server.PromptServer.instance = prompt_server
+    return server
+
+
+def populate(prompt_server, pending=100, nodes=100, history=1000, clients=10):
+    """生成1个运行中prompt、pending个等待prompt和history条历史记录"""
+    queue = prompt_server.prompt_queue
+    prompt, extra_pnginfo = make_workflow(nodes)
+    for i in range(history):
+        prompt_id = f"h{i}"
+        queue.history[prompt_id] = make_history_item(prompt_id, prompt, "error" if i % 20 == 0 else "success")
+    for i in range(pending + 1):
+        extra_data = {"client_id": f"client{i % clients}", "extra_pnginfo": extra_pnginfo}
+        queue.put((queue.task_counter, f"p{i}", prompt, extra_data, ["9"]))
+    queue.start_next()
+    prompt_server.last_node_id = "0"
+    return prompt
@@ -0,0 +1,17 @@
+"""监控端(notifications)与独立运行的集群聚合器(aggregator)共用的模块
+
+只依赖标准库，且不导入本包的其他模块: 聚合器以 python -m aggregator 运行时按顶层包 common 导入。
+"""
+from .instance_state import InstanceState, HEALTH_UP, HEALTH_STALE, HEALTH_DOWN, SELF_REPORT_EVENT
+from .compression import CODECS, codec_available, decompress_payload
+
+__all__ = [
+    'InstanceState',
+    'HEALTH_UP',
+    'HEALTH_STALE',
+    'HEALTH_DOWN',
+    'SELF_REPORT_EVENT',
+    'CODECS',
+    'codec_available',
+    'decompress_payload'
+]
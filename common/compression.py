@@ -0,0 +1,62 @@
+import gzip
+import zlib
+
+# 压缩后的载荷: 信封头 b"KYZ:<codec>\n" + 压缩数据；未压缩的载荷仍是以 [ 或 { 开头的JSON，
+# 消费方检查前缀即可区分，见 decompress_payload()
+ENVELOPE_PREFIX = b"KYZ:"
+ENVELOPE_END = b"\n"
+
+CODECS = ("zlib", "gzip", "zstd")
+
+
+def _load_zstd():
+    """返回 (compress(data, level), decompress(data))，zstd 不可用时抛出 ImportError"""
+    try:
+        # Python 3.14+ 标准库
+        from compression import zstd
+
+        def compress(data, level):
+            return zstd.compress(data, level=None if level < 0 else level)
+        return compress, zstd.decompress
+    except ImportError:
+        pass
+    import zstandard
+    decompressor = zstandard.ZstdDecompressor()
+
+    def compress(data, level):
+        return zstandard.ZstdCompressor(level=3 if level < 0 else level).compress(data)
+    return compress, decompressor.decompress
+
+
+def codec_functions(codec):
+    """返回 (compress(data, level), decompress(data))；未知算法抛出 ValueError，zstd 不可用时抛出 ImportError"""
+    if codec == "zlib":
+        return (lambda data, level: zlib.compress(data, level)), zlib.decompress
+    if codec == "gzip":
+        # mtime 固定为0，相同输入得到相同输出
+        return (lambda data, level: gzip.compress(data, 6 if level < 0 else level, mtime=0)), gzip.decompress
+    if codec == "zstd":
+        return _load_zstd()
+    raise ValueError(f"未知的压缩算法: {codec}")
+
+
+def codec_available(codec) -> bool:
+    try:
+        codec_functions(codec)
+    except (ImportError, ValueError):
+        return False
+    return True
+
+
+def envelope_header(codec) -> bytes:
+    return ENVELOPE_PREFIX + codec.encode("ascii") + ENVELOPE_END
+
+
+def decompress_payload(payload: bytes) -> bytes:
+    """消费方使用: 去掉信封头并解压，未压缩的载荷原样返回"""
+    if not payload.startswith(ENVELOPE_PREFIX):
+        return payload
+    end = payload.index(ENVELOPE_END, len(ENVELOPE_PREFIX))
+    codec = payload[len(ENVELOPE_PREFIX):end].decode("ascii")
+    _, decompress_function = codec_functions(codec)
+    return decompress_function(payload[end + 1:])
@@ -0,0 +1,133 @@
+HEALTH_UP = "up"
+HEALTH_STALE = "stale"
+HEALTH_DOWN = "down"
+
+SELF_REPORT_EVENT = "ky_monitor.self_report"
+
+
+class InstanceState:
+    """单个ComfyUI实例的状态，由该实例发布的记录增量更新"""
+
+    def __init__(self, instance_id):
+        self.instance_id = instance_id
+        self.queue_status = {}
+        self.prompts = {}
+        self.report = None
+        self.last_seen = None
+        self.seq = None
+        # 增量记录出现 seq 断档后为False，直到收到下一个完整快照
+        self.synced = False
+        self.gaps = 0
+        self.health = None
+        self.version = 0
+        self._view = None
+
+    def apply(self, record, now) -> bool:
+        """应用一条记录，返回状态是否变化"""
+        self.last_seen = now
+        changed = self._apply(record)
+        if changed:
+            self._view = None
+        return changed
+
+    def _apply(self, record):
+        data = record.get("data")
+        if not isinstance(data, dict):
+            return False
+        if record.get("event") == SELF_REPORT_EVENT:
+            self.report = data
+            return True
+        if isinstance(data.get("prompts"), list):
+            self.prompts = {p.get("prompt_id"): p for p in data["prompts"] if isinstance(p, dict)}
+            self.queue_status = data.get("queue_status") or {}
+            self.seq = data.get("seq")
+            self.synced = True
+            return True
+        if "op" in data:
+            return self._apply_delta(data)
+        if isinstance(data.get("queue_status"), dict):
+            # per_client 投递时的共享队列摘要
+            self.queue_status = data["queue_status"]
+            return True
+        return False
+
+    def _apply_delta(self, data):
+        seq = data.get("seq")
+        if seq is not None:
+            if self.seq is not None and seq != self.seq + 1:
+                self.gaps += 1
+                self.synced = False
+            self.seq = seq
+        op = data.get("op")
+        prompt_id = data.get("prompt_id")
+        if op == "queue_status":
+            self.queue_status = data.get("queue_status") or {}
+        elif op == "removed":
+            self.prompts.pop(prompt_id, None)
+        elif op == "progress":
+            prompt = self.prompts.get(prompt_id)
+            if prompt is None:
+                return False
+            self.prompts[prompt_id] = dict(prompt, progress=data.get("progress"))
+        elif isinstance(data.get("prompt"), dict):
+            self.prompts[prompt_id] = data["prompt"]
+        else:
+            return False
+        return True
+
+    def health_at(self, now, stale_seconds, down_seconds):
+        age = now - self.last_seen
+        if age > down_seconds:
+            return HEALTH_DOWN
+        if age > stale_seconds:
+            return HEALTH_STALE
+        return HEALTH_UP
+
+    def view(self) -> dict:
+        """合并视图中的实例条目，状态未变化时复用上次的结果"""
+        if self._view is not None:
+            return self._view
+        running = []
+        waiting = 0
+        idle_at = None
+        for prompt in self.prompts.values():
+            status = prompt.get("status")
+            if status == "running":
+                progress = prompt.get("progress") or {}
+                running.append({
+                    "prompt_id": prompt.get("prompt_id"),
+                    "client_id": prompt.get("client_id"),
+                    "percentage": progress.get("percentage"),
+                    "eta_seconds": progress.get("eta_seconds"),
+                    "estimated_finish_at": progress.get("estimated_finish_at"),
+                })
+                finish_at = progress.get("estimated_finish_at")
+            elif status == "waiting":
+                waiting += 1
+                finish_at = prompt.get("predicted_finish_at")
+            else:
+                continue
+            if finish_at is not None and (idle_at is None or finish_at > idle_at):
+                idle_at = finish_at
+
+        queue_status = self.queue_status
+        running_count = queue_status.get("running", len(running))
+        waiting_count = queue_status.get("waiting", waiting)
+        view = {
+            "instance_id": self.instance_id,
+            "health": self.health,
+            "last_seen": self.last_seen,
+            "synced": self.synced,
+            "seq_gaps": self.gaps,
+            "queue_depth": running_count + waiting_count,
+            "running_count": running_count,
+            "waiting_count": waiting_count,
+            "completed": queue_status.get("completed"),
+            "running": running,
+            "estimated_idle_at": idle_at,
+        }
+        if self.report is not None:
+            view["uptime_seconds"] = self.report.get("uptime_seconds")
+            view["channel_errors"] = self.report.get("channel_errors")
+        self._view = view
+        return view
@@ -41,16 +41,81 @@ class Config:
 
         # 默认值
         self.frequency_seconds = self._get_config("KY_MONITOR_FREQUENCY_SECONDS", "frequency_seconds", 5)
-        self.history_max_items = self._get_config("KY_MONITOR_HISTORY_MAX_ITEMS", "history_max_items", 100)
+        self.history_max_items = self._get_int_config("KY_MONITOR_HISTORY_MAX_ITEMS", "history_max_items", 100)
+        # 完成通知去重表的容量与保留时间(秒)
+        self.dedup_capacity = self._get_int_config("KY_MONITOR_DEDUP_CAPACITY", "dedup_capacity", 10000)
+        self.dedup_ttl_seconds = self._get_int_config("KY_MONITOR_DEDUP_TTL_SECONDS", "dedup_ttl_seconds", 3600)
+
+        # 监控模式: event(挂钩PromptServer事件，状态变化时发布) / poll(按frequency_seconds定时轮询)
+        self.monitor_mode = str(self._get_config("KY_MONITOR_MODE", "mode", "event")).lower()
+        # 事件模式下两次发布之间的最小间隔(毫秒)，用于合并高频的progress事件
+        self.event_min_interval_ms = self._get_int_config("KY_MONITOR_EVENT_MIN_INTERVAL_MS", "event_min_interval_ms", 200)
+
+        # 按节点类型统计执行耗时(依赖PromptServer事件，轮询模式下也会挂钩send_sync)
+        self.node_timing_enabled = self._get_bool_config("KY_MONITOR_NODE_TIMING_ENABLED", "node_timing_enabled", True)
+
+        # 按工作流指纹学习执行耗时，为等待中的prompt预测开始/完成时间
+        self.wait_prediction_enabled = self._get_bool_config("KY_MONITOR_WAIT_PREDICTION_ENABLED", "wait_prediction_enabled", True)
+
+        # 任务生命周期持久化(SQLite WAL)，由后台线程批量写入
+        self.history_store_enabled = self._get_bool_config("KY_MONITOR_HISTORY_STORE_ENABLED", ["history_store", "enabled"], False)
+        self.history_store_path = self._get_config(
+            "KY_MONITOR_HISTORY_STORE_PATH", ["history_store", "path"],
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ky_monitor_history.db"),
+        )
+        self.history_store_batch_size = self._get_int_config("KY_MONITOR_HISTORY_STORE_BATCH_SIZE", ["history_store", "batch_size"], 100)
+        self.history_store_flush_ms = self._get_int_config("KY_MONITOR_HISTORY_STORE_FLUSH_MS", ["history_store", "flush_ms"], 500)
+        self.history_store_retention_days = self._get_int_config("KY_MONITOR_HISTORY_STORE_RETENTION_DAYS", ["history_store", "retention_days"], 30)
+
+        # 自身指标(ky_monitor.self_report 事件)上报间隔(秒)，0 表示关闭
+        self.self_report_seconds = self._get_int_config("KY_MONITOR_SELF_REPORT_SECONDS", "self_report_seconds", 60)
+
+        # 轮询模式自适应调度: 有任务时按 poll_active_seconds 轮询，空闲时从 frequency_seconds 指数退避到 poll_idle_max_seconds
+        self.adaptive_polling = self._get_bool_config("KY_MONITOR_ADAPTIVE_POLLING", "adaptive_polling", True)
+        self.poll_active_seconds = self._get_float_config("KY_MONITOR_POLL_ACTIVE_SECONDS", "poll_active_seconds", 1.0)
+        self.poll_idle_max_seconds = self._get_float_config("KY_MONITOR_POLL_IDLE_MAX_SECONDS", "poll_idle_max_seconds", 30.0)
+        self.poll_backoff = self._get_float_config("KY_MONITOR_POLL_BACKOFF", "poll_backoff", 2.0)
+
+        # 发布方式: full(每次发送完整快照) / delta(只发送变化，并周期性发送完整关键帧)
+        self.publish_mode = str(self._get_config("KY_MONITOR_PUBLISH_MODE", "publish_mode", "full")).lower()
+        self.keyframe_seconds = self._get_int_config("KY_MONITOR_KEYFRAME_SECONDS", "keyframe_seconds", 30)
+
+        # 渠道发送管道: 每个渠道一个有界队列和工作线程，避免阻塞ComfyUI事件循环
+        self.dispatch_async = self._get_bool_config("KY_MONITOR_DISPATCH_ASYNC", "dispatch_async", True)
+        self.dispatch_queue_size = self._get_int_config("KY_MONITOR_DISPATCH_QUEUE_SIZE", "dispatch_queue_size", 1000)
+        # 序列化后端: auto(优先orjson、msgspec，均未安装时使用标准库) / orjson / msgspec / json
+        self.json_backend = str(self._get_config("KY_MONITOR_JSON_BACKEND", "json_backend", "auto")).lower()
+        # Redis/RocketMQ 载荷压缩: codec 为 none/zlib/gzip/zstd，序列化后超过 threshold_bytes 才压缩，level -1 为算法默认级别
+        self.compression_codec = str(self._get_config("KY_MONITOR_COMPRESSION_CODEC", ["compression", "codec"], "none")).lower()
+        self.compression_threshold_bytes = self._get_int_config("KY_MONITOR_COMPRESSION_THRESHOLD_BYTES", ["compression", "threshold_bytes"], 32768)
+        self.compression_level = self._get_int_config("KY_MONITOR_COMPRESSION_LEVEL", ["compression", "level"], -1)
+
+        # 载荷裁剪: profile 为 full/standard/minimal，include/exclude 为相对单个prompt条目的字段路径
+        self.payload_profile = str(self._get_config("KY_MONITOR_PAYLOAD_PROFILE", ["payload", "profile"], "full")).lower()
+        self.payload_include = self._get_list_config("KY_MONITOR_PAYLOAD_INCLUDE", ["payload", "include"], [])
+        self.payload_exclude = self._get_list_config("KY_MONITOR_PAYLOAD_EXCLUDE", ["payload", "exclude"], [])
+        self.payload_max_field_bytes = self._get_int_config("KY_MONITOR_PAYLOAD_MAX_FIELD_BYTES", ["payload", "max_field_bytes"], 0)
+
+        # 实例ID，附加在每条发布记录上，供集群聚合器区分实例；未配置时使用 主机名:端口
+        self.instance_id = self._get_config("KY_MONITOR_INSTANCE_ID", "instance_id", None)
+
+        # 在PromptServer上注册 /ky_monitor/* HTTP接口(Prometheus指标等)
+        self.http_api_enabled = self._get_bool_config("KY_MONITOR_HTTP_API_ENABLED", "http_api_enabled", True)
 
         # Prompt Server Channel
         self.prompt_server_enabled = self._get_bool_config("KY_MONITOR_PROMPT_SERVER_ENABLED", ["prompt_server_channel", "enabled"], True)
         self.prompt_server_event_name = self._get_config("KY_MONITOR_PROMPT_SERVER_EVENT_NAME", ["prompt_server_channel", "event_name"], "ky_monitor.queue")
+        # 投递方式: broadcast(所有连接) / per_client(按 client_id 定向发送，另广播队列摘要)
+        self.prompt_server_delivery = str(self._get_config("KY_MONITOR_PROMPT_SERVER_DELIVERY", ["prompt_server_channel", "delivery"], "broadcast")).lower()
         
         logger.info(self)
         logger.info(self.prompt_server_event_name)
         logger.info(self.prompt_server_enabled)
 
+        # 派生主题: prompt(每个prompt) / client(每个client_id) / errors(失败的prompt)
+        # Redis 发布到 <channel_name>:<主题>，RocketMQ 以主题为tag额外发送
+        self.topics = [str(topic).lower() for topic in self._get_list_config("KY_MONITOR_TOPICS", "topics", [])]
+
         # Redis Channel
         self.redis_enabled = self._get_bool_config("KY_MONITOR_REDIS_ENABLED", ["redis_channel", "enabled"], False)
         self.redis_host = self._get_config("KY_MONITOR_REDIS_HOST", ["redis_channel", "host"], "localhost")
@@ -58,12 +123,27 @@ class Config:
         self.redis_password = self._get_config("KY_MONITOR_REDIS_PASSWORD", ["redis_channel", "password"], None)
         self.redis_db = self._get_int_config("KY_MONITOR_REDIS_DB", ["redis_channel", "db"], 0)
         self.redis_channel_name = self._get_config("KY_MONITOR_REDIS_CHANNEL_NAME", ["redis_channel", "channel_name"], "comfyui_monitor")
+        # 写入方式: pubsub(PUBLISH) / stream(XADD) / both / state(只写最新状态键)
+        self.redis_mode = str(self._get_config("KY_MONITOR_REDIS_MODE", ["redis_channel", "mode"], "pubsub")).lower()
+        self.redis_stream_name = self._get_config("KY_MONITOR_REDIS_STREAM_NAME", ["redis_channel", "stream_name"], "comfyui_monitor:stream")
+        self.redis_stream_maxlen = self._get_int_config("KY_MONITOR_REDIS_STREAM_MAXLEN", ["redis_channel", "stream_maxlen"], 10000)
+        # 最新状态键: 每次发送时用同一个 pipeline 写入实例状态HASH与prompt状态键(均带TTL)；
+        # redis_mode 为 state 时只写状态键，不发布
+        self.redis_state_enabled = self._get_bool_config("KY_MONITOR_REDIS_STATE_ENABLED", ["redis_channel", "state_enabled"], False)
+        self.redis_state_prefix = self._get_config("KY_MONITOR_REDIS_STATE_PREFIX", ["redis_channel", "state_prefix"], "comfyui_monitor:state")
+        self.redis_state_ttl_seconds = self._get_int_config("KY_MONITOR_REDIS_STATE_TTL_SECONDS", ["redis_channel", "state_ttl_seconds"], 180)
+        self.redis_prompt_ttl_seconds = self._get_int_config("KY_MONITOR_REDIS_PROMPT_TTL_SECONDS", ["redis_channel", "prompt_ttl_seconds"], 3600)
 
         # RocketMQ Channel
         self.rocketmq_enabled = self._get_bool_config("KY_MONITOR_ROCKETMQ_ENABLED", ["rocketmq_channel", "enabled"], False)
         self.rocketmq_namesrv_addr = self._get_config("KY_MONITOR_ROCKETMQ_NAMESRV_ADDR", ["rocketmq_channel", "namesrv_addr"], "localhost:9876")
         self.rocketmq_topic = self._get_config("KY_MONITOR_ROCKETMQ_TOPIC", ["rocketmq_channel", "topic"], "comfyui_monitor_topic")
         self.rocketmq_group_id = self._get_config("KY_MONITOR_ROCKETMQ_GROUP_ID", ["rocketmq_channel", "group_id"], "KY_MONITOR_PRODUCER_GROUP")
+        # 发送方式: sync / async / oneway；async 需要客户端支持 send_async，否则回退到 oneway
+        self.rocketmq_send_mode = str(self._get_config("KY_MONITOR_ROCKETMQ_SEND_MODE", ["rocketmq_channel", "send_mode"], "sync")).lower()
+        # batch_size > 0 时跨多次广播缓冲记录，攒满 batch_size 条或等待 linger_ms 后合并为一条消息；0 表示每次广播一条消息
+        self.rocketmq_batch_size = self._get_int_config("KY_MONITOR_ROCKETMQ_BATCH_SIZE", ["rocketmq_channel", "batch_size"], 0)
+        self.rocketmq_linger_ms = self._get_int_config("KY_MONITOR_ROCKETMQ_LINGER_MS", ["rocketmq_channel", "linger_ms"], 50)
 
     def _get_config(self, env_var, json_path, default_value):
         value = os.getenv(env_var)
@@ -86,7 +166,9 @@ class Config:
         value_str = self._get_config(env_var, json_path, None)
         if value_str is None:
             return default_value
-        return value_str.lower() in ['true', '1', 't', 'y', 'yes']
+        if isinstance(value_str, bool):
+            return value_str
+        return str(value_str).lower() in ['true', '1', 't', 'y', 'yes']
 
     def _get_int_config(self, env_var, json_path, default_value):
         value_str = self._get_config(env_var, json_path, None)
@@ -96,4 +178,23 @@ class Config:
             return int(value_str)
         except ValueError:
             logger.warning(f"无法解析整数配置 {env_var}，使用默认值 {default_value}")
-            return default_value 
\ No newline at end of file
+            return default_value 
+
+    def _get_float_config(self, env_var, json_path, default_value):
+        value_str = self._get_config(env_var, json_path, None)
+        if value_str is None:
+            return default_value
+        try:
+            return float(value_str)
+        except ValueError:
+            logger.warning(f"无法解析数值配置 {env_var}，使用默认值 {default_value}")
+            return default_value
+
+    def _get_list_config(self, env_var, json_path, default_value):
+        value = self._get_config(env_var, json_path, None)
+        if value is None:
+            return default_value
+        if isinstance(value, list):
+            return value
+        # 环境变量使用逗号分隔
+        return [item.strip() for item in str(value).split(",") if item.strip()]
@@ -0,0 +1,11 @@
+from .instrumentation import Histogram, MonitorMetrics, METRICS
+from .prometheus import render_prometheus
+from .sketch import QuantileSketch
+
+__all__ = [
+    'Histogram',
+    'MonitorMetrics',
+    'METRICS',
+    'render_prometheus',
+    'QuantileSketch'
+]
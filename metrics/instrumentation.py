@@ -0,0 +1,128 @@
+import bisect
+import threading
+import time
+
+# 默认桶边界
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+EXECUTION_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+class Histogram:
+    """固定桶直方图，observe 只做一次二分查找和几次加法"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def quantile(self, q):
+        """按桶估算分位数，返回所在桶的上界(最后一个桶返回观测到的最大值)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(upper, self.max)
+        return self.max
+
+    def cumulative_counts(self):
+        """[(上界, 累计数)]，最后一项上界为 +Inf"""
+        return self.collect()[0]
+
+    def collect(self):
+        """一致的 (累计桶, sum, count)，供Prometheus导出"""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        result, cumulative = [], 0
+        for upper, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            result.append((upper, cumulative))
+        return result, total, count
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class MonitorMetrics:
+    """监控自身的耗时与载荷统计"""
+
+    def __init__(self):
+        self.tick_seconds = Histogram(LATENCY_BUCKETS)
+        self.build_seconds = Histogram(LATENCY_BUCKETS)
+        self.encode_seconds = Histogram(LATENCY_BUCKETS)
+        self.payload_bytes = Histogram(SIZE_BUCKETS)
+        self.channel_send_seconds = {}
+        self.channel_errors = {}
+        # 已完成prompt的计数(按状态)与执行耗时
+        self.prompts_finished = {}
+        self.execution_seconds = Histogram(EXECUTION_BUCKETS)
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def observe_channel_send(self, channel_name, seconds):
+        histogram = self.channel_send_seconds.get(channel_name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.channel_send_seconds.setdefault(channel_name, Histogram(LATENCY_BUCKETS))
+        histogram.observe(seconds)
+
+    def observe_channel_error(self, channel_name):
+        with self._lock:
+            self.channel_errors[channel_name] = self.channel_errors.get(channel_name, 0) + 1
+
+    def observe_prompt_finished(self, status, seconds=None):
+        with self._lock:
+            self.prompts_finished[status] = self.prompts_finished.get(status, 0) + 1
+        if seconds is not None and seconds >= 0:
+            self.execution_seconds.observe(seconds)
+
+    def uptime(self) -> float:
+        return time.time() - self.started_at
+
+    def snapshot(self) -> dict:
+        return {
+            "uptime_seconds": self.uptime(),
+            "tick_seconds": self.tick_seconds.snapshot(),
+            "build_seconds": self.build_seconds.snapshot(),
+            "encode_seconds": self.encode_seconds.snapshot(),
+            "payload_bytes": self.payload_bytes.snapshot(),
+            "channels": {
+                name: dict(histogram.snapshot(), errors=self.channel_errors.get(name, 0))
+                for name, histogram in self.channel_send_seconds.items()
+            },
+            "channel_errors": dict(self.channel_errors),
+            "prompts_finished": dict(self.prompts_finished),
+            "execution_seconds": self.execution_seconds.snapshot(),
+        }
+
+
+# 进程内全局指标
+METRICS = MonitorMetrics()
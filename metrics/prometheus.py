@@ -0,0 +1,108 @@
+import math
+
+# Prometheus 文本格式(0.0.4)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if value is None:
+        return "NaN"
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class PrometheusWriter:
+    """按指标族输出 # HELP/# TYPE 与样本行"""
+
+    def __init__(self, prefix="ky_monitor_"):
+        self.prefix = prefix
+        self.lines = []
+
+    def family(self, name, metric_type, help_text):
+        self.lines.append(f"# HELP {self.prefix}{name} {help_text}")
+        self.lines.append(f"# TYPE {self.prefix}{name} {metric_type}")
+
+    def sample(self, name, value, labels=None):
+        self.lines.append(f"{self.prefix}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def histogram(self, name, histogram, labels=None):
+        cumulative, total, count = histogram.collect()
+        labels = dict(labels or {})
+        for upper, bucket_count in cumulative:
+            self.sample(f"{name}_bucket", bucket_count, dict(labels, le=_format_value(upper)))
+        self.sample(f"{name}_sum", total, labels)
+        self.sample(f"{name}_count", count, labels)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_prometheus(metrics, queue=None, dispatch=None, scheduler=None) -> str:
+    """把内存中的计数器导出为Prometheus文本
+
+    queue 只读取 currently_running/queue 的长度和 task_counter，不复制队列；
+    dispatch 为 dispatch_stats() 的结果；scheduler 为 AdaptiveScheduler.stats() 的结果。
+    """
+    writer = PrometheusWriter()
+
+    if queue is not None:
+        writer.family("queue_running", "gauge", "Prompts currently running.")
+        writer.sample("queue_running", len(getattr(queue, "currently_running", None) or ()))
+        writer.family("queue_waiting", "gauge", "Prompts waiting in the queue.")
+        writer.sample("queue_waiting", len(getattr(queue, "queue", None) or ()))
+        writer.family("queue_task_counter", "counter", "ComfyUI prompt queue task counter.")
+        writer.sample("queue_task_counter", getattr(queue, "task_counter", 0) or 0)
+
+    writer.family("prompts_finished_total", "counter", "Finished prompts observed by the monitor, by status.")
+    for status, count in sorted(dict(metrics.prompts_finished).items()):
+        writer.sample("prompts_finished_total", count, {"status": status})
+    writer.family("execution_duration_seconds", "histogram", "Prompt execution duration from history timestamps.")
+    writer.histogram("execution_duration_seconds", metrics.execution_seconds)
+
+    writer.family("tick_duration_seconds", "histogram", "Duration of one monitor tick (build, project, encode, dispatch).")
+    writer.histogram("tick_duration_seconds", metrics.tick_seconds)
+    writer.family("build_duration_seconds", "histogram", "Duration of get_queue_status.")
+    writer.histogram("build_duration_seconds", metrics.build_seconds)
+    writer.family("encode_duration_seconds", "histogram", "Duration of payload serialization.")
+    writer.histogram("encode_duration_seconds", metrics.encode_seconds)
+    writer.family("payload_bytes", "histogram", "Serialized payload size in bytes.")
+    writer.histogram("payload_bytes", metrics.payload_bytes)
+
+    writer.family("channel_send_duration_seconds", "histogram", "Duration of one channel send.")
+    for name, histogram in sorted(dict(metrics.channel_send_seconds).items()):
+        writer.histogram("channel_send_duration_seconds", histogram, {"channel": name})
+    writer.family("channel_errors_total", "counter", "Channel send errors.")
+    for name, count in sorted(dict(metrics.channel_errors).items()):
+        writer.sample("channel_errors_total", count, {"channel": name})
+
+    if dispatch:
+        writer.family("dispatch_queue_depth", "gauge", "Records waiting in a channel dispatch queue.")
+        for stats in dispatch:
+            writer.sample("dispatch_queue_depth", stats["depth"], {"channel": stats["channel"]})
+        writer.family("dispatch_dropped_total", "counter", "Records dropped because a dispatch queue was full.")
+        for stats in dispatch:
+            writer.sample("dispatch_dropped_total", stats["dropped"], {"channel": stats["channel"]})
+
+    if scheduler:
+        writer.family("poll_interval_seconds", "gauge", "Current effective polling interval of the monitor.")
+        writer.sample("poll_interval_seconds", scheduler["effective_interval_seconds"])
+        writer.family("skipped_ticks_total", "counter", "Ticks skipped because the previous tick overran the interval.")
+        writer.sample("skipped_ticks_total", scheduler["skipped_ticks"])
+
+    writer.family("uptime_seconds", "gauge", "Seconds since the monitor metrics were created.")
+    writer.sample("uptime_seconds", metrics.uptime())
+    return writer.render()
@@ -0,0 +1,81 @@
+import math
+
+
+class QuantileSketch:
+    """对数分桶的流式分位数草图(DDSketch思路)，分位数的相对误差不超过 relative_accuracy
+
+    每个观测值只更新一个桶计数，内存随数值跨度而不是观测次数增长；
+    桶数超过 max_bins 时合并最小的桶，只影响低分位数的精度。
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048, min_value=1e-6):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.max_bins = max(16, int(max_bins))
+        self.min_value = min_value
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return self.min
+        cumulative = self.zero_count
+        for key in sorted(self.bins):
+            cumulative += self.bins[key]
+            if cumulative > rank:
+                # 桶 (gamma^(k-1), gamma^k] 的代表值，相对误差 <= relative_accuracy
+                value = 2 * self._gamma ** key / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def merge(self, other):
+        for key, bin_count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + bin_count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        while len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+    def _collapse(self):
+        lowest, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(lowest)
@@ -7,13 +7,15 @@ import time
 import server  # 用于访问 PromptServer.instance
 import execution  # 用于访问 PromptQueue (如果需要更底层的队列访问)
 import logging  # 使用 logging 模块记录信息
-import json  # ADDED
-import redis  # ADDED
 
-# from rocketmq.client import Producer, Message # ADDED
-import rocketmq_client
-from .notifications import broadcast_info
+# Redis/RocketMQ 客户端库只在对应渠道启用时由 notifications 中的渠道工厂导入
+from .metrics import METRICS
+from .notifications import broadcast_info, dispatch_stats, shutdown_channels, get_compressor, DeltaPublisher, PayloadProjection
+from .notifications.projection import output_refs, summarize_messages
 from .config import APP_CONFIG
+from .scheduler import AdaptiveScheduler
+from .storage import TaskHistoryStore
+from .tracking import TaskStateMachine, PromptServerEventHook, HistoryCursor, DedupStore, NodeIndexCache, NodeTimer, ProgressEstimator, WaitTimePredictor, TaskLifecycle, execution_seconds
 
 # 设置一个专用的 logger
 logger = logging.getLogger("KY_monitor_logic")  # 使用特定名称
@@ -26,90 +28,82 @@ class ComfyMonitor:
         self.rate = float(rate)
         self.prompt_server = server.PromptServer.instance
         self._stop_event = asyncio.Event()
-        self._completed_prompts_count = {}
+        # 已发送过成功/错误通知的prompt，有界且按TTL淘汰
+        self.completed_prompts = DedupStore(
+            capacity=APP_CONFIG.dedup_capacity,
+            ttl_seconds=APP_CONFIG.dedup_ttl_seconds,
+        )
+        self.history_cursor = HistoryCursor(max_backlog=APP_CONFIG.history_max_items)
+        # 运行中prompt的工作流节点索引，避免每次tick重新排序
+        self.node_index_cache = NodeIndexCache()
         self.channels = channels or []
         self.rocketmq_channel = rocketmq_channel
 
-        self.redis_client = None
-        self.rocketmq_producer = None
-        self.rocketmq_topic = None
-        self.rocketmq_namesrv_addr = None
-        self.redis_host = None
+        # 事件驱动模式
+        self.mode = APP_CONFIG.monitor_mode
+        self.task_state = TaskStateMachine()
+        self._event_hook = None
+        self._publish_handle = None
+        self._last_publish_at = 0.0
+        self._min_publish_interval = max(0, APP_CONFIG.event_min_interval_ms) / 1000.0
+
+        # 轮询模式调度
+        self.scheduler = AdaptiveScheduler(
+            active_interval=APP_CONFIG.poll_active_seconds,
+            idle_interval=self.rate,
+            idle_max_interval=APP_CONFIG.poll_idle_max_seconds,
+            backoff=APP_CONFIG.poll_backoff,
+            adaptive=APP_CONFIG.adaptive_polling,
+        )
+
+        # 节点耗时统计，依赖PromptServer事件钩子(轮询模式下也会安装钩子)
+        self.node_timer = None
+        # 按历史节点耗时加权的进度与ETA，依赖节点耗时统计
+        self.progress_estimator = None
+        if APP_CONFIG.node_timing_enabled:
+            self.node_timer = NodeTimer(resolve_graph=self._running_prompt_graph)
+            self.progress_estimator = ProgressEstimator(self.node_timer)
+
+        # 按工作流指纹预测等待prompt的开始/完成时间
+        self.wait_predictor = None
+        if APP_CONFIG.wait_prediction_enabled:
+            self.wait_predictor = WaitTimePredictor(node_timer=self.node_timer)
+
+        # 任务生命周期记录，启用 history_store 时由后台线程批量写入SQLite
+        self.lifecycle = TaskLifecycle(capacity=APP_CONFIG.dedup_capacity)
+        self.history_store = None
+        if APP_CONFIG.history_store_enabled:
+            self.history_store = TaskHistoryStore(
+                APP_CONFIG.history_store_path,
+                batch_size=APP_CONFIG.history_store_batch_size,
+                flush_interval=APP_CONFIG.history_store_flush_ms / 1000.0,
+                retention_days=APP_CONFIG.history_store_retention_days,
+            )
+
+        # 上一次发布的完整快照是否为空队列
+        self._last_published_empty = False
+
+        # 自身指标上报间隔(秒)，0 表示不上报
+        self.self_report_seconds = max(0, APP_CONFIG.self_report_seconds)
+
+        # 载荷裁剪
+        self.projection = PayloadProjection(
+            profile=APP_CONFIG.payload_profile,
+            include=APP_CONFIG.payload_include,
+            exclude=APP_CONFIG.payload_exclude,
+            max_field_bytes=APP_CONFIG.payload_max_field_bytes,
+        )
+
+        # 增量发布
+        self.delta_publisher = None
+        if APP_CONFIG.publish_mode == "delta":
+            self.delta_publisher = DeltaPublisher(keyframe_seconds=APP_CONFIG.keyframe_seconds)
 
         if not self.prompt_server:
             logger.error("PromptServer.instance在初始化时不可用")
         if not self.loop:
             logger.error("asyncio loop在初始化时不可用")
 
-        # 处理 channels 参数
-        if channels:
-            if isinstance(channels, dict):
-                channel_config = channels
-            elif isinstance(channels, list) and len(channels) > 0:
-                channel_config = channels[0]  # 使用第一个配置
-            else:
-                channel_config = None
-
-            if channel_config and isinstance(channel_config, dict):
-                try:
-                    self.redis_host = channel_config.get("host")
-                    if self.redis_host and channel_config.get("port"):
-                        self.redis_client = redis.StrictRedis(
-                            host=channel_config["host"],
-                            port=channel_config["port"],
-                            db=channel_config.get("db", 0),
-                            password=channel_config.get("password"),
-                            decode_responses=True,
-                            socket_connect_timeout=5,
-                        )
-                        self.redis_client.ping()
-                        logger.info(
-                            f"[KY_monitor] Redis client initialized and connected to {channel_config['host']}:{channel_config['port']}."
-                        )
-                except Exception as e:
-                    logger.error(
-                        f"[KY_monitor] Failed to initialize Redis client for {channel_config.get('host')}:{channel_config.get('port')}: {e}"
-                    )
-                    self.redis_client = None
-
-        # 处理 rocketmq_channel 参数
-        if rocketmq_channel:
-            try:
-                # 如果 rocketmq_channel 是对象，尝试直接访问属性
-                if hasattr(rocketmq_channel, "namesrv_addr") and hasattr(
-                    rocketmq_channel, "topic"
-                ):
-                    self.rocketmq_namesrv_addr = rocketmq_channel.namesrv_addr
-                    self.rocketmq_topic = rocketmq_channel.topic
-                    group_id = getattr(
-                        rocketmq_channel, "group_id", "KY_MONITOR_PRODUCER_GROUP"
-                    )
-                # 如果 rocketmq_channel 是字典，使用 get 方法
-                elif isinstance(rocketmq_channel, dict):
-                    self.rocketmq_namesrv_addr = rocketmq_channel.get("namesrv_addr")
-                    self.rocketmq_topic = rocketmq_channel.get("topic")
-                    group_id = rocketmq_channel.get(
-                        "group_id", "KY_MONITOR_PRODUCER_GROUP"
-                    )
-                else:
-                    logger.error(
-                        f"[KY_monitor] Invalid rocketmq_channel format: {type(rocketmq_channel)}"
-                    )
-                    return
-
-                if self.rocketmq_namesrv_addr and self.rocketmq_topic:
-                    self.rocketmq_producer = rocketmq_client.Producer(group_id)
-                    self.rocketmq_producer.set_namesrv_addr(self.rocketmq_namesrv_addr)
-                    self.rocketmq_producer.start()
-                    logger.info(
-                        f"[KY_monitor] RocketMQ producer initialized and started. Nameserver: {self.rocketmq_namesrv_addr}, Topic: {self.rocketmq_topic}, Group: {group_id}"
-                    )
-            except Exception as e:
-                logger.error(
-                    f"[KY_monitor] Failed to initialize RocketMQ producer: {e}"
-                )
-                self.rocketmq_producer = None
-
     async def send_message(self, event_name: str, data: dict) -> None:
         """通过所有可用的通知渠道发送消息"""
         # 通过所有渠道发送消息
@@ -136,6 +130,8 @@ class ComfyMonitor:
         # logger.info(f"running_queue_items: {running_queue_items}")
         pending_queue_items = current_queue_snapshot[1]
         # logger.info(f"pending_queue_items: {pending_queue_items}")
+        # 当前运行的prompt预计全部结束的时间，作为等待队列预测的起点
+        running_finish_at = time.time()
 
         # 处理正在运行的队列
         for idx, item_tuple in enumerate(running_queue_items):
@@ -152,6 +148,12 @@ class ComfyMonitor:
                 "client_id": client_id_val,
                 "status": "running",
             }
+            estimate = None
+            task = self.task_state.get(prompt_id_val)
+            self._record_lifecycle(self.lifecycle.observe_started(
+                prompt_id_val, client_id_val, position_val,
+                started_at=task.started_at if task is not None else None,
+            ))
 
             if idx == 0:  # 假设第一个是当前主要活动的工作流
                 total_nodes_in_workflow = 0
@@ -160,57 +162,22 @@ class ComfyMonitor:
                 progress_percentage = 0
                 current_node_name = None
 
-                workflow_nodes_list = []
                 try:
-                    if (
-                        isinstance(extra_data_val, dict)
-                        and "extra_pnginfo" in extra_data_val
-                        and isinstance(extra_data_val["extra_pnginfo"], dict)
-                        and "workflow" in extra_data_val["extra_pnginfo"]
-                        and isinstance(
-                            extra_data_val["extra_pnginfo"]["workflow"], dict
-                        )
-                        and "nodes" in extra_data_val["extra_pnginfo"]["workflow"]
-                        and isinstance(
-                            extra_data_val["extra_pnginfo"]["workflow"]["nodes"], list
-                        )
-                    ):
-
-                        valid_nodes_for_ordering = []
-                        for node_data in extra_data_val["extra_pnginfo"]["workflow"][
-                            "nodes"
-                        ]:
-                            if (
-                                isinstance(node_data, dict)
-                                and "order" in node_data
-                                and "id" in node_data
-                            ):
-                                valid_nodes_for_ordering.append(node_data)
-                            else:
-                                logger.debug(
-                                    f"节点数据缺少'order'或'id', prompt {prompt_id_val}: {node_data}"
-                                )
-
-                        workflow_nodes_list = sorted(
-                            valid_nodes_for_ordering, key=lambda n: n["order"]
-                        )
-                        total_nodes_in_workflow = len(workflow_nodes_list)
-
-                        if server_last_node_id and total_nodes_in_workflow > 0:
-                            for i, node in enumerate(workflow_nodes_list):
-                                if str(node["id"]) == str(server_last_node_id):
-                                    current_executing_node_order = i + 1
-                                    nodes_completed_count = i
-                                    current_node_name = node.get("type", "Unknown")
-                                    break
-                            if current_executing_node_order > 0:
-                                progress_percentage = math.ceil(
-                                    (
-                                        current_executing_node_order
-                                        * 100
-                                        / total_nodes_in_workflow
-                                    )
+                    node_index = self.node_index_cache.get(prompt_id_val, extra_data_val)
+                    total_nodes_in_workflow = node_index.total
+
+                    if server_last_node_id and total_nodes_in_workflow > 0:
+                        node_entry = node_index.lookup(server_last_node_id)
+                        if node_entry is not None:
+                            current_executing_node_order, current_node_name = node_entry
+                            nodes_completed_count = current_executing_node_order - 1
+                            progress_percentage = math.ceil(
+                                (
+                                    current_executing_node_order
+                                    * 100
+                                    / total_nodes_in_workflow
                                 )
+                            )
 
                 except Exception as e:
                     logger.error(
@@ -226,9 +193,30 @@ class ComfyMonitor:
                     "completed_count": nodes_completed_count,
                     "percentage": round(progress_percentage, 2),
                 }
-
+                if self.progress_estimator is not None:
+                    estimate = self._estimate_progress(prompt_id_val, item_tuple[4] if len(item_tuple) > 4 else None)
+                    if estimate is not None:
+                        # percentage 改为按耗时加权，原按节点数的百分比保留为 node_percentage
+                        task_info["progress"]["node_percentage"] = round(progress_percentage, 2)
+                        task_info["progress"].update(estimate)
+
+            if self.wait_predictor is not None:
+                running_finish_at = max(running_finish_at, self._running_finish_at(item_tuple, estimate))
             all_prompts_info.append(task_info)
 
+        # prompt结束后淘汰其节点索引
+        running_prompt_ids = {item_tuple[1] for item_tuple in running_queue_items}
+        self.node_index_cache.retain(running_prompt_ids)
+        if self.progress_estimator is not None:
+            self.progress_estimator.retain(running_prompt_ids)
+
+        # 等待队列的预测偏移只从变化的位置起重新累加
+        predicted_offsets = {}
+        if self.wait_predictor is not None:
+            predicted_offsets = self.wait_predictor.predict(pending_queue_items)
+            self.wait_predictor.retain(running_prompt_ids)
+            now = time.time()
+
         # 处理等待队列
         for item_tuple in pending_queue_items:
             prompt_id_val = item_tuple[1]
@@ -238,30 +226,27 @@ class ComfyMonitor:
             if isinstance(extra_data_val, dict):
                 client_id_val = extra_data_val.get("client_id")
 
-            all_prompts_info.append(
-                {
-                    "prompt_id": prompt_id_val,
-                    "position": position_val,
-                    "client_id": client_id_val,
-                    "status": "waiting",
-                }
-            )
-
-        # 处理已完成的任务
-        if queue.history:
-            # logger.info(f"queue.history: {queue.history}") ==
-            # 获得最新的5个
-            latest_history_items = list(queue.history.items())[-5:]
+            task_info = {
+                "prompt_id": prompt_id_val,
+                "position": position_val,
+                "client_id": client_id_val,
+                "status": "waiting",
+            }
+            self._record_lifecycle(self.lifecycle.observe_queued(prompt_id_val, client_id_val, position_val))
+            offsets = predicted_offsets.get(prompt_id_val)
+            if offsets is not None:
+                task_info["predicted_start_at"] = round(running_finish_at + offsets[0], 3)
+                task_info["predicted_finish_at"] = round(running_finish_at + offsets[1], 3)
+                task_info["predicted_wait_seconds"] = round(max(0.0, running_finish_at + offsets[0] - now), 3)
+            all_prompts_info.append(task_info)
 
-            for prompt_id_str, history_item in list(latest_history_items):
-                current_send_count = self._completed_prompts_count.get(prompt_id_str, 0)
+        # 处理已完成的任务：只遍历上次扫描之后新增的历史记录
+        new_history_items = self.history_cursor.read_new(queue)
+        if new_history_items:
+            for prompt_id_str, history_item in new_history_items:
                 # 只发送一次成功/错误
-                if current_send_count >= 1:
+                if not self.completed_prompts.add(prompt_id_str):
                     continue
-                else:
-                    self._completed_prompts_count[prompt_id_str] = (
-                        current_send_count + 1
-                    )
                 status_dict = history_item.get("status")
                 if not status_dict:
                     continue
@@ -300,21 +285,43 @@ class ComfyMonitor:
                         "prompts":  history_item.get('prompt', []),
                     }
                 else:
-                    if prompt_id_str in self._completed_prompts_count:
-                        logger.warning(
-                            f"Prompt {prompt_id_str} 从历史记录中，之前追踪完成/错误，不再处于最终状态。状态: {status_dict}。从发送追踪中移除。"
-                        )
-                        del self._completed_prompts_count[prompt_id_str]
+                    logger.warning(
+                        f"Prompt {prompt_id_str} 从历史记录中，之前追踪完成/错误，不再处于最终状态。状态: {status_dict}。从发送追踪中移除。"
+                    )
+                    self.completed_prompts.discard(prompt_id_str)
                     continue
-
+                if self.node_timer is not None:
+                    node_timings = self.node_timer.pop_finished(prompt_id_str)
+                    if node_timings is not None:
+                        info["node_timings"] = node_timings
+                        info["node_type_stats"] = self._node_type_stats(node_timings)
+
+                duration = execution_seconds(status_dict)
+                METRICS.observe_prompt_finished(status_str, duration)
+                # history 中的 prompt 为 (number, prompt_id, prompt, extra_data, outputs)
+                prompt_tuple = history_item.get("prompt")
+                if not isinstance(prompt_tuple, (list, tuple)):
+                    prompt_tuple = ()
+                extra_data_val = prompt_tuple[3] if len(prompt_tuple) > 3 else None
+                client_id_val = extra_data_val.get("client_id") if isinstance(extra_data_val, dict) else None
+                self._record_finished(prompt_id_str, status_str, status_dict, history_item, info, duration,
+                                      client_id_val, prompt_tuple[0] if prompt_tuple else None)
+                if is_success and self.wait_predictor is not None:
+                    prompt_graph = prompt_tuple[2] if len(prompt_tuple) > 2 else None
+                    self.wait_predictor.observe(prompt_id_str, prompt_graph, duration)
                 all_prompts_info.append(
                     {
                         "prompt_id": prompt_id_str,
+                        "client_id": client_id_val,
                         "status": status_str,
                         "info": info,
                     }
                 )
 
+        # 生命周期中仍为等待/运行、却已不在队列中的prompt
+        current_prompt_ids = running_prompt_ids.union(item_tuple[1] for item_tuple in pending_queue_items)
+        self._observe_removed(queue, current_prompt_ids)
+
         return {
             "queue_status": {
                 "running": len(queue.currently_running),
@@ -324,22 +331,219 @@ class ComfyMonitor:
             "prompts": all_prompts_info,
         }
 
+    async def publish_status(self):
+        """构建一次队列状态并发送，返回本次的队列状态(失败时为None)"""
+        tick_started = time.perf_counter()
+        try:
+            queue_status = self.get_queue_status()
+            METRICS.build_seconds.observe(time.perf_counter() - tick_started)
+            queue_status = self.projection.apply_snapshot(queue_status)
+            if self.delta_publisher is not None:
+                # 增量模式下队列清空也需要发出removed记录
+                broadcast_info(self.delta_publisher.diff(queue_status))
+                return queue_status
+            # 检查队列是否为空；队列刚变为空时仍发送一次，订阅方据此清除运行中的prompt
+            if len(queue_status["prompts"]) > 0 or not self._last_published_empty:
+                await self.send_message("ky_monitor.queue", queue_status)
+            else:
+                logger.debug("队列为空，跳过消息发送")
+            self._last_published_empty = not queue_status["prompts"]
+            return queue_status
+        except Exception as e:
+            logger.error(f"发布队列状态时发生错误: {e}", exc_info=True)
+            return None
+        finally:
+            METRICS.tick_seconds.observe(time.perf_counter() - tick_started)
+
+    def _running_prompt_graph(self, prompt_id):
+        """从 currently_running 中取出prompt图，用于确定节点类型"""
+        queue = getattr(self.prompt_server, "prompt_queue", None)
+        if queue is None:
+            return None
+        with queue.mutex:
+            running_items = list(queue.currently_running.values())
+        for item_tuple in running_items:
+            if item_tuple[1] == prompt_id:
+                return item_tuple[2]
+        return None
+
+    def _record_lifecycle(self, record):
+        if record is not None and self.history_store is not None:
+            self.history_store.submit(record)
+
+    def _observe_removed(self, queue, current_prompt_ids):
+        """delete_queue 删除或被取消的prompt不会出现在历史记录中，记为 removed"""
+        missing = [prompt_id for prompt_id in self.lifecycle.active_ids() if prompt_id not in current_prompt_ids]
+        if not missing:
+            return
+        # 队列快照之后才完成的prompt已在历史记录中，下一次tick按完成处理
+        with queue.mutex:
+            missing = [prompt_id for prompt_id in missing if prompt_id not in queue.history]
+        for prompt_id in missing:
+            self._record_lifecycle(self.lifecycle.observe_removed(prompt_id))
+
+    def _record_finished(self, prompt_id, status_str, status_dict, history_item, info, duration,
+                         client_id=None, number=None):
+        """记录prompt结束: 时间取自历史消息的时间戳，错误只保留摘要，输出只保留文件引用"""
+        timings = summarize_messages(status_dict.get("messages"))
+        started_at, finished_at = timings.get("started_at"), timings.get("finished_at")
+        error = None
+        if status_str == "error" and info:
+            error = {key: info.get(key) for key in ("error_node_id", "error_node_type", "error_message")}
+        self._record_lifecycle(self.lifecycle.observe_finished(
+            prompt_id,
+            status_str,
+            finished_at=finished_at / 1000.0 if isinstance(finished_at, (int, float)) else None,
+            started_at=started_at / 1000.0 if isinstance(started_at, (int, float)) else None,
+            duration=duration,
+            error=error,
+            outputs=output_refs(history_item.get("outputs")) or None,
+            client_id=client_id,
+            number=number,
+        ))
+
+    def _running_finish_at(self, item_tuple, estimate):
+        """运行中prompt的预计结束时间: 优先使用进度估算的ETA，否则按指纹的平均耗时"""
+        now = time.time()
+        if estimate is not None:
+            return estimate["estimated_finish_at"]
+        expected = self.wait_predictor.expected_seconds(item_tuple[1], item_tuple[2] if len(item_tuple) > 2 else None)
+        task = self.task_state.get(item_tuple[1])
+        if expected is None or task is None:
+            return now
+        return max(now, task.started_at + expected)
+
+    def _estimate_progress(self, prompt_id, outputs=None):
+        """结合步数进度(progress事件)与历史节点耗时估算进度和ETA，只计入输出节点上游的节点"""
+        try:
+            task = self.task_state.get(prompt_id)
+            progress_value = progress_max = None
+            if task is not None:
+                progress_value, progress_max = task.progress_value, task.progress_max
+            return self.progress_estimator.estimate(prompt_id, progress_value, progress_max, outputs)
+        except Exception as e:
+            logger.error(f"估算进度失败，prompt {prompt_id}: {e}", exc_info=True)
+            return None
+
+    def _node_type_stats(self, node_timings) -> dict:
+        """本次prompt涉及的节点类型的跨运行耗时统计"""
+        stats = {}
+        for node in node_timings:
+            node_type = node["node_type"]
+            if node_type in stats:
+                continue
+            sketch = self.node_timer.type_stats(node_type)
+            if sketch is not None:
+                snapshot = sketch.snapshot()
+                stats[node_type] = {key: snapshot[key] for key in ("count", "mean", "p50", "p95", "p99")}
+        return stats
+
+    def node_stats(self) -> dict:
+        """各节点类型的耗时统计(count/sum/mean/min/max/p50/p95/p99)，按累计耗时排序"""
+        if self.node_timer is None:
+            return {}
+        return self.node_timer.stats()
+
+    def self_report(self) -> dict:
+        """监控自身的指标: 耗时直方图、载荷大小、各渠道发送耗时/错误、队列与去重状态"""
+        report = METRICS.snapshot()
+        report["mode"] = self.mode
+        report["dispatch"] = dispatch_stats()
+        report["dedup"] = self.completed_prompts.stats()
+        if self.mode == "poll":
+            report["scheduler"] = self.scheduler.stats()
+        report["node_index_cache_size"] = len(self.node_index_cache)
+        report["history_skipped_scans"] = self.history_cursor.skipped_scans
+        report["lifecycle_records"] = len(self.lifecycle)
+        if self.history_store is not None:
+            report["history_store"] = self.history_store.stats()
+        compressor = get_compressor()
+        if compressor is not None:
+            report["compression"] = compressor.stats()
+        return report
+
+    async def self_report_loop(self):
+        """周期性发布自身指标事件"""
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.self_report_seconds)
+                break
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.send_message("ky_monitor.self_report", self.self_report())
+            except Exception as e:
+                logger.error(f"发布自身指标失败: {e}", exc_info=True)
+
+    async def keyframe_loop(self):
+        """事件驱动的增量模式下，状态长时间无变化时按 keyframe_seconds 补发关键帧"""
+        while not self._stop_event.is_set():
+            delay = self.delta_publisher.seconds_until_keyframe()
+            if delay <= 0:
+                self._schedule_publish()
+                delay = self.delta_publisher.keyframe_seconds
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+                break
+            except asyncio.TimeoutError:
+                pass
+
     async def monitor_loop(self):
         """监控循环"""
+        self.scheduler.reset()
         while not self._stop_event.is_set():
+            queue_status = await self.publish_status()
+            summary = (queue_status or {}).get("queue_status") or {}
+            active = bool(summary.get("running") or summary.get("waiting"))
+            delay = self.scheduler.next_delay(active)
             try:
-                queue_status = self.get_queue_status()
-                # 检查队列是否为空
-                if len(queue_status["prompts"]) > 0:
-                    # logger.info(                        f"Kmonitor: {APP_CONFIG.prompt_server_event_name}:\n{queue_status}"  )
-                    await self.send_message("ky_monitor.queue", queue_status)
-                else:
-                    logger.debug("队列为空，跳过消息发送")
+                await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
 
-            except Exception as e:
-                logger.error(f"监控循环中发生错误: {e}", exc_info=True)
-
-            await asyncio.sleep(self.rate)
+    def _on_server_event(self, event: str, data) -> None:
+        """send_sync钩子回调，可能运行在执行线程中"""
+        if self._stop_event.is_set():
+            return
+        # 在执行线程中记录时间，节点耗时不受事件循环排队延迟影响
+        self.loop.call_soon_threadsafe(self._handle_server_event, event, data, time.monotonic())
+
+    def _handle_server_event(self, event: str, data, timestamp=None) -> None:
+        """在事件循环中更新任务状态机与节点耗时，事件模式下状态变化时安排发布"""
+        if self.node_timer is not None:
+            self.node_timer.apply(event, data, timestamp)
+        if self.task_state.apply(event, data) and self.mode == "event":
+            self._schedule_publish()
+
+    def _schedule_publish(self) -> None:
+        """合并短时间内的多次状态变化，至多每 event_min_interval_ms 发布一次"""
+        if self._publish_handle is not None or self._stop_event.is_set():
+            return
+        delay = self._last_publish_at + self._min_publish_interval - time.monotonic()
+        self._publish_handle = self.loop.call_later(max(0.0, delay), self._run_scheduled_publish)
+
+    def _run_scheduled_publish(self) -> None:
+        self._publish_handle = None
+        self._last_publish_at = time.monotonic()
+        self.loop.create_task(self.publish_status())
+
+    def _install_event_hook(self) -> bool:
+        if self._event_hook is not None:
+            return True
+        self._event_hook = PromptServerEventHook(self.prompt_server, self._on_server_event)
+        if not self._event_hook.install():
+            self._event_hook = None
+            return False
+        return True
+
+    def _start_event_mode(self) -> bool:
+        if not self._install_event_hook():
+            return False
+        # 发布一次初始状态
+        self._schedule_publish()
+        if self.delta_publisher is not None and self.delta_publisher.keyframe_seconds > 0:
+            self.loop.create_task(self.keyframe_loop())
+        return True
 
     def start(self):
         """启动监控"""
@@ -348,24 +552,72 @@ class ComfyMonitor:
             return
 
         self._stop_event.clear()
+        queue = getattr(self.prompt_server, "prompt_queue", None)
+        if queue is not None:
+            # 启动前已存在的历史记录不作为新完成的prompt发送
+            self.history_cursor.seek_end(queue)
+        if self.history_store is not None:
+            self.history_store.start()
+        if self.self_report_seconds:
+            self.loop.create_task(self.self_report_loop())
+        if self.mode == "event":
+            if self._start_event_mode():
+                logger.info(f"监控已启动（事件驱动模式），最小发布间隔: {self._min_publish_interval}秒")
+                return
+            logger.warning("事件驱动模式不可用，回退到轮询模式")
+            self.mode = "poll"
+        if self.node_timer is not None and not self._install_event_hook():
+            logger.warning("无法安装事件钩子，节点耗时统计不可用")
         self.loop.create_task(self.monitor_loop())
-        logger.info(f"监控已启动，间隔: {self.rate}秒")
+        if self.scheduler.adaptive:
+            logger.info(f"监控已启动（自适应轮询），运行时间隔: {self.scheduler.active_interval}秒，空闲间隔: {self.rate}~{self.scheduler.idle_max_interval}秒")
+        else:
+            logger.info(f"监控已启动，间隔: {self.rate}秒")
 
     def stop(self):
         """停止监控"""
         self._stop_event.set()
-        if self.rocketmq_channel:
-            self.rocketmq_channel.shutdown()
+        if self._event_hook:
+            self._event_hook.uninstall()
+            self._event_hook = None
+        if self._publish_handle is not None:
+            self._publish_handle.cancel()
+            self._publish_handle = None
+        shutdown_channels()
+        if self.history_store is not None:
+            self.history_store.stop()
         logger.info("监控已停止")
 
 
 monitor_instance = None
 
 
+def get_metrics():
+    """当前监控实例的自身指标，未初始化时返回None"""
+    if monitor_instance is None:
+        return None
+    return monitor_instance.self_report()
+
+
+def get_node_stats():
+    """各节点类型的耗时统计，未初始化时返回None"""
+    if monitor_instance is None:
+        return None
+    return monitor_instance.node_stats()
+
+
+def get_scheduler_stats():
+    """轮询调度器的当前间隔与跳过次数，未初始化或不在轮询模式时返回None"""
+    if monitor_instance is None or monitor_instance.mode != "poll":
+        return None
+    return monitor_instance.scheduler.stats()
+
+
 def initialize_monitor(
     monitor_interval_seconds=5, channels=None, rocketmq_channel=None
 ):
     """初始化监控器"""
+    global monitor_instance
     try:
         if not server.PromptServer.instance or not server.PromptServer.instance.loop:
             logger.error("无法初始化监控：PromptServer或loop不可用")
@@ -378,6 +630,7 @@ def initialize_monitor(
             rocketmq_channel=rocketmq_channel,
         )
         monitor.start()
+        monitor_instance = monitor
         return monitor
     except Exception as e:
         logger.error(f"初始化监控失败: {e}", exc_info=True)
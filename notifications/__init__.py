@@ -1,5 +1,11 @@
 from .channel import NotificationChannel, PromptServerChannel, RedisChannel, RocketMQChannel
-from .manager import initialize_channels, broadcast_info
+from .manager import initialize_channels, register_channel, broadcast_info, dispatch_stats, shutdown_channels
+from .delta import DeltaPublisher
+from .encoding import PayloadEncoder, EncodedPayload, encode_payload, encode_records, get_compressor
+from .compression import PayloadCompressor, decompress_payload
+from .projection import PayloadProjection
+from .routing import ClientRouter
+from .topics import TopicRouter, SubscriptionRegistry, SUBSCRIPTIONS
 
 __all__ = [
     'NotificationChannel',
@@ -7,5 +13,21 @@ __all__ = [
     'RedisChannel',
     'RocketMQChannel',
     'initialize_channels',
-    'broadcast_info'
+    'register_channel',
+    'broadcast_info',
+    'dispatch_stats',
+    'shutdown_channels',
+    'DeltaPublisher',
+    'PayloadEncoder',
+    'EncodedPayload',
+    'encode_payload',
+    'encode_records',
+    'get_compressor',
+    'PayloadCompressor',
+    'decompress_payload',
+    'PayloadProjection',
+    'ClientRouter',
+    'TopicRouter',
+    'SubscriptionRegistry',
+    'SUBSCRIPTIONS'
 ] 
\ No newline at end of file
@@ -1,8 +1,14 @@
-import json
 import traceback
+import threading
+import concurrent.futures
 import logging
 from abc import ABC, abstractmethod
 from ..config import APP_CONFIG
+from ..metrics import METRICS
+from .encoding import encode_payload, encode_records, compress_payload, compress_records, compress_bytes
+from .routing import ClientRouter
+from .topics import TopicRouter, SUBSCRIPTIONS
+from .state_store import RedisStateWriter
 
 logger = logging.getLogger("KY_monitor_channel")
 
@@ -23,11 +29,22 @@ class NotificationChannel(ABC):
         pass
 
 class PromptServerChannel(NotificationChannel):
+    SOCKETS_SNAPSHOT_RETRIES = 5
+    SOCKETS_SNAPSHOT_TIMEOUT = 1.0
+
     def __init__(self):
         self.enabled = APP_CONFIG.prompt_server_enabled
         self.event_name = APP_CONFIG.prompt_server_event_name
+        # broadcast: 所有连接收到完整记录 / per_client: 每个客户端(sid=client_id)只收到自己的prompt，另广播队列摘要
+        self.delivery = APP_CONFIG.prompt_server_delivery
+        if self.delivery not in ("broadcast", "per_client"):
+            logger.warning(f"未知的投递方式 {self.delivery}，使用 broadcast")
+            self.delivery = "broadcast"
+        self.router = ClientRouter() if self.delivery == "per_client" else None
+        # 注册了主题过滤的websocket客户端(SUBSCRIPTIONS)只收到匹配的记录
+        self.topic_router = TopicRouter()
         if self.enabled:
-            logger.info(f"PromptServerChannel已启用，事件名称: {self.event_name}")
+            logger.info(f"PromptServerChannel已启用，事件名称: {self.event_name}，投递方式: {self.delivery}")
 
     def send(self, info_data_list):
         if not self.enabled or not prompt_server or not hasattr(prompt_server, 'send_sync'):
@@ -36,31 +53,124 @@ class PromptServerChannel(NotificationChannel):
             return
 
         try:
-            prompt_server.send_sync(self.event_name, info_data_list)
+            if len(SUBSCRIPTIONS) and hasattr(prompt_server, "sockets"):
+                self._send_filtered(info_data_list)
+                return
+            if self.router is None:
+                prompt_server.send_sync(self.event_name, info_data_list)
+                return
+            shared, per_client = self.router.split(info_data_list)
+            if shared:
+                prompt_server.send_sync(self.event_name, shared)
+            for client_id, records in per_client.items():
+                prompt_server.send_sync(self.event_name, records, client_id)
         except Exception as e:
+            METRICS.observe_channel_error(type(self).__name__)
             logger.error(f"通过PromptServerChannel发送失败: {e}")
             traceback.print_exc()
 
+    def _connected_sids(self):
+        """复制当前连接的sid；sockets 由事件循环增删，在发送线程上复制时可能遇到并发修改"""
+        sockets = prompt_server.sockets
+        for _ in range(self.SOCKETS_SNAPSHOT_RETRIES):
+            try:
+                return list(sockets)
+            except RuntimeError:
+                # dictionary changed size during iteration
+                continue
+        # 多次冲突时在事件循环上复制
+        future = concurrent.futures.Future()
+        prompt_server.loop.call_soon_threadsafe(lambda: future.set_result(list(sockets)))
+        return future.result(timeout=self.SOCKETS_SNAPSHOT_TIMEOUT)
+
+    def _send_filtered(self, info_data_list):
+        """有订阅过滤时逐个连接发送: 已注册过滤的sid只收到匹配主题的记录，其余按原投递方式
+
+        per_client 投递时订阅过滤也只放行该sid自己的prompt。
+        """
+        subscriptions = SUBSCRIPTIONS.snapshot()
+        connected = self._connected_sids()
+        assigned = self.topic_router.assign(info_data_list)
+        shared = per_client = None
+        if self.router is not None:
+            shared, per_client = self.router.split(info_data_list)
+        for sid in connected:
+            topics = subscriptions.get(sid)
+            if topics is not None:
+                records = TopicRouter.filter(assigned, topics, owner=sid if self.router is not None else None)
+            elif self.router is None:
+                records = info_data_list
+            else:
+                records = shared + per_client.get(sid, [])
+            if records:
+                prompt_server.send_sync(self.event_name, records, sid)
+        SUBSCRIPTIONS.prune(connected)
+
     def is_enabled(self):
         return self.enabled
 
+# Redis连接池按连接参数共享，同一进程内的多个Redis写入方复用连接
+_redis_pools = {}
+
+def get_redis_client(host, port, password=None, db=0):
+    import redis
+    key = (host, port, password, db)
+    pool = _redis_pools.get(key)
+    if pool is None:
+        pool = _redis_pools[key] = redis.ConnectionPool(
+            host=host,
+            port=port,
+            password=password,
+            db=db,
+            decode_responses=True
+        )
+    return redis.StrictRedis(connection_pool=pool)
+
 class RedisChannel(NotificationChannel):
-    def __init__(self):
+    """Redis渠道
+
+    redis_mode 为 pubsub 时 PUBLISH 整个记录列表；为 stream 时每条记录 XADD 到 Stream
+    (近似 MAXLEN 裁剪)，消费方可以用消费组读取并从任意ID续读；both 同时写两者。
+    启用 state_enabled(或 redis_mode 为 state)时另写入带TTL的实例/prompt最新状态键，见 RedisStateWriter。
+    启用压缩时超过阈值的频道消息与Stream条目的 data 字段带信封头压缩，见 compression.decompress_payload()。
+    一次发送的所有命令通过同一个 pipeline 在一次往返中完成。
+    """
+
+    def __init__(self, client=None):
         self.enabled = APP_CONFIG.redis_enabled
         self.redis_client = None
+        self.channel_name = APP_CONFIG.redis_channel_name
+        self.mode = APP_CONFIG.redis_mode
+        self.stream_name = APP_CONFIG.redis_stream_name
+        self.stream_maxlen = APP_CONFIG.redis_stream_maxlen
+        # 派生频道 <channel_name>:<主题>，只在 pubsub 模式下发布
+        self.topic_router = TopicRouter(APP_CONFIG.topics) if APP_CONFIG.topics else None
+        self.state_writer = None
+        if APP_CONFIG.redis_state_enabled or self.mode == "state":
+            self.state_writer = RedisStateWriter(
+                prefix=APP_CONFIG.redis_state_prefix,
+                instance_ttl=APP_CONFIG.redis_state_ttl_seconds,
+                prompt_ttl=APP_CONFIG.redis_prompt_ttl_seconds,
+            )
+        # 状态键的心跳线程，空闲时没有广播也定期刷新实例键
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+        if client is not None:
+            self.enabled = True
+            self.redis_client = client
+            self._start_heartbeat()
+            return
         if self.enabled:
             try:
-                import redis
-                self.redis_client = redis.StrictRedis(
-                    host=APP_CONFIG.redis_host,
-                    port=APP_CONFIG.redis_port,
-                    password=APP_CONFIG.redis_password,
-                    db=APP_CONFIG.redis_db,
-                    decode_responses=True
+                self.redis_client = get_redis_client(
+                    APP_CONFIG.redis_host,
+                    APP_CONFIG.redis_port,
+                    APP_CONFIG.redis_password,
+                    APP_CONFIG.redis_db
                 )
                 self.redis_client.ping()
-                self.channel_name = APP_CONFIG.redis_channel_name
-                logger.info(f"RedisChannel已启用，连接到 {APP_CONFIG.redis_host}:{APP_CONFIG.redis_port}，频道: {self.channel_name}")
+                logger.info(f"RedisChannel已启用，连接到 {APP_CONFIG.redis_host}:{APP_CONFIG.redis_port}，模式: {self.mode}，频道: {self.channel_name}，Stream: {self.stream_name}")
+                self._start_heartbeat()
             except ImportError:
                 logger.error("未找到Redis库。请安装: pip install redis")
                 self.enabled = False
@@ -68,29 +178,126 @@ class RedisChannel(NotificationChannel):
                 logger.error(f"初始化RedisChannel失败: {e}")
                 self.enabled = False
 
+    @property
+    def publish_enabled(self):
+        return self.mode in ("pubsub", "both")
+
+    @property
+    def stream_enabled(self):
+        return self.mode in ("stream", "both")
+
     def send(self, info_data_list):
         if not self.enabled or not self.redis_client:
             return
         try:
-            message = json.dumps(info_data_list)
-            self.redis_client.publish(self.channel_name, message)
+            pipe = self.redis_client.pipeline(transaction=False)
+            if self.publish_enabled:
+                pipe.publish(self.channel_name, compress_payload(info_data_list))
+                if self.topic_router is not None:
+                    for topic, records in self.topic_router.route(info_data_list).items():
+                        pipe.publish(f"{self.channel_name}:{topic}", compress_bytes(encode_payload(records)))
+            if self.stream_enabled:
+                for record, encoded in zip(info_data_list, compress_records(info_data_list)):
+                    pipe.xadd(
+                        self.stream_name,
+                        self._stream_fields(record, encoded),
+                        maxlen=self.stream_maxlen,
+                        approximate=True
+                    )
+            if self.state_writer is not None:
+                self.state_writer.write(pipe, info_data_list)
+            pipe.execute()
         except Exception as e:
+            METRICS.observe_channel_error(type(self).__name__)
             logger.error(f"通过RedisChannel发送失败: {e}")
 
+    def _start_heartbeat(self):
+        if self.state_writer is None or self._heartbeat_thread is not None:
+            return
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, name="KY_monitor-redis-heartbeat",
+                                                  daemon=True)
+        self._heartbeat_thread.start()
+
+    def _heartbeat_loop(self):
+        while not self._heartbeat_stop.wait(self.state_writer.heartbeat_interval):
+            self.heartbeat()
+
+    def heartbeat(self):
+        """刷新超过心跳间隔未写入的实例键，与广播是否发生无关"""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            if self.state_writer.heartbeat(pipe):
+                pipe.execute()
+        except Exception as e:
+            METRICS.observe_channel_error(type(self).__name__)
+            logger.error(f"写入Redis状态心跳失败: {e}")
+
+    def shutdown(self):
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(5)
+            self._heartbeat_thread = None
+
+    @staticmethod
+    def _stream_fields(record, encoded):
+        fields = {"event": record.get("event") or "", "data": encoded}
+        if record.get("instance_id") is not None:
+            fields["instance_id"] = str(record["instance_id"])
+        data = record.get("data")
+        if isinstance(data, dict) and data.get("prompt_id") is not None:
+            fields["prompt_id"] = str(data["prompt_id"])
+        return fields
+
     def is_enabled(self):
         return self.enabled and self.redis_client is not None
 
 class RocketMQChannel(NotificationChannel):
-    def __init__(self):
+    """RocketMQ渠道
+
+    生产者在初始化时启动一次，shutdown() 时关闭，发送路径不再检查启动状态。
+    send_mode: sync(send_sync，默认) / async(send_async，客户端不支持时回退到oneway) / oneway(send_oneway)。
+    batch_size > 0 时跨多次广播按tag缓冲记录，攒满 batch_size 条或 linger_ms 到期后合并为一条消息发送，
+    shutdown() 时发送剩余记录；0 表示每次广播一条消息。消息keys为其中的prompt_id(空格分隔)，
+    便于Broker按prompt建立索引。启用压缩时超过阈值的消息体带信封头压缩。
+    producer/message_factory 可注入，便于离线替换为桩对象。
+    """
+
+    # RocketMQ 以空格分隔多个key
+    KEY_SEPARATOR = " "
+    MAX_KEYS = 32
+    DEFAULT_KEY = "ky_monitor_update"
+    # 主消息的tag，主题消息以主题为tag
+    STATUS_TAG = "comfyui_status"
+
+    def __init__(self, producer=None, message_factory=None):
         self.enabled = APP_CONFIG.rocketmq_enabled
         self.producer = None
+        self.topic = APP_CONFIG.rocketmq_topic
+        self.send_mode = APP_CONFIG.rocketmq_send_mode
+        self.batch_size = max(0, APP_CONFIG.rocketmq_batch_size)
+        self.linger_seconds = max(0, APP_CONFIG.rocketmq_linger_ms) / 1000.0
+        # batch_size > 0 时跨多次send()按tag缓冲的 (记录, 序列化字节)，主题记录以主题为tag
+        self._buffers = {}
+        self._buffer_lock = threading.Lock()
+        self._linger_timer = None
+        # 每个主题额外发送一条以主题为tag的消息，消费方按tag订阅
+        self.topic_router = TopicRouter(APP_CONFIG.topics) if APP_CONFIG.topics else None
+        self._message_factory = message_factory
+        self._started = False
+        self.send_errors = 0
+        if producer is not None:
+            self.enabled = True
+            self.producer = producer
+            self._start_producer()
+            return
         if self.enabled:
             try:
                 from rocketmq.client import Producer, Message
                 self.producer = Producer(APP_CONFIG.rocketmq_group_id)
                 self.producer.set_name_server_address(APP_CONFIG.rocketmq_namesrv_addr)
-                self.topic = APP_CONFIG.rocketmq_topic
-                logger.info(f"RocketMQChannel已启用，NameServer: {APP_CONFIG.rocketmq_namesrv_addr}，Topic: {self.topic}")
+                self._message_factory = self._message_factory or Message
+                self._start_producer()
+                logger.info(f"RocketMQChannel已启用，NameServer: {APP_CONFIG.rocketmq_namesrv_addr}，Topic: {self.topic}，发送方式: {self.send_mode}")
             except ImportError:
                 logger.error("未找到RocketMQ客户端库。请安装: pip install rocketmq-client-python")
                 self.enabled = False
@@ -98,42 +305,133 @@ class RocketMQChannel(NotificationChannel):
                 logger.error(f"初始化RocketMQChannel失败: {e}")
                 self.enabled = False
 
+    def _start_producer(self):
+        self.producer.start()
+        self._started = True
+        if self.send_mode == "async" and not hasattr(self.producer, "send_async"):
+            logger.warning("RocketMQ客户端不支持send_async，回退到oneway发送")
+            self.send_mode = "oneway"
+
+    def _new_message(self):
+        if self._message_factory is None:
+            from rocketmq.client import Message
+            self._message_factory = Message
+        return self._message_factory(self.topic)
+
+    def _buffer_records(self, tags, records):
+        """把记录加入该tag的缓冲区，返回已攒满 batch_size 的批次；剩余记录在 linger 到期后发送"""
+        batches = []
+        with self._buffer_lock:
+            buffer = self._buffers.setdefault(tags, [])
+            buffer.extend(zip(records, encode_records(records)))
+            while len(buffer) >= self.batch_size:
+                batches.append(buffer[:self.batch_size])
+                del buffer[:self.batch_size]
+            if not buffer:
+                del self._buffers[tags]
+            if self._buffers and self._linger_timer is None:
+                self._linger_timer = threading.Timer(self.linger_seconds, self.flush)
+                self._linger_timer.daemon = True
+                self._linger_timer.start()
+        return batches
+
+    def flush(self):
+        """立即发送各tag缓冲区中的记录"""
+        with self._buffer_lock:
+            buffers, self._buffers = self._buffers, {}
+            if self._linger_timer is not None:
+                self._linger_timer.cancel()
+                self._linger_timer = None
+        if not self._started:
+            return
+        for tags, batch in buffers.items():
+            self._send_guarded(lambda: self._send_batch(batch, tags))
+
+    def _send_batch(self, batch, tags):
+        records = [record for record, _ in batch]
+        # 直接拼接已序列化的记录，不再重新序列化
+        body = compress_bytes(b"[" + b",".join(encoded for _, encoded in batch) + b"]")
+        self._send_message(records, body, tags)
+
+    @classmethod
+    def message_keys(cls, records):
+        """从记录中收集prompt_id作为消息keys"""
+        keys = []
+        for record in records:
+            data = record.get("data") if isinstance(record, dict) else None
+            if not isinstance(data, dict):
+                continue
+            if data.get("prompt_id") is not None:
+                candidates = [data["prompt_id"]]
+            else:
+                candidates = [p.get("prompt_id") for p in data.get("prompts") or [] if isinstance(p, dict)]
+            for prompt_id in candidates:
+                if prompt_id is not None and str(prompt_id) not in keys:
+                    keys.append(str(prompt_id))
+                    if len(keys) >= cls.MAX_KEYS:
+                        return cls.KEY_SEPARATOR.join(keys)
+        return cls.KEY_SEPARATOR.join(keys) if keys else cls.DEFAULT_KEY
+
     def send(self, info_data_list):
-        if not self.enabled or not self.producer:
+        if not self.enabled or not self.producer or not self._started:
+            return
+
+        self._send_guarded(lambda: self._send_records(info_data_list))
+
+    def _send_records(self, info_data_list):
+        routed = self.topic_router.route(info_data_list) if self.topic_router is not None else {}
+        if self.batch_size:
+            # 主题记录与主消息一样按 batch_size/linger_ms 合并，每个tag单独缓冲
+            for tags, records in [(self.STATUS_TAG, info_data_list)] + list(routed.items()):
+                for batch in self._buffer_records(tags, records):
+                    self._send_batch(batch, tags)
             return
-        
-        from rocketmq.client import Message
+        self._send_message(info_data_list, compress_payload(info_data_list), self.STATUS_TAG)
+        for topic, records in routed.items():
+            self._send_message(records, compress_bytes(encode_payload(records)), topic)
+
+    def _send_guarded(self, send):
         try:
-            body = json.dumps(info_data_list)
-            msg = Message(self.topic)
-            msg.set_keys("ky_monitor_update")
-            msg.set_tags("comfyui_status")
-            msg.set_body(body)
-            
-            if hasattr(self.producer, 'is_running') and not self.producer.is_running():
-                logger.info("启动RocketMQ生产者...")
-                self.producer.start()
-            elif not hasattr(self.producer, 'is_running'):
-                try:
-                    if hasattr(self.producer, 'start') and not getattr(self.producer, '_running', False):
-                        logger.info("尝试启动RocketMQ生产者...")
-                        self.producer.start()
-                except Exception as start_e:
-                    logger.error(f"无法确保RocketMQ生产者启动: {start_e}")
-                    return
-
-            ret = self.producer.send_sync(msg)
+            send()
         except Exception as e:
+            self.send_errors += 1
+            METRICS.observe_channel_error(type(self).__name__)
             logger.error(f"通过RocketMQChannel发送失败: {e}")
             traceback.print_exc()
 
+    def _send_message(self, records, body, tags):
+        msg = self._new_message()
+        msg.set_keys(self.message_keys(records))
+        msg.set_tags(tags)
+        msg.set_body(body)
+
+        if self.send_mode == "oneway":
+            self.producer.send_oneway(msg)
+        elif self.send_mode == "async":
+            self.producer.send_async(msg, self._on_send_success, self._on_send_error)
+        else:
+            self.producer.send_sync(msg)
+
+    def _on_send_success(self, result):
+        pass
+
+    def _on_send_error(self, e):
+        self.send_errors += 1
+        METRICS.observe_channel_error(type(self).__name__)
+        logger.error(f"RocketMQ异步发送失败: {e}")
+
     def is_enabled(self):
         return self.enabled and self.producer is not None
 
     def shutdown(self):
+        if not self._started:
+            return
+        # 关闭生产者前发送缓冲区中剩余的记录
+        self.flush()
+        self._started = False
         if self.producer and hasattr(self.producer, 'shutdown'):
             try:
                 logger.info("关闭RocketMQ生产者...")
                 self.producer.shutdown()
             except Exception as e:
-                logger.error(f"关闭RocketMQ生产者失败: {e}") 
\ No newline at end of file
+                logger.error(f"关闭RocketMQ生产者失败: {e}")
@@ -0,0 +1,65 @@
+import time
+import threading
+import logging
+# 信封格式与解压在 common.compression 中，与聚合器共用；decompress_payload/codec_available 在此一并导出
+from ..common.compression import CODECS, codec_available, codec_functions, decompress_payload, envelope_header
+
+logger = logging.getLogger("KY_monitor_compression")
+
+
+class PayloadCompressor:
+    """序列化后的载荷超过 threshold 字节时压缩，并加上注明算法的信封头
+
+    压缩后没有变小的载荷按原样发送。zstd 需要 Python 3.14+ 或 zstandard 库，不可用时回退到 zlib。
+    level 为 -1 时使用默认级别(zlib/gzip 为6，zstd 为3)。
+    """
+
+    def __init__(self, codec="zlib", threshold=32768, level=-1):
+        codec = (codec or "zlib").lower()
+        if codec not in CODECS:
+            logger.warning(f"未知的压缩算法 {codec}，使用 zlib")
+            codec = "zlib"
+        try:
+            self._compress, _ = codec_functions(codec)
+        except ImportError:
+            logger.warning("zstd 不可用(需要 Python 3.14+ 或 pip install zstandard)，使用 zlib")
+            codec = "zlib"
+            self._compress, _ = codec_functions(codec)
+        self.codec = codec
+        self.threshold = max(0, int(threshold))
+        self.level = int(level)
+        self._header = envelope_header(codec)
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def compress(self, data: bytes) -> bytes:
+        if len(data) < self.threshold:
+            return data
+        started = time.perf_counter()
+        body = self._compress(data, self.level)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.seconds += elapsed
+            if len(body) + len(self._header) >= len(data):
+                self.skipped += 1
+                return data
+            self.compressed += 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(body) + len(self._header)
+        return self._header + body
+
+    def stats(self) -> dict:
+        return {
+            "codec": self.codec,
+            "threshold": self.threshold,
+            "compressed": self.compressed,
+            "skipped": self.skipped,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": self.bytes_out / self.bytes_in if self.bytes_in else None,
+            "seconds": self.seconds,
+        }
@@ -0,0 +1,109 @@
+import time
+import logging
+
+logger = logging.getLogger("KY_monitor_delta")
+
+KEYFRAME_EVENT = "ky_monitor.queue"
+DELTA_EVENT = "ky_monitor.delta"
+
+# 增量记录类型
+OP_ADDED = "added"
+OP_REMOVED = "removed"
+OP_PROGRESS = "progress"
+OP_STATUS = "status"
+OP_CHANGED = "changed"
+OP_QUEUE_STATUS = "queue_status"
+
+
+class DeltaPublisher:
+    """记录每个prompt_id上一次发布的状态，只生成变化部分的增量记录
+
+    每条记录带递增的 seq，订阅方发现 seq 不连续时应等待下一个关键帧重新同步。
+    关键帧(完整快照)按 keyframe_seconds 周期发送，首次调用一定是关键帧。
+    diff() 只在被调用时检查关键帧是否到期，状态长时间无变化时由调用方按 seconds_until_keyframe() 触发。
+    """
+
+    def __init__(self, keyframe_seconds=30, keyframe_event=KEYFRAME_EVENT, delta_event=DELTA_EVENT,
+                 clock=time.monotonic):
+        self.keyframe_seconds = keyframe_seconds
+        self.keyframe_event = keyframe_event
+        self.delta_event = delta_event
+        self._last_prompts = {}
+        self._last_queue_status = None
+        self._last_keyframe_at = None
+        self._seq = 0
+        self._clock = clock
+
+    def reset(self):
+        """丢弃已发布状态，下一次调用将发送关键帧"""
+        self._last_prompts = {}
+        self._last_queue_status = None
+        self._last_keyframe_at = None
+
+    def seconds_until_keyframe(self) -> float:
+        """距离下一个关键帧的秒数，0 表示下一次 diff() 将发送关键帧"""
+        if self._last_keyframe_at is None:
+            return 0.0
+        return max(0.0, self._last_keyframe_at + self.keyframe_seconds - self._clock())
+
+    def diff(self, snapshot: dict) -> list:
+        """根据最新快照返回需要发布的记录列表，无变化时返回空列表"""
+        if not isinstance(snapshot, dict) or "prompts" not in snapshot:
+            return []
+
+        prompts = {p.get("prompt_id"): p for p in snapshot["prompts"]}
+        queue_status = snapshot.get("queue_status")
+
+        now = self._clock()
+        if self._last_keyframe_at is None or now - self._last_keyframe_at >= self.keyframe_seconds:
+            self._last_keyframe_at = now
+            records = [self._keyframe(snapshot)]
+        else:
+            records = self._delta(prompts, queue_status)
+
+        self._last_prompts = prompts
+        self._last_queue_status = queue_status
+        return records
+
+    def _keyframe(self, snapshot: dict) -> dict:
+        self._seq += 1
+        data = dict(snapshot)
+        data["seq"] = self._seq
+        data["keyframe"] = True
+        return {"event": self.keyframe_event, "data": data}
+
+    def _record(self, op: str, **fields) -> dict:
+        self._seq += 1
+        data = {"seq": self._seq, "op": op}
+        data.update(fields)
+        return {"event": self.delta_event, "data": data}
+
+    def _delta(self, prompts: dict, queue_status) -> list:
+        records = []
+        last_prompts = self._last_prompts
+
+        if queue_status != self._last_queue_status:
+            records.append(self._record(OP_QUEUE_STATUS, queue_status=queue_status))
+
+        # 按上次快照中的顺序输出，保证记录顺序稳定
+        for prompt_id in last_prompts:
+            if prompt_id not in prompts:
+                records.append(self._record(OP_REMOVED, prompt_id=prompt_id))
+
+        for prompt_id, prompt in prompts.items():
+            previous = last_prompts.get(prompt_id)
+            if previous is None:
+                records.append(self._record(OP_ADDED, prompt_id=prompt_id, prompt=prompt))
+            elif previous == prompt:
+                continue
+            elif previous.get("status") != prompt.get("status"):
+                records.append(self._record(OP_STATUS, prompt_id=prompt_id, prompt=prompt))
+            elif _without_progress(previous) == _without_progress(prompt):
+                records.append(self._record(OP_PROGRESS, prompt_id=prompt_id, progress=prompt.get("progress")))
+            else:
+                records.append(self._record(OP_CHANGED, prompt_id=prompt_id, prompt=prompt))
+        return records
+
+
+def _without_progress(prompt: dict) -> dict:
+    return {k: v for k, v in prompt.items() if k != "progress"}
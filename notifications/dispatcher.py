@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+import logging
+from ..metrics import METRICS
+
+logger = logging.getLogger("KY_monitor_dispatcher")
+
+_STOP = object()
+
+
+class ChannelWorker:
+    """单个渠道的发送队列与工作线程
+
+    submit() 只做入队，不等待网络I/O；队列满时丢弃最旧的一批记录，保证订阅方拿到的是最新状态。
+    """
+
+    def __init__(self, channel, maxsize=1000):
+        self.channel = channel
+        self.name = type(channel).__name__
+        self._queue = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._thread = None
+        self.submitted = 0
+        self.dropped = 0
+        self.sent = 0
+        self.errors = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"KY_monitor-{self.name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, info_data_list):
+        self.submitted += 1
+        try:
+            self._queue.put_nowait(info_data_list)
+            return
+        except queue.Full:
+            pass
+        try:
+            self._queue.get_nowait()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(info_data_list)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=5.0):
+        """等待队列中剩余记录发送完毕后停止线程"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"{self.name} 发送队列已满，停止时丢弃剩余记录")
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "channel": self.name,
+            "depth": self._queue.qsize(),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "errors": self.errors,
+            "last_latency_ms": round(self.last_latency * 1000, 3),
+            "avg_latency_ms": round(self._total_latency / self.sent * 1000, 3) if self.sent else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            started = time.perf_counter()
+            try:
+                self.channel.send(item)
+            except Exception as e:
+                self.errors += 1
+                METRICS.observe_channel_error(self.name)
+                logger.error(f"广播到 {self.name} 时发生未处理的错误: {e}")
+            latency = time.perf_counter() - started
+            METRICS.observe_channel_send(self.name, latency)
+            self.sent += 1
+            self.last_latency = latency
+            self._total_latency += latency
+            if latency > self.max_latency:
+                self.max_latency = latency
+            self._observe_size(item)
+
+    def _observe_size(self, item):
+        """各渠道共享同一个 EncodedPayload，已有渠道序列化时不会重复记录"""
+        observe_size = getattr(item, "observe_size", None)
+        if observe_size is None:
+            return
+        try:
+            observe_size()
+        except Exception as e:
+            logger.error(f"记录载荷大小失败: {e}")
+
+
+class Dispatcher:
+    """为每个渠道维护独立的有界队列和工作线程，监控tick不会等待任何渠道的I/O"""
+
+    def __init__(self, channels, maxsize=1000):
+        self.workers = [ChannelWorker(channel, maxsize) for channel in channels]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, info_data_list):
+        for worker in self.workers:
+            worker.submit(info_data_list)
+
+    def stop(self, timeout=5.0):
+        for worker in self.workers:
+            worker.stop(timeout)
+
+    def stats(self) -> list:
+        return [worker.stats() for worker in self.workers]
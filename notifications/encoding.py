@@ -0,0 +1,208 @@
+import json
+import threading
+import time
+import logging
+from ..metrics import METRICS
+from .compression import PayloadCompressor
+
+logger = logging.getLogger("KY_monitor_encoding")
+
+
+def _stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _load_orjson():
+    import orjson
+    option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=option)
+    return dumps
+
+
+def _load_msgspec():
+    import msgspec
+    return msgspec.json.Encoder().encode
+
+
+_BACKEND_LOADERS = {
+    "orjson": _load_orjson,
+    "msgspec": _load_msgspec,
+}
+
+
+def load_json_backend(name="auto"):
+    """返回 (后端名称, dumps函数)，dumps 输出UTF-8字节；首选后端不可用时回退到标准库json"""
+    name = (name or "auto").lower()
+    candidates = ["orjson", "msgspec"] if name == "auto" else [name]
+    for candidate in candidates:
+        if candidate == "json":
+            break
+        loader = _BACKEND_LOADERS.get(candidate)
+        if loader is None:
+            logger.warning(f"未知的JSON后端 {candidate}，使用标准库json")
+            break
+        try:
+            return candidate, loader()
+        except ImportError:
+            if name != "auto":
+                logger.warning(f"JSON后端 {candidate} 未安装，使用标准库json")
+    return "json", _stdlib_dumps
+
+
+class PayloadEncoder:
+    """把一次广播的记录列表序列化为字节，快速后端失败时回退到标准库json"""
+
+    def __init__(self, backend="auto"):
+        self.backend, self._dumps = load_json_backend(backend)
+        self.fallbacks = 0
+
+    def encode(self, obj) -> bytes:
+        if self._dumps is _stdlib_dumps:
+            return _stdlib_dumps(obj)
+        try:
+            return self._dumps(obj)
+        except TypeError:
+            self.fallbacks += 1
+            return _stdlib_dumps(obj)
+
+
+class EncodedPayload(list):
+    """一次广播的记录列表，序列化结果在各渠道之间共享
+
+    仍然是普通 list，PromptServerChannel 等需要Python对象的渠道不受影响；
+    需要字节的渠道通过 encode_payload() 取得只序列化一次的结果。
+    """
+
+    def __init__(self, records, encoder):
+        super().__init__(records)
+        self._encoder = encoder
+        self._encoded = None
+        self._encoded_records = None
+        self._compressed = None
+        self._compressed_records = None
+        # 整体与逐条两种序列化都可能发生，载荷大小每次广播只记录一次
+        self._size_observed = False
+        self._lock = threading.Lock()
+
+    @property
+    def encoded(self) -> bytes:
+        if self._encoded is None:
+            with self._lock:
+                if self._encoded is None:
+                    started = time.perf_counter()
+                    self._encoded = self._encoder.encode(list(self))
+                    METRICS.encode_seconds.observe(time.perf_counter() - started)
+                    self._observe_size(len(self._encoded))
+        return self._encoded
+
+    @property
+    def encoded_records(self) -> list:
+        """逐条记录的序列化结果，供按记录写入的渠道(Redis Streams、RocketMQ批量)共享"""
+        if self._encoded_records is None:
+            with self._lock:
+                if self._encoded_records is None:
+                    started = time.perf_counter()
+                    self._encoded_records = [self._encoder.encode(record) for record in self]
+                    METRICS.encode_seconds.observe(time.perf_counter() - started)
+                    self._observe_size(sum(len(encoded) for encoded in self._encoded_records))
+        return self._encoded_records
+
+    def observe_size(self):
+        """确保本次广播的载荷大小已记录，没有渠道需要字节(如只启用PromptServer)时按整体序列化结果记录"""
+        if not self._size_observed:
+            self.encoded
+
+    def _observe_size(self, size):
+        if not self._size_observed:
+            self._size_observed = True
+            METRICS.payload_bytes.observe(size)
+
+    def compressed(self, compressor) -> bytes:
+        """整个记录列表压缩后的结果(未超过阈值时为序列化结果)"""
+        if self._compressed is None:
+            encoded = self.encoded
+            with self._lock:
+                if self._compressed is None:
+                    self._compressed = compressor.compress(encoded)
+        return self._compressed
+
+    def compressed_records(self, compressor) -> list:
+        if self._compressed_records is None:
+            encoded_records = self.encoded_records
+            with self._lock:
+                if self._compressed_records is None:
+                    self._compressed_records = [compressor.compress(encoded) for encoded in encoded_records]
+        return self._compressed_records
+
+
+_default_encoder = None
+_default_compressor = None
+_compressor_loaded = False
+
+
+def get_encoder() -> PayloadEncoder:
+    global _default_encoder
+    if _default_encoder is None:
+        from ..config import APP_CONFIG
+        _default_encoder = PayloadEncoder(APP_CONFIG.json_backend)
+        logger.info(f"JSON序列化后端: {_default_encoder.backend}")
+    return _default_encoder
+
+
+def encode_payload(info_data_list) -> bytes:
+    """取得记录列表的序列化字节，EncodedPayload 只会序列化一次"""
+    if isinstance(info_data_list, EncodedPayload):
+        return info_data_list.encoded
+    return get_encoder().encode(info_data_list)
+
+
+def encode_records(info_data_list) -> list:
+    """逐条序列化记录列表，EncodedPayload 只会序列化一次"""
+    if isinstance(info_data_list, EncodedPayload):
+        return info_data_list.encoded_records
+    encoder = get_encoder()
+    return [encoder.encode(record) for record in info_data_list]
+
+
+def get_compressor():
+    """配置的载荷压缩器，未启用压缩时返回None"""
+    global _default_compressor, _compressor_loaded
+    if not _compressor_loaded:
+        from ..config import APP_CONFIG
+        if APP_CONFIG.compression_codec not in ("", "none"):
+            _default_compressor = PayloadCompressor(
+                APP_CONFIG.compression_codec,
+                threshold=APP_CONFIG.compression_threshold_bytes,
+                level=APP_CONFIG.compression_level,
+            )
+            logger.info(f"载荷压缩: {_default_compressor.codec}，阈值 {_default_compressor.threshold} 字节")
+        _compressor_loaded = True
+    return _default_compressor
+
+
+def compress_payload(info_data_list) -> bytes:
+    """encode_payload() 的结果，启用压缩且超过阈值时压缩；EncodedPayload 只会压缩一次"""
+    compressor = get_compressor()
+    if compressor is None:
+        return encode_payload(info_data_list)
+    if isinstance(info_data_list, EncodedPayload):
+        return info_data_list.compressed(compressor)
+    return compressor.compress(get_encoder().encode(info_data_list))
+
+
+def compress_records(info_data_list) -> list:
+    """encode_records() 的结果，逐条按阈值压缩"""
+    compressor = get_compressor()
+    if compressor is None:
+        return encode_records(info_data_list)
+    if isinstance(info_data_list, EncodedPayload):
+        return info_data_list.compressed_records(compressor)
+    return [compressor.compress(encoded) for encoded in encode_records(info_data_list)]
+
+
+def compress_bytes(data: bytes) -> bytes:
+    """对已序列化的字节按阈值压缩"""
+    compressor = get_compressor()
+    return data if compressor is None else compressor.compress(data)
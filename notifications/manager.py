@@ -1,37 +1,115 @@
+import time
+import socket
 import logging
+from ..config import APP_CONFIG
+from ..metrics import METRICS
 from .channel import set_prompt_server, PromptServerChannel, RedisChannel, RocketMQChannel
+from .dispatcher import Dispatcher
+from .encoding import EncodedPayload, get_encoder
 
 logger = logging.getLogger("KY_monitor_manager")
 
 # 所有渠道实例列表
 ACTIVE_CHANNELS = []
+# 异步发送管道，dispatch_async 关闭时为None
+DISPATCHER = None
+
+# 本实例ID，initialize_channels 时确定，附加在每条广播记录上
+INSTANCE_ID = None
+
+# 渠道工厂注册表: 名称 -> (是否启用, 工厂)
+# 只有启用的渠道才会调用工厂，Redis/RocketMQ 客户端库在工厂(渠道构造)内部才导入
+CHANNEL_FACTORIES = {}
+
+def register_channel(name, is_enabled, factory):
+    """注册渠道工厂，is_enabled 与 factory 均为无参可调用对象"""
+    CHANNEL_FACTORIES[name] = (is_enabled, factory)
+
+register_channel("prompt_server", lambda: APP_CONFIG.prompt_server_enabled, PromptServerChannel)
+register_channel("redis", lambda: APP_CONFIG.redis_enabled, RedisChannel)
+register_channel("rocketmq", lambda: APP_CONFIG.rocketmq_enabled, RocketMQChannel)
+
+def resolve_instance_id(ps_instance=None):
+    """配置的 instance_id，未配置时为 主机名:ComfyUI端口(同一主机上的多个实例按端口区分，重启后不变)"""
+    if APP_CONFIG.instance_id:
+        return str(APP_CONFIG.instance_id)
+    port = None
+    try:
+        from comfy.cli_args import args
+        port = args.port
+    except Exception:
+        port = getattr(ps_instance, "port", None)
+    hostname = socket.gethostname()
+    return f"{hostname}:{port}" if port else hostname
 
 def initialize_channels(ps_instance):
-    global ACTIVE_CHANNELS
+    global ACTIVE_CHANNELS, DISPATCHER, INSTANCE_ID
     set_prompt_server(ps_instance)
-    
+    INSTANCE_ID = resolve_instance_id(ps_instance)
+
     ACTIVE_CHANNELS = []
-    
-    ps_channel = PromptServerChannel()
-    if ps_channel.is_enabled():
-        ACTIVE_CHANNELS.append(ps_channel)
-
-    redis_channel = RedisChannel()
-    if redis_channel.is_enabled():
-        ACTIVE_CHANNELS.append(redis_channel)
-    
-    rocketmq_channel = RocketMQChannel()
-    if rocketmq_channel.is_enabled():
-        ACTIVE_CHANNELS.append(rocketmq_channel)
-    
-    logger.info(f"已初始化 {len(ACTIVE_CHANNELS)} 个活动渠道")
+    rocketmq_channel = None
+
+    for name, (is_enabled, factory) in CHANNEL_FACTORIES.items():
+        if not is_enabled():
+            logger.debug(f"渠道 {name} 未启用，跳过加载")
+            continue
+        try:
+            channel = factory()
+        except Exception as e:
+            logger.error(f"创建渠道 {name} 失败: {e}")
+            continue
+        if channel.is_enabled():
+            ACTIVE_CHANNELS.append(channel)
+            if isinstance(channel, RocketMQChannel):
+                rocketmq_channel = channel
+
+    if DISPATCHER is not None:
+        DISPATCHER.stop()
+        DISPATCHER = None
+    if APP_CONFIG.dispatch_async and ACTIVE_CHANNELS:
+        DISPATCHER = Dispatcher(ACTIVE_CHANNELS, maxsize=APP_CONFIG.dispatch_queue_size)
+        DISPATCHER.start()
+
+    logger.info(f"已初始化 {len(ACTIVE_CHANNELS)} 个活动渠道，实例ID: {INSTANCE_ID}")
     return ACTIVE_CHANNELS, rocketmq_channel
 
 def broadcast_info(info_data_list):
     if not info_data_list:
         return
+    if INSTANCE_ID is not None:
+        for record in info_data_list:
+            record["instance_id"] = INSTANCE_ID
+    # 所有渠道共享同一份序列化结果
+    info_data_list = EncodedPayload(info_data_list, get_encoder())
+    if DISPATCHER is not None:
+        # 载荷大小由工作线程在发送后记录，tick 不做额外的序列化
+        DISPATCHER.submit(info_data_list)
+        return
     for channel in ACTIVE_CHANNELS:
+        name = type(channel).__name__
+        started = time.perf_counter()
         try:
             channel.send(info_data_list)
         except Exception as e:
-            logger.error(f"广播到 {type(channel).__name__} 时发生未处理的错误: {e}") 
\ No newline at end of file
+            METRICS.observe_channel_error(name)
+            logger.error(f"广播到 {name} 时发生未处理的错误: {e}")
+        METRICS.observe_channel_send(name, time.perf_counter() - started)
+    if ACTIVE_CHANNELS:
+        info_data_list.observe_size()
+
+def dispatch_stats():
+    """各渠道发送队列的深度、丢弃数和发送耗时"""
+    if DISPATCHER is None:
+        return []
+    return DISPATCHER.stats()
+
+def shutdown_channels(timeout=5.0):
+    """停止发送管道(尽量发送完剩余记录)并关闭各渠道"""
+    global DISPATCHER
+    if DISPATCHER is not None:
+        DISPATCHER.stop(timeout)
+        DISPATCHER = None
+    for channel in ACTIVE_CHANNELS:
+        if hasattr(channel, "shutdown"):
+            channel.shutdown()
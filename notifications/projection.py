@@ -0,0 +1,188 @@
+import logging
+
+logger = logging.getLogger("KY_monitor_projection")
+
+_MISSING = object()
+
+# 预置配置: 路径相对于快照中的单个prompt条目，"*" 匹配任意键或列表元素
+PROFILES = {
+    "full": {},
+    "standard": {
+        "exclude": ["info.prompts"],
+    },
+    "minimal": {
+        "exclude": ["info.prompts"],
+        "summarize_messages": True,
+        "output_refs_only": True,
+    },
+}
+
+# 始终保留的字段，include 为空或未列出时也不会被去掉
+_ALWAYS_KEEP = ("prompt_id", "status")
+
+
+def _split(path):
+    return [part for part in str(path).split(".") if part]
+
+
+def _drop(obj, parts):
+    """返回去掉 parts 指向字段后的副本，未命中时原样返回(不修改原对象)"""
+    head, rest = parts[0], parts[1:]
+    if isinstance(obj, dict):
+        keys = list(obj) if head == "*" else ([head] if head in obj else [])
+        if not keys:
+            return obj
+        new = dict(obj)
+        for key in keys:
+            if rest:
+                new[key] = _drop(obj[key], rest)
+            else:
+                del new[key]
+        return new
+    if isinstance(obj, list) and head == "*":
+        return [_drop(item, rest) for item in obj] if rest else []
+    return obj
+
+
+def _pick(obj, parts):
+    """只保留 parts 指向的字段，未命中返回 _MISSING"""
+    if not parts:
+        return obj
+    head, rest = parts[0], parts[1:]
+    if isinstance(obj, dict):
+        keys = list(obj) if head == "*" else ([head] if head in obj else [])
+        picked = {}
+        for key in keys:
+            value = _pick(obj[key], rest)
+            if value is not _MISSING:
+                picked[key] = value
+        return picked if picked else _MISSING
+    if isinstance(obj, list) and head == "*":
+        picked = [value for value in (_pick(item, rest) for item in obj) if value is not _MISSING]
+        return picked if picked else _MISSING
+    return _MISSING
+
+
+def _merge(base, extra):
+    if isinstance(base, dict) and isinstance(extra, dict):
+        merged = dict(base)
+        for key, value in extra.items():
+            merged[key] = _merge(merged[key], value) if key in merged else value
+        return merged
+    return extra
+
+
+def summarize_messages(messages) -> dict:
+    """把 status.messages 压缩为开始/结束时间戳"""
+    timings = {}
+    for message in messages or []:
+        if not isinstance(message, (list, tuple)) or len(message) < 2 or not isinstance(message[1], dict):
+            continue
+        msg_type, msg_data = message[0], message[1]
+        if msg_type == "execution_start":
+            timings["started_at"] = msg_data.get("timestamp")
+        elif msg_type in ("execution_success", "execution_error", "execution_interrupted"):
+            timings["finished_at"] = msg_data.get("timestamp")
+    if timings.get("started_at") is not None and timings.get("finished_at") is not None:
+        timings["duration_ms"] = timings["finished_at"] - timings["started_at"]
+    return timings
+
+
+def output_refs(outputs) -> dict:
+    """只保留 outputs 中的文件引用(filename/subfolder/type)"""
+    refs = {}
+    if not isinstance(outputs, dict):
+        return refs
+    for node_id, node_output in outputs.items():
+        if not isinstance(node_output, dict):
+            continue
+        files = []
+        for items in node_output.values():
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                if isinstance(item, dict) and "filename" in item:
+                    files.append({k: item.get(k) for k in ("filename", "subfolder", "type")})
+        if files:
+            refs[node_id] = files
+    return refs
+
+
+class PayloadProjection:
+    """按配置裁剪快照中每个prompt条目的字段
+
+    顺序: 摘要messages/outputs -> include -> exclude -> 单字段大小上限。
+    不修改原始对象，history中的outputs/prompt可能仍被ComfyUI引用。
+    """
+
+    def __init__(self, profile="full", include=None, exclude=None, max_field_bytes=0, encoder=None):
+        preset = PROFILES.get(profile)
+        if preset is None:
+            logger.warning(f"未知的载荷配置 {profile}，使用 full")
+            preset = PROFILES["full"]
+        self.profile = profile if profile in PROFILES else "full"
+        self.include = [_split(p) for p in (include or preset.get("include") or [])]
+        self.exclude = [_split(p) for p in list(preset.get("exclude") or []) + list(exclude or [])]
+        self.summarize_messages = preset.get("summarize_messages", False)
+        self.output_refs_only = preset.get("output_refs_only", False)
+        self.max_field_bytes = max(0, int(max_field_bytes or 0))
+        self._encoder = encoder
+        self.truncated_fields = 0
+
+    @property
+    def is_identity(self) -> bool:
+        return not (self.include or self.exclude or self.summarize_messages
+                    or self.output_refs_only or self.max_field_bytes)
+
+    def apply_snapshot(self, snapshot: dict) -> dict:
+        if self.is_identity or not isinstance(snapshot, dict) or "prompts" not in snapshot:
+            return snapshot
+        projected = dict(snapshot)
+        projected["prompts"] = [self.apply(entry) for entry in snapshot["prompts"]]
+        return projected
+
+    def apply(self, entry: dict) -> dict:
+        if not isinstance(entry, dict):
+            return entry
+        info = entry.get("info")
+        if isinstance(info, dict) and (self.summarize_messages or self.output_refs_only):
+            info = dict(info)
+            if self.summarize_messages and "messages" in info:
+                info["timings"] = summarize_messages(info.pop("messages"))
+            if self.output_refs_only and "outputs" in info:
+                info["outputs"] = output_refs(info["outputs"])
+            entry = dict(entry, info=info)
+
+        if self.include:
+            picked = {key: entry[key] for key in _ALWAYS_KEEP if key in entry}
+            for parts in self.include:
+                value = _pick(entry, parts)
+                if value is not _MISSING:
+                    picked = _merge(picked, value)
+            entry = picked
+
+        for parts in self.exclude:
+            entry = _drop(entry, parts)
+
+        if self.max_field_bytes and isinstance(entry.get("info"), dict):
+            entry = dict(entry, info=self._cap_fields(entry["info"]))
+        return entry
+
+    def _cap_fields(self, info: dict) -> dict:
+        capped = None
+        for key, value in info.items():
+            if not isinstance(value, (dict, list, str)):
+                continue
+            size = len(self._encode(value))
+            if size > self.max_field_bytes:
+                if capped is None:
+                    capped = dict(info)
+                capped[key] = {"truncated": True, "size": size}
+                self.truncated_fields += 1
+        return capped if capped is not None else info
+
+    def _encode(self, value) -> bytes:
+        if self._encoder is None:
+            from .encoding import get_encoder
+            self._encoder = get_encoder()
+        return self._encoder.encode(value)
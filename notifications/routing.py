@@ -0,0 +1,90 @@
+import logging
+
+logger = logging.getLogger("KY_monitor_routing")
+
+SUMMARY_EVENT = "ky_monitor.queue_summary"
+
+
+class ClientRouter:
+    """按 client_id 拆分广播记录，用于只把每个客户端自己的prompt发给它
+
+    - 完整快照(data 中有 prompts): 每个客户端得到只含自己prompt的快照，另生成一条只含 queue_status 的共享摘要
+    - 增量记录(data 中有 op): queue_status 记录共享，其余按 prompt 所属客户端投递；
+      progress/removed 记录不带 client_id，按之前见过的 prompt_id -> client_id 映射投递
+    - 其他记录(如 self_report)共享
+    没有 client_id 的prompt(例如通过API提交)不投递给任何客户端。
+
+    全局 seq 拆分后对单个客户端不连续: 投递给客户端的记录按 client_id 重新编号，
+    共享的摘要与 queue_status 记录本身是完整值，去掉 seq。
+    """
+
+    def __init__(self, summary_event=SUMMARY_EVENT):
+        self.summary_event = summary_event
+        self._prompt_clients = {}
+        self._client_seq = {}
+
+    def split(self, records):
+        """返回 (共享记录列表, {client_id: 记录列表})"""
+        shared = []
+        per_client = {}
+        for record in records:
+            data = record.get("data") if isinstance(record, dict) else None
+            if not isinstance(data, dict):
+                shared.append(record)
+            elif isinstance(data.get("prompts"), list):
+                self._split_snapshot(record, data, shared, per_client)
+            elif "op" in data:
+                self._split_delta(record, data, shared, per_client)
+            else:
+                shared.append(record)
+        return shared, per_client
+
+    def _deliver(self, per_client, client_id, record):
+        """按客户端重新编号 seq 后加入该客户端的记录列表"""
+        data = record["data"]
+        if "seq" in data:
+            seq = self._client_seq.get(client_id, 0) + 1
+            self._client_seq[client_id] = seq
+            record = dict(record, data=dict(data, seq=seq))
+        per_client.setdefault(client_id, []).append(record)
+
+    @staticmethod
+    def _without_seq(record):
+        data = record["data"]
+        if "seq" not in data:
+            return record
+        return dict(record, data={key: value for key, value in data.items() if key != "seq"})
+
+    def _split_snapshot(self, record, data, shared, per_client):
+        grouped = {}
+        prompt_clients = {}
+        for prompt in data["prompts"]:
+            client_id = prompt.get("client_id") if isinstance(prompt, dict) else None
+            if client_id is None:
+                continue
+            prompt_clients[prompt.get("prompt_id")] = client_id
+            grouped.setdefault(client_id, []).append(prompt)
+        # 快照包含当前全部prompt，直接替换映射；已没有prompt的客户端不再保留编号
+        self._prompt_clients = prompt_clients
+        self._client_seq = {client_id: seq for client_id, seq in self._client_seq.items() if client_id in grouped}
+
+        summary = {key: value for key, value in data.items() if key not in ("prompts", "seq")}
+        shared.append(dict(record, event=self.summary_event, data=summary))
+        for client_id, prompts in grouped.items():
+            self._deliver(per_client, client_id, dict(record, data=dict(data, prompts=prompts)))
+
+    def _split_delta(self, record, data, shared, per_client):
+        prompt_id = data.get("prompt_id")
+        if prompt_id is None:
+            shared.append(self._without_seq(record))
+            return
+        prompt = data.get("prompt")
+        client_id = prompt.get("client_id") if isinstance(prompt, dict) else None
+        if client_id is not None:
+            self._prompt_clients[prompt_id] = client_id
+        else:
+            client_id = self._prompt_clients.get(prompt_id)
+        if data.get("op") == "removed":
+            self._prompt_clients.pop(prompt_id, None)
+        if client_id is not None:
+            self._deliver(per_client, client_id, record)
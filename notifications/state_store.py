@@ -0,0 +1,192 @@
+import time
+import json
+import logging
+import threading
+from ..common.instance_state import InstanceState
+
+logger = logging.getLogger("KY_monitor_state_store")
+
+# 单个prompt状态键中保存的字段
+PROMPT_FIELDS = ("status", "client_id", "position", "predicted_start_at", "predicted_finish_at")
+PROGRESS_FIELDS = ("percentage", "eta_seconds", "estimated_finish_at")
+ACTIVE_STATUSES = ("waiting", "running")
+
+
+class RedisStateWriter:
+    """把每个实例的最新状态写成带TTL的Redis键，路由方无需持续订阅即可查询
+
+    - <prefix>:instance:<instance_id> (HASH): 运行中的prompt、运行/等待数、队列深度、进度、ETA、心跳时间
+    - <prefix>:instances (ZSET): 实例ID，分数为心跳时间，用于发现实例(过期成员在写入时清理)
+    - <prefix>:prompt:<prompt_id> (STRING, JSON): prompt所在实例、状态、进度或预测时间
+    命令追加到调用方的 pipeline 中，与发布在同一次往返中完成。实例状态由快照与增量记录增量维护；
+    prompt键只在内容变化或距上次写入超过 TTL 的一半时重写。
+    空闲时没有广播，由调用方定期调用 heartbeat() 刷新心跳，避免实例键过期。
+    """
+
+    def __init__(self, prefix="comfyui_monitor:state", instance_ttl=180, prompt_ttl=3600, clock=time.time):
+        self.prefix = prefix
+        self.instance_ttl = max(1, int(instance_ttl))
+        self.prompt_ttl = max(1, int(prompt_ttl))
+        self._clock = clock
+        self._instances = {}
+        # instance_id -> 上次写入实例键的时间
+        self._heartbeats = {}
+        # prompt_id -> (上次写入的值, 写入时间)
+        self._written = {}
+        # write() 与 heartbeat() 可能运行在不同线程
+        self._lock = threading.Lock()
+
+    @property
+    def heartbeat_interval(self):
+        """实例键在TTL内至少刷新三次"""
+        return self.instance_ttl / 3.0
+
+    def instance_key(self, instance_id):
+        return f"{self.prefix}:instance:{instance_id}"
+
+    def prompt_key(self, prompt_id):
+        return f"{self.prefix}:prompt:{prompt_id}"
+
+    @property
+    def index_key(self):
+        return f"{self.prefix}:instances"
+
+    def write(self, pipe, records):
+        """根据记录更新状态并把写命令追加到 pipe，返回写入的prompt键数量"""
+        with self._lock:
+            return self._write(pipe, records)
+
+    def heartbeat(self, pipe) -> bool:
+        """为超过 heartbeat_interval 未写入的实例追加心跳命令，返回是否有命令需要执行
+
+        只刷新心跳时间、TTL 与索引分数；仍在队列中的prompt键按半个TTL的规则续期。
+        """
+        with self._lock:
+            now = self._clock()
+            stale = [instance for instance_id, instance in self._instances.items()
+                     if now - self._heartbeats.get(instance_id, 0) >= self.heartbeat_interval]
+            for instance in stale:
+                key = self.instance_key(instance.instance_id)
+                pipe.hset(key, "heartbeat", now)
+                pipe.expire(key, self.instance_ttl)
+                pipe.zadd(self.index_key, {instance.instance_id: now})
+                self._heartbeats[instance.instance_id] = now
+                for prompt_id, prompt in instance.prompts.items():
+                    self._write_prompt(pipe, prompt_id, instance.instance_id, prompt, now)
+            if stale:
+                pipe.zremrangebyscore(self.index_key, "-inf", now - self.instance_ttl)
+            return bool(stale)
+
+    def _write(self, pipe, records):
+        now = self._clock()
+        instances = {}
+        prompts = {}
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            instance_id = record.get("instance_id") or "default"
+            instance = self._instances.get(instance_id)
+            if instance is None:
+                instance = self._instances[instance_id] = InstanceState(instance_id)
+            for prompt_id, prompt in self._removed_prompts(instance, record):
+                prompts[prompt_id] = (instance_id, prompt)
+            instance.apply(record, now)
+            for prompt_id in self._changed_prompts(record):
+                prompt = instance.prompts.get(prompt_id)
+                if prompt is not None:
+                    prompts[prompt_id] = (instance_id, prompt)
+            instances[instance_id] = instance
+
+        for instance in instances.values():
+            self._write_instance(pipe, instance, now)
+        written = 0
+        for prompt_id, (instance_id, prompt) in prompts.items():
+            if self._write_prompt(pipe, prompt_id, instance_id, prompt, now):
+                written += 1
+        if instances:
+            pipe.zremrangebyscore(self.index_key, "-inf", now - self.instance_ttl)
+        self._prune()
+        return written
+
+    def _write_instance(self, pipe, instance, now):
+        view = instance.view()
+        running = view["running"][0] if view["running"] else {}
+        fields = {
+            "instance_id": instance.instance_id,
+            "heartbeat": now,
+            "running": view["running_count"],
+            "waiting": view["waiting_count"],
+            "queue_depth": view["queue_depth"],
+            "completed": view["completed"],
+            "running_prompt_id": running.get("prompt_id"),
+            "running_client_id": running.get("client_id"),
+            "progress": running.get("percentage"),
+            "eta_seconds": running.get("eta_seconds"),
+            "estimated_finish_at": running.get("estimated_finish_at"),
+            "estimated_idle_at": view["estimated_idle_at"],
+            "synced": int(view["synced"]),
+        }
+        # Redis 不能保存None，以空字符串覆盖已失效的字段
+        key = self.instance_key(instance.instance_id)
+        pipe.hset(key, mapping={name: "" if value is None else value for name, value in fields.items()})
+        pipe.expire(key, self.instance_ttl)
+        pipe.zadd(self.index_key, {instance.instance_id: now})
+        self._heartbeats[instance.instance_id] = now
+
+    def _write_prompt(self, pipe, prompt_id, instance_id, prompt, now):
+        value = {"instance_id": instance_id}
+        for field in PROMPT_FIELDS:
+            if prompt.get(field) is not None:
+                value[field] = prompt[field]
+        progress = prompt.get("progress")
+        if isinstance(progress, dict):
+            for field in PROGRESS_FIELDS:
+                if progress.get(field) is not None:
+                    value[field] = progress[field]
+        previous = self._written.get(prompt_id)
+        if previous is not None and previous[0] == value and now - previous[1] < self.prompt_ttl / 2:
+            return False
+        self._written[prompt_id] = (value, now)
+        pipe.set(self.prompt_key(prompt_id), json.dumps(dict(value, updated_at=now), ensure_ascii=False),
+                 ex=self.prompt_ttl)
+        return True
+
+    @staticmethod
+    def _changed_prompts(record):
+        data = record.get("data")
+        if not isinstance(data, dict):
+            return ()
+        if isinstance(data.get("prompts"), list):
+            return [p.get("prompt_id") for p in data["prompts"] if isinstance(p, dict)]
+        if data.get("op") in ("added", "status", "changed", "progress"):
+            return (data.get("prompt_id"),)
+        return ()
+
+    @staticmethod
+    def _removed_prompts(instance, record):
+        """离开队列但没有结束记录的prompt(如被取消)标记为 removed，返回 [(prompt_id, prompt)]"""
+        data = record.get("data")
+        if not isinstance(data, dict):
+            return []
+        if data.get("op") == "removed":
+            gone = [data.get("prompt_id")]
+        elif isinstance(data.get("prompts"), list):
+            current = {p.get("prompt_id") for p in data["prompts"] if isinstance(p, dict)}
+            gone = [prompt_id for prompt_id in instance.prompts if prompt_id not in current]
+        else:
+            return []
+        removed = []
+        for prompt_id in gone:
+            prompt = instance.prompts.get(prompt_id)
+            if prompt is not None and prompt.get("status") in ACTIVE_STATUSES:
+                removed.append((prompt_id, dict(prompt, status="removed", progress=None)))
+        return removed
+
+    def _prune(self):
+        """只保留仍在某个实例队列中的prompt的写入记录"""
+        if len(self._written) <= 2 * sum(len(instance.prompts) for instance in self._instances.values()) + 100:
+            return
+        current = set()
+        for instance in self._instances.values():
+            current.update(instance.prompts)
+        self._written = {prompt_id: entry for prompt_id, entry in self._written.items() if prompt_id in current}
@@ -0,0 +1,206 @@
+import hmac
+import time
+import threading
+import logging
+
+logger = logging.getLogger("KY_monitor_topics")
+
+# 支持的主题类型: prompt:<prompt_id> / client:<client_id> / errors
+TOPIC_PROMPT = "prompt"
+TOPIC_CLIENT = "client"
+TOPIC_ERRORS = "errors"
+TOPIC_KINDS = (TOPIC_PROMPT, TOPIC_CLIENT, TOPIC_ERRORS)
+
+
+def parse_topic(topic):
+    """校验主题字符串，返回其类型，无效时返回None"""
+    if topic == TOPIC_ERRORS:
+        return TOPIC_ERRORS
+    kind, sep, value = str(topic).partition(":")
+    if sep and value and kind in (TOPIC_PROMPT, TOPIC_CLIENT):
+        return kind
+    return None
+
+
+class TopicRouter:
+    """把记录按主题拆分，每个主题只得到与之相关的prompt
+
+    完整快照按prompt拆成只含匹配prompt的子快照；增量记录按其prompt归属；
+    progress/removed 增量记录不带 client_id，按之前见过的 prompt_id -> client_id 映射确定。
+    不含prompt的记录(队列摘要、self_report等)不属于任何主题。
+    """
+
+    def __init__(self, kinds=TOPIC_KINDS):
+        self.kinds = frozenset(kind for kind in kinds if kind in TOPIC_KINDS)
+        self._prompt_clients = {}
+
+    def route(self, records) -> dict:
+        """返回 {主题: 记录列表}"""
+        routed = {}
+        for record, prompts_by_topic in self._assign(records):
+            for topic, prompts in prompts_by_topic.items():
+                routed.setdefault(topic, []).append(self._subset(record, prompts))
+        return routed
+
+    def assign(self, records) -> list:
+        """按全部主题类型拆分一次，结果供多个订阅方 filter() 复用"""
+        return list(self._assign(records, all_kinds=True))
+
+    @classmethod
+    def filter(cls, assigned, topics, owner=None) -> list:
+        """从 assign() 的结果中只保留与 topics 中任一主题相关的记录/prompt
+
+        owner 不为None时只保留属于该客户端的prompt(per_client 投递)，其他客户端的prompt即使匹配主题也不发送。
+        """
+        owner_topic = f"{TOPIC_CLIENT}:{owner}" if owner is not None else None
+        filtered = []
+        for record, prompts_by_topic in assigned:
+            owned = None
+            if owner_topic is not None:
+                if owner_topic not in prompts_by_topic:
+                    continue
+                owned = prompts_by_topic[owner_topic]
+                if owned is not None:
+                    owned = {id(prompt) for prompt in owned}
+            matched = []
+            seen = set()
+            whole = False
+            for topic, prompts in prompts_by_topic.items():
+                if topic not in topics:
+                    continue
+                if prompts is None:
+                    whole = True
+                    break
+                for prompt in prompts:
+                    if id(prompt) not in seen and (owned is None or id(prompt) in owned):
+                        seen.add(id(prompt))
+                        matched.append(prompt)
+            if whole:
+                filtered.append(record)
+            elif matched:
+                filtered.append(cls._subset(record, matched))
+        return filtered
+
+    def _topics(self, prompt_id, client_id, status, kinds):
+        topics = []
+        if TOPIC_PROMPT in kinds and prompt_id is not None:
+            topics.append(f"{TOPIC_PROMPT}:{prompt_id}")
+        if TOPIC_CLIENT in kinds and client_id is not None:
+            topics.append(f"{TOPIC_CLIENT}:{client_id}")
+        if TOPIC_ERRORS in kinds and status == "error":
+            topics.append(TOPIC_ERRORS)
+        return topics
+
+    def _assign(self, records, all_kinds=False):
+        """逐条记录产出 (记录, {主题: [prompt或记录本身]})"""
+        kinds = TOPIC_KINDS if all_kinds else self.kinds
+        for record in records:
+            data = record.get("data") if isinstance(record, dict) else None
+            if not isinstance(data, dict):
+                continue
+            prompts_by_topic = {}
+            if isinstance(data.get("prompts"), list):
+                prompt_clients = {}
+                for prompt in data["prompts"]:
+                    if not isinstance(prompt, dict):
+                        continue
+                    prompt_id, client_id = prompt.get("prompt_id"), prompt.get("client_id")
+                    if client_id is not None:
+                        prompt_clients[prompt_id] = client_id
+                    for topic in self._topics(prompt_id, client_id, prompt.get("status"), kinds):
+                        prompts_by_topic.setdefault(topic, []).append(prompt)
+                # 快照包含当前全部prompt，直接替换映射
+                self._prompt_clients = prompt_clients
+            elif data.get("prompt_id") is not None:
+                prompt_id = data["prompt_id"]
+                prompt = data.get("prompt") if isinstance(data.get("prompt"), dict) else {}
+                client_id = prompt.get("client_id")
+                if client_id is not None:
+                    self._prompt_clients[prompt_id] = client_id
+                else:
+                    client_id = self._prompt_clients.get(prompt_id)
+                if data.get("op") == "removed":
+                    self._prompt_clients.pop(prompt_id, None)
+                for topic in self._topics(prompt_id, client_id, prompt.get("status"), kinds):
+                    prompts_by_topic[topic] = None
+            if prompts_by_topic:
+                yield record, prompts_by_topic
+
+    @staticmethod
+    def _subset(record, prompts):
+        if prompts is None:
+            return record
+        return dict(record, data=dict(record["data"], prompts=prompts))
+
+
+def forbidden_topics(client_id, topics, owner_of=None) -> list:
+    """client_id 无权订阅的主题
+
+    client:<id> 只能订阅自己；owner_of(prompt_id) 返回prompt所属的client_id(未知时为None)，
+    提供时 prompt:<id> 只能订阅自己的或尚未见过的prompt。
+    """
+    forbidden = []
+    for topic in topics:
+        kind, _, value = str(topic).partition(":")
+        if kind == TOPIC_CLIENT and value != client_id:
+            forbidden.append(topic)
+        elif kind == TOPIC_PROMPT and owner_of is not None:
+            owner = owner_of(value)
+            if owner is not None and owner != client_id:
+                forbidden.append(topic)
+    return forbidden
+
+
+class SubscriptionRegistry:
+    """websocket客户端(sid)注册的主题过滤条件，HTTP路由写入、渠道线程读取
+
+    注册时可绑定令牌，之后修改或删除该sid的过滤必须出示同一令牌。
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def set(self, sid, topics, token=None):
+        with self._lock:
+            self._subscriptions.pop(sid, None)
+            self._subscriptions[sid] = (frozenset(topics), time.monotonic(), token)
+            while len(self._subscriptions) > self.capacity:
+                self._subscriptions.pop(next(iter(self._subscriptions)))
+
+    def get(self, sid):
+        entry = self._subscriptions.get(sid)
+        return entry[0] if entry else None
+
+    def token(self, sid):
+        entry = self._subscriptions.get(sid)
+        return entry[2] if entry else None
+
+    def owns(self, sid, token) -> bool:
+        """sid 未注册、注册时未绑定令牌或令牌匹配时返回True"""
+        expected = self.token(sid)
+        return expected is None or hmac.compare_digest(expected, token or "")
+
+    def remove(self, sid) -> bool:
+        with self._lock:
+            return self._subscriptions.pop(sid, None) is not None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {sid: topics for sid, (topics, _, _) in self._subscriptions.items()}
+
+    def prune(self, connected_sids, grace_seconds=60):
+        """删除已断开且注册超过 grace_seconds 的订阅(客户端可能短暂断线后重连)"""
+        deadline = time.monotonic() - grace_seconds
+        with self._lock:
+            for sid in [sid for sid, (_, registered_at, _) in self._subscriptions.items()
+                        if sid not in connected_sids and registered_at < deadline]:
+                del self._subscriptions[sid]
+
+
+# 进程内的websocket订阅
+SUBSCRIPTIONS = SubscriptionRegistry()
@@ -0,0 +1,190 @@
+# /ComfyUI/custom_nodes/KY_monitor/routes.py
+# 在 PromptServer 的 aiohttp 应用上注册的HTTP接口
+# ComfyUI 在加载完自定义节点之后才把 routes 加入应用，因此必须在导入 __init__.py 时注册
+
+import zlib
+import asyncio
+import secrets
+import logging
+from aiohttp import web
+
+from .metrics import METRICS, render_prometheus
+from .metrics.prometheus import CONTENT_TYPE
+from .notifications import dispatch_stats
+from .notifications.encoding import get_encoder
+from .config import APP_CONFIG
+from .notifications.topics import SUBSCRIPTIONS, parse_topic, forbidden_topics
+from . import monitor_logic
+
+logger = logging.getLogger("KY_monitor_routes")
+
+# 订阅过滤的所有权令牌，首次注册时返回，之后修改或删除须在此请求头中携带
+SUBSCRIPTION_TOKEN_HEADER = "X-KY-Monitor-Token"
+
+# /ky_monitor/tasks 每页条数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _json_response(data, status=200, headers=None):
+    return web.Response(body=get_encoder().encode(data), status=status,
+                        content_type="application/json", headers=headers)
+
+
+def _not_modified(request, etag) -> bool:
+    """If-None-Match 命中当前ETag"""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _cached_json(request, etag, build):
+    """ETag未变化时返回304，不构建响应体"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return web.Response(status=304, headers=headers)
+    return _json_response(build(), headers=headers)
+
+
+def _parse_number(value, convert, name):
+    if value is None or value == "":
+        return None
+    try:
+        return convert(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"参数 {name} 无效: {value}")
+
+
+def _per_client_delivery() -> bool:
+    return APP_CONFIG.prompt_server_enabled and APP_CONFIG.prompt_server_delivery == "per_client"
+
+
+def _prompt_owner(prompt_id):
+    """prompt所属的client_id，监控未运行或未见过该prompt时返回None"""
+    monitor = monitor_logic.monitor_instance
+    record = monitor.lifecycle.get(prompt_id) if monitor is not None else None
+    return record.get("client_id") if record is not None else None
+
+
+def _check_subscription_owner(request, client_id):
+    """订阅过滤只能由持有注册令牌的调用方修改或删除"""
+    if not SUBSCRIPTIONS.owns(client_id, request.headers.get(SUBSCRIPTION_TOKEN_HEADER)):
+        raise web.HTTPForbidden(text=f"客户端 {client_id} 的订阅过滤已由其他调用方注册，需要 {SUBSCRIPTION_TOKEN_HEADER}")
+
+
+def register_routes(prompt_server):
+    """注册 /ky_monitor/* 路由，返回是否注册成功"""
+    routes = getattr(prompt_server, "routes", None)
+    if routes is None:
+        logger.warning("PromptServer 没有 routes，跳过HTTP接口注册")
+        return False
+
+    @routes.get("/ky_monitor/metrics")
+    async def ky_monitor_metrics(request):
+        # 只读取内存计数器和队列长度，不调用 get_current_queue()
+        queue = getattr(prompt_server, "prompt_queue", None)
+        body = render_prometheus(METRICS, queue=queue, dispatch=dispatch_stats(),
+                                 scheduler=monitor_logic.get_scheduler_stats())
+        return web.Response(body=body.encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+    @routes.get("/ky_monitor/node_stats")
+    async def ky_monitor_node_stats(request):
+        stats = monitor_logic.get_node_stats()
+        if stats is None:
+            return web.json_response({"error": "监控未运行"}, status=503)
+        return web.json_response(stats)
+
+    @routes.get("/ky_monitor/tasks")
+    async def ky_monitor_tasks(request):
+        """任务列表: ?status=&client_id=&since=&limit=&cursor=，按更新先后倒序"""
+        monitor = monitor_logic.monitor_instance
+        if monitor is None:
+            return _json_response({"error": "监控未运行"}, status=503)
+        query = request.rel_url.query
+        status = query.get("status") or None
+        client_id = query.get("client_id") or None
+        since = _parse_number(query.get("since"), float, "since")
+        cursor = _parse_number(query.get("cursor"), int, "cursor")
+        limit = _parse_number(query.get("limit"), int, "limit") or DEFAULT_PAGE_SIZE
+        limit = min(max(1, limit), MAX_PAGE_SIZE)
+
+        lifecycle = monitor.lifecycle
+
+        def build():
+            tasks, next_cursor = lifecycle.page(status=status, client_id=client_id, since=since,
+                                                limit=limit, cursor=cursor)
+            return {
+                "tasks": tasks,
+                "next_cursor": str(next_cursor) if next_cursor is not None else None,
+                "version": lifecycle.version,
+            }
+        # 任一记录变化都会增加 version，未变化时直接返回304；不同查询条件的结果不共用ETag
+        query_key = zlib.crc32(repr((status, client_id, since, cursor, limit)).encode("utf-8"))
+        return _cached_json(request, f'W/"{lifecycle.version}-{query_key:08x}"', build)
+
+    @routes.get("/ky_monitor/tasks/{prompt_id}")
+    async def ky_monitor_task(request):
+        monitor = monitor_logic.monitor_instance
+        if monitor is None:
+            return _json_response({"error": "监控未运行"}, status=503)
+        prompt_id = request.match_info["prompt_id"]
+        record = monitor.lifecycle.get(prompt_id)
+        if record is not None:
+            return _cached_json(request, f'W/"{record["seq"]}"', lambda: record)
+        # 内存中已淘汰的记录从持久化存储中查找
+        if monitor.history_store is not None:
+            loop = asyncio.get_running_loop()
+            record = await loop.run_in_executor(None, monitor.history_store.get, prompt_id)
+            if record is not None:
+                return _cached_json(request, f'W/"s{record["updated_at"]}"', lambda: record)
+        return _json_response({"error": f"未找到 prompt {prompt_id}"}, status=404)
+
+    @routes.post("/ky_monitor/subscriptions")
+    async def ky_monitor_subscribe(request):
+        """注册websocket主题过滤: {"client_id": ..., "topics": ["prompt:<id>", "client:<id>", "errors"]}"""
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="请求体不是有效的JSON")
+        client_id = body.get("client_id") if isinstance(body, dict) else None
+        topics = body.get("topics") if isinstance(body, dict) else None
+        if not client_id or not isinstance(topics, list):
+            raise web.HTTPBadRequest(text="需要 client_id 与 topics 列表")
+        invalid = [topic for topic in topics if parse_topic(topic) is None]
+        if invalid:
+            raise web.HTTPBadRequest(text=f"无效的主题: {invalid}")
+        forbidden = forbidden_topics(client_id, topics, _prompt_owner if _per_client_delivery() else None)
+        if forbidden:
+            raise web.HTTPForbidden(text=f"只能订阅自己的主题: {forbidden}")
+        _check_subscription_owner(request, client_id)
+        if not topics:
+            SUBSCRIPTIONS.remove(client_id)
+            return _json_response({"client_id": client_id, "topics": []})
+        token = SUBSCRIPTIONS.token(client_id)
+        if token is None:
+            # 只能为当前已连接的websocket注册
+            sockets = getattr(prompt_server, "sockets", None)
+            if sockets is not None and client_id not in sockets:
+                raise web.HTTPForbidden(text=f"客户端 {client_id} 没有已连接的websocket")
+            token = secrets.token_urlsafe(16)
+        SUBSCRIPTIONS.set(client_id, topics, token)
+        return _json_response({"client_id": client_id, "topics": sorted(set(topics)), "token": token})
+
+    @routes.get("/ky_monitor/subscriptions/{client_id}")
+    async def ky_monitor_subscription(request):
+        client_id = request.match_info["client_id"]
+        topics = SUBSCRIPTIONS.get(client_id)
+        if topics is None:
+            return _json_response({"error": f"客户端 {client_id} 没有订阅过滤"}, status=404)
+        return _json_response({"client_id": client_id, "topics": sorted(topics)})
+
+    @routes.delete("/ky_monitor/subscriptions/{client_id}")
+    async def ky_monitor_unsubscribe(request):
+        client_id = request.match_info["client_id"]
+        _check_subscription_owner(request, client_id)
+        return _json_response({"client_id": client_id, "removed": SUBSCRIPTIONS.remove(client_id)})
+
+    logger.info("已注册HTTP接口 /ky_monitor/metrics, /ky_monitor/node_stats, /ky_monitor/tasks, /ky_monitor/subscriptions")
+    return True
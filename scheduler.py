@@ -0,0 +1,61 @@
+import time
+import logging
+
+logger = logging.getLogger("KY_monitor_scheduler")
+
+
+class AdaptiveScheduler:
+    """轮询模式的自适应调度器
+
+    有prompt运行或等待时按 active_interval 快速轮询；空闲时从 idle_interval 开始按 backoff 倍数
+    指数退避，直到 idle_max_interval。截止时间基于单调时钟累加，tick 本身的耗时不会叠加到间隔上；
+    tick 超时错过的截止时间直接跳过，而不是连续补跑。
+    """
+
+    def __init__(self, active_interval=1.0, idle_interval=5.0, idle_max_interval=30.0,
+                 backoff=2.0, adaptive=True, clock=time.monotonic):
+        self.active_interval = max(0.05, float(active_interval))
+        self.idle_interval = max(0.05, float(idle_interval))
+        self.idle_max_interval = max(self.idle_interval, float(idle_max_interval))
+        self.backoff = max(1.0, float(backoff))
+        self.adaptive = adaptive
+        self._clock = clock
+        self._deadline = None
+        self._was_active = True
+        self.interval = self.idle_interval
+        self.skipped_ticks = 0
+
+    def next_delay(self, active: bool) -> float:
+        """根据本次tick是否有活动返回距下一次tick的等待秒数"""
+        now = self._clock()
+        if not self.adaptive:
+            interval = self.idle_interval
+        elif active:
+            interval = self.active_interval
+        elif self._was_active:
+            interval = self.idle_interval
+        else:
+            interval = min(self.interval * self.backoff, self.idle_max_interval)
+        self._was_active = active
+        self.interval = interval
+
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += interval
+        if self._deadline <= now:
+            missed = int((now - self._deadline) // interval) + 1
+            self.skipped_ticks += missed
+            self._deadline += missed * interval
+        return self._deadline - now
+
+    def reset(self):
+        self._deadline = None
+        self._was_active = True
+        self.interval = self.idle_interval
+
+    def stats(self) -> dict:
+        return {
+            "effective_interval_seconds": self.interval,
+            "skipped_ticks": self.skipped_ticks,
+            "adaptive": self.adaptive,
+        }
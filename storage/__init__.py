@@ -0,0 +1,5 @@
+from .history_store import TaskHistoryStore
+
+__all__ = [
+    'TaskHistoryStore'
+]
@@ -0,0 +1,236 @@
+import os
+import json
+import queue
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger("KY_monitor_history_store")
+
+_STOP = object()
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS tasks (
+        prompt_id TEXT PRIMARY KEY,
+        client_id TEXT,
+        number INTEGER,
+        status TEXT NOT NULL,
+        queued_at REAL,
+        started_at REAL,
+        finished_at REAL,
+        duration REAL,
+        error TEXT,
+        outputs TEXT,
+        updated_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tasks_updated ON tasks(updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, updated_at)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_client ON tasks(client_id, updated_at)",
+)
+
+# 后到的记录覆盖状态，字段为空时保留已有值
+_UPSERT = """
+    INSERT INTO tasks (prompt_id, client_id, number, status, queued_at, started_at, finished_at,
+                       duration, error, outputs, updated_at)
+    VALUES (:prompt_id, :client_id, :number, :status, :queued_at, :started_at, :finished_at,
+            :duration, :error, :outputs, :updated_at)
+    ON CONFLICT(prompt_id) DO UPDATE SET
+        client_id = COALESCE(excluded.client_id, tasks.client_id),
+        number = COALESCE(excluded.number, tasks.number),
+        status = excluded.status,
+        queued_at = COALESCE(tasks.queued_at, excluded.queued_at),
+        started_at = COALESCE(excluded.started_at, tasks.started_at),
+        finished_at = COALESCE(excluded.finished_at, tasks.finished_at),
+        duration = COALESCE(excluded.duration, tasks.duration),
+        error = COALESCE(excluded.error, tasks.error),
+        outputs = COALESCE(excluded.outputs, tasks.outputs),
+        updated_at = excluded.updated_at
+"""
+
+_COLUMNS = ("prompt_id", "client_id", "number", "status", "queued_at", "started_at", "finished_at",
+            "duration", "error", "outputs", "updated_at")
+
+
+def _to_row(record):
+    row = {column: record.get(column) for column in _COLUMNS}
+    for column in ("error", "outputs"):
+        if row[column] is not None and not isinstance(row[column], str):
+            row[column] = json.dumps(row[column], ensure_ascii=False)
+    return row
+
+
+def _from_row(row):
+    record = dict(zip(_COLUMNS, row))
+    for column in ("error", "outputs"):
+        if record[column] is not None:
+            try:
+                record[column] = json.loads(record[column])
+            except ValueError:
+                pass
+    return record
+
+
+class TaskHistoryStore:
+    """SQLite(WAL)持久化的任务生命周期记录
+
+    submit() 只入队；后台线程按 batch_size 条或 flush_interval 秒批量写入一个事务，
+    事件循环中不做磁盘I/O。query()/get() 会读磁盘，应在线程池中调用。
+    按 prompt_id、client_id、status 和更新时间建立索引；retention_days 大于0时定期删除过期记录。
+    """
+
+    def __init__(self, path, batch_size=100, flush_interval=0.5, retention_days=0, maxsize=10000):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.retention_days = retention_days
+        self._queue = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._thread = None
+        self._ready = threading.Event()
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.batches = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="KY_monitor-history-store", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """提交一条生命周期记录(会被复制)，队列满时丢弃"""
+        try:
+            self._queue.put_nowait(dict(record))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=5.0):
+        """写完队列中剩余的记录后停止后台线程"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("历史记录写入队列已满，停止时丢弃剩余记录")
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "depth": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def get(self, prompt_id):
+        rows = self._read("SELECT * FROM tasks WHERE prompt_id = ?", (prompt_id,))
+        return _from_row(rows[0]) if rows else None
+
+    def query(self, status=None, client_id=None, since=None, until=None, limit=100):
+        """按条件查询，按更新时间倒序"""
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if client_id:
+            clauses.append("client_id = ?")
+            params.append(client_id)
+        if since is not None:
+            clauses.append("updated_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("updated_at < ?")
+            params.append(until)
+        sql = "SELECT * FROM tasks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY updated_at DESC LIMIT ?"
+        params.append(max(1, int(limit)))
+        return [_from_row(row) for row in self._read(sql, params)]
+
+    def _read(self, sql, params):
+        if not self._ready.wait(timeout=5.0):
+            return []
+        connection = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def _connect(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            connection.execute(statement)
+        connection.commit()
+        return connection
+
+    def _run(self):
+        try:
+            connection = self._connect()
+        except Exception as e:
+            logger.error(f"打开历史记录数据库 {self.path} 失败: {e}")
+            self._thread = None
+            return
+        self._ready.set()
+        logger.info(f"历史记录数据库已打开: {self.path}")
+
+        last_purge = 0.0
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                first = None
+            batch = []
+            if first is _STOP:
+                stopping = True
+            elif first is not None:
+                batch.append(first)
+            # 取出当前已排队的记录，合成一个事务
+            while len(batch) < self.batch_size and not stopping:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._write(connection, batch)
+            if self.retention_days and time.time() - last_purge > 3600:
+                last_purge = time.time()
+                self._purge(connection)
+        connection.close()
+
+    def _write(self, connection, batch):
+        try:
+            with connection:
+                connection.executemany(_UPSERT, [_to_row(record) for record in batch])
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"写入历史记录失败({len(batch)}条): {e}")
+
+    def _purge(self, connection):
+        try:
+            with connection:
+                cursor = connection.execute(
+                    "DELETE FROM tasks WHERE updated_at < ?",
+                    (time.time() - self.retention_days * 86400,),
+                )
+            if cursor.rowcount:
+                logger.info(f"已删除 {cursor.rowcount} 条过期历史记录")
+        except Exception as e:
+            logger.error(f"清理过期历史记录失败: {e}")
@@ -0,0 +1,35 @@
+"""在ComfyUI之外加载本包: 复用 benchmarks 中的包加载与 PromptServer/PromptQueue 替身"""
+import os
+import sys
+
+import pytest
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+sys.path.insert(0, BENCHMARKS_DIR)
+
+# 配置在首次导入时读取环境变量: 同步发送，默认不启用任何渠道，各测试按需构造渠道
+os.environ.setdefault("KY_MONITOR_DISPATCH_ASYNC", "false")
+os.environ.setdefault("KY_MONITOR_PROMPT_SERVER_ENABLED", "false")
+os.environ.setdefault("KY_MONITOR_REDIS_ENABLED", "false")
+os.environ.setdefault("KY_MONITOR_ROCKETMQ_ENABLED", "false")
+
+from _bootstrap import load_package  # noqa: E402
+import fake_comfy  # noqa: E402
+
+load_package()
+fake_comfy.install_fake_modules()
+
+
+class FakeClock:
+    """可注入的时钟，测试中直接修改 now"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import fakeredis
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from KY_monitor.aggregator import ClusterPublisher, ClusterState, RedisConsumer, create_app
+from KY_monitor.aggregator.state import HEALTH_DOWN, HEALTH_STALE, HEALTH_UP
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+
+
+class ReadyRedis:
+    """包装 fakeredis，第一次 XREAD 时置位 ready，此后写入的条目一定会被读到"""
+
+    def __init__(self, client):
+        self.client = client
+        self.ready = threading.Event()
+
+    def xread(self, *args, **kwargs):
+        self.ready.set()
+        return self.client.xread(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def snapshot(instance_id, seq, *prompts, waiting=0):
+    return {"event": "ky_monitor.queue", "instance_id": instance_id, "data": {
+        "queue_status": {"running": len(prompts), "waiting": waiting, "completed": 5},
+        "prompts": list(prompts), "seq": seq, "keyframe": True}}
+
+
+def delta(instance_id, seq, op, prompt_id, **fields):
+    return {"event": "ky_monitor.delta", "instance_id": instance_id,
+            "data": dict(fields, seq=seq, op=op, prompt_id=prompt_id)}
+
+
+def running(prompt_id, client_id="c1"):
+    return {"prompt_id": prompt_id, "client_id": client_id, "status": "running", "progress": {"percentage": 10}}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeStrictRedis()
+
+
+def test_pubsub_and_stream_records_merge_per_instance(redis_client, clock):
+    state = ClusterState(clock=clock)
+    client = ReadyRedis(redis_client)
+    consumer = RedisConsumer(client, state, channels=["monitor"], streams=["monitor_stream"], block_ms=50)
+    consumer.start()
+    try:
+        # 订阅生效前发布的消息会丢失: 先发布无法解析的探测消息直到有订阅者
+        assert wait_for(lambda: redis_client.publish("monitor", b"ping") > 0)
+        assert client.ready.wait(5)
+
+        # i1 通过pubsub发布记录列表，i2 通过Stream逐条发布
+        redis_client.publish("monitor", json.dumps([snapshot("i1", 1, running("a"), waiting=2)]))
+        redis_client.publish("monitor", json.dumps([delta("i1", 2, "progress", "a", progress={"percentage": 60})]))
+        redis_client.xadd("monitor_stream", {"data": json.dumps(snapshot("i2", 7)), "instance_id": "i2"})
+        redis_client.xadd("monitor_stream", {"data": json.dumps(
+            delta("i2", 8, "added", "b", prompt=running("b", "c2"))), "instance_id": "i2"})
+
+        assert wait_for(lambda: state.instance("i1") and state.instance("i2")
+                        and state.instance("i1")["running"][0]["percentage"] == 60
+                        and state.instance("i2")["running"])
+    finally:
+        consumer.stop()
+
+    view = state.snapshot()
+    assert set(view["instances"]) == {"i1", "i2"}
+    i1, i2 = view["instances"]["i1"], view["instances"]["i2"]
+    assert i1["synced"] and i2["synced"]
+    assert (i1["running_count"], i1["waiting_count"], i1["queue_depth"]) == (1, 2, 3)
+    assert [r["prompt_id"] for r in i2["running"]] == ["b"]
+    assert view["totals"]["instances"] == 2
+    assert view["totals"][HEALTH_UP] == 2
+    assert consumer.stats()["errors"] == 0
+
+
+def test_seq_gap_marks_instance_unsynced_until_next_snapshot(clock):
+    state = ClusterState(clock=clock)
+    state.apply([snapshot("i1", 1, running("a"))])
+    state.apply([delta("i1", 2, "progress", "a", progress={"percentage": 30})])
+    assert state.instance("i1")["synced"]
+
+    # seq 3 丢失
+    state.apply([delta("i1", 4, "progress", "a", progress={"percentage": 50})])
+    view = state.instance("i1")
+    assert not view["synced"]
+    assert view["seq_gaps"] == 1
+    assert view["running"][0]["percentage"] == 50
+
+    state.apply([snapshot("i1", 5, running("a"))])
+    assert state.instance("i1")["synced"]
+
+
+def test_health_transitions_and_forget(clock):
+    state = ClusterState(stale_seconds=10, down_seconds=30, forget_seconds=60, clock=clock)
+    state.apply([snapshot("i1", 1, running("a")), snapshot("i2", 1)])
+
+    clock.now += 11
+    state.apply([snapshot("i2", 2)])
+    assert state.refresh()
+    assert state.instance("i1")["health"] == HEALTH_STALE
+    assert state.instance("i2")["health"] == HEALTH_UP
+    assert not state.refresh()
+
+    clock.now += 20
+    state.refresh()
+    assert state.instance("i1")["health"] == HEALTH_DOWN
+    totals = state.snapshot()["totals"]
+    # down 的实例不计入队列汇总
+    assert (totals[HEALTH_DOWN], totals["running"]) == (1, 0)
+
+    # 收到新记录后恢复为 up
+    state.apply([snapshot("i1", 9)])
+    assert state.instance("i1")["health"] == HEALTH_UP
+
+    clock.now += 61
+    state.apply([snapshot("i2", 3)])
+    state.refresh()
+    assert state.instance("i1") is None
+    assert set(state.snapshot()["instances"]) == {"i2"}
+
+
+def test_changes_since_version(clock):
+    state = ClusterState(stale_seconds=10, down_seconds=30, forget_seconds=60, clock=clock)
+    state.apply([snapshot("i1", 1), snapshot("i2", 1)])
+    since = state.version
+
+    assert state.changes(since)["instances"] == {}
+    state.apply([delta("i2", 2, "added", "b", prompt=running("b"))])
+    changes = state.changes(since)
+    assert list(changes["instances"]) == ["i2"]
+    assert changes["version"] == state.version
+    assert [r["prompt_id"] for r in changes["instances"]["i2"]["running"]] == ["b"]
+
+    since = state.version
+    clock.now += 61
+    state.apply([snapshot("i2", 3)])
+    state.refresh()
+    changes = state.changes(since)
+    assert changes["removed"] == ["i1"]
+    assert list(changes["instances"]) == ["i2"]
+
+
+def test_publisher_sends_keyframe_then_delta(redis_client, clock):
+    state = ClusterState(clock=clock)
+    publisher = ClusterPublisher(redis_client, state, channel="cluster", keyframe_seconds=30)
+    state.apply([snapshot("i1", 1)])
+
+    assert publisher.publish_once(0) == ClusterPublisher.SNAPSHOT_EVENT
+    assert json.loads(redis_client.get("cluster:snapshot"))[0]["data"]["instances"].keys() == {"i1"}
+    assert publisher.publish_once(1) is None
+    state.apply([snapshot("i2", 1)])
+    assert publisher.publish_once(2) == ClusterPublisher.DELTA_EVENT
+
+
+def test_cluster_etag_returns_304_until_state_changes(clock):
+    state = ClusterState(clock=clock)
+    state.apply([snapshot("i1", 1, running("a"))])
+
+    async def run():
+        async with TestClient(TestServer(create_app(state))) as client:
+            response = await client.get("/cluster")
+            etag = response.headers["ETag"]
+            body = await response.json()
+            assert response.status == 200
+            assert list(body["instances"]) == ["i1"]
+
+            response = await client.get("/cluster", headers={"If-None-Match": etag})
+            assert response.status == 304
+
+            state.apply([delta("i1", 2, "removed", "a")])
+            response = await client.get("/cluster", headers={"If-None-Match": etag})
+            assert response.status == 200
+            assert response.headers["ETag"] != etag
+
+            response = await client.get("/cluster/instances/missing")
+            assert response.status == 404
+    asyncio.run(run())
+
+
+def run_python(code, cwd):
+    return subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, timeout=60)
+
+
+def test_aggregator_runs_standalone_from_plugin_dir():
+    # 与 python -m aggregator 相同: 插件目录在 sys.path 上，aggregator/common 为顶层包
+    result = run_python(
+        "import sys, aggregator, common\n"
+        "assert aggregator.InstanceState is common.InstanceState\n"
+        "assert not {'notifications', 'tracking', 'config'} & set(sys.modules)\n",
+        REPO_ROOT)
+    assert result.returncode == 0, result.stderr
+
+
+def test_state_writer_does_not_import_aggregator():
+    result = run_python(
+        "import sys\n"
+        f"sys.path.insert(0, {BENCHMARKS_DIR!r})\n"
+        "from _bootstrap import load_package\n"
+        "load_package()\n"
+        "import KY_monitor.notifications.state_store\n"
+        "assert 'KY_monitor.aggregator' not in sys.modules\n",
+        BENCHMARKS_DIR)
+    assert result.returncode == 0, result.stderr
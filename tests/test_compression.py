@@ -0,0 +1,70 @@
+import json
+import os
+
+import pytest
+
+from KY_monitor.aggregator import consumer
+from KY_monitor.common import compression as shared
+from KY_monitor.notifications.compression import CODECS, PayloadCompressor, codec_available, decompress_payload
+
+
+def payload(size=64 * 1024):
+    records = []
+    while sum(len(json.dumps(r)) for r in records) < size:
+        records.append({"event": "ky_monitor.queue", "data": {"prompt_id": f"p{len(records)}", "status": "success",
+                                                              "outputs": {"9": {"images": ["ComfyUI_00001_.png"] * 4}}}})
+    return json.dumps(records).encode("utf-8")
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_round_trip(codec):
+    if not codec_available(codec):
+        pytest.skip(f"{codec} 不可用")
+    data = payload()
+    compressor = PayloadCompressor(codec, threshold=1024)
+
+    compressed = compressor.compress(data)
+
+    assert compressed.startswith(b"KYZ:" + codec.encode("ascii") + b"\n")
+    assert len(compressed) < len(data)
+    assert decompress_payload(compressed) == data
+    assert consumer.decode_records(compressed) == json.loads(data)
+    stats = compressor.stats()
+    assert (stats["codec"], stats["compressed"], stats["bytes_in"]) == (codec, 1, len(data))
+    assert stats["bytes_out"] == len(compressed)
+
+
+def test_below_threshold_is_sent_as_is():
+    data = payload(2048)
+    compressor = PayloadCompressor("zlib", threshold=len(data) + 1)
+
+    assert compressor.compress(data) is data
+    assert decompress_payload(data) is data
+    assert compressor.stats()["compressed"] == compressor.stats()["skipped"] == 0
+
+
+def test_payload_that_does_not_shrink_is_sent_as_is():
+    data = os.urandom(8192)
+    compressor = PayloadCompressor("zlib", threshold=0)
+
+    assert compressor.compress(data) is data
+    stats = compressor.stats()
+    assert (stats["compressed"], stats["skipped"], stats["bytes_in"]) == (0, 1, 0)
+
+
+def test_unknown_or_unavailable_codec_falls_back_to_zlib():
+    assert PayloadCompressor("lz4").codec == "zlib"
+    expected = "zstd" if codec_available("zstd") else "zlib"
+    assert PayloadCompressor("zstd").codec == expected
+
+
+def test_decompress_rejects_unknown_codec():
+    with pytest.raises(ValueError):
+        decompress_payload(b"KYZ:lz4\n...")
+    # 聚合器对无法解压的载荷返回空列表
+    assert consumer.decode_records(b"KYZ:lz4\n...") == []
+
+
+def test_single_implementation_shared_with_aggregator():
+    assert consumer.decompress_payload is shared.decompress_payload
+    assert decompress_payload is shared.decompress_payload
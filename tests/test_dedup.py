@@ -0,0 +1,68 @@
+from KY_monitor.tracking import DedupStore
+
+
+def test_add_admits_each_key_once(clock):
+    store = DedupStore(capacity=10, ttl_seconds=60, clock=clock)
+
+    assert store.add("p1") is True
+    assert store.add("p1") is False
+    assert store.add("p2") is True
+
+    assert "p1" in store
+    assert len(store) == 2
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_entries_expire_after_ttl(clock):
+    store = DedupStore(capacity=10, ttl_seconds=60, clock=clock)
+    store.add("p1")
+    clock.now = 30
+    store.add("p2")
+
+    # 刚好到期的条目被淘汰，未到期的保留
+    clock.now = 60
+    assert "p1" not in store
+    assert "p2" in store
+
+    # 过期后同一 prompt_id 重新被放行
+    assert store.add("p1") is True
+    stats = store.stats()
+    assert stats["expirations"] == 1
+    assert stats["evictions"] == 0
+
+
+def test_zero_ttl_never_expires(clock):
+    store = DedupStore(capacity=10, ttl_seconds=0, clock=clock)
+    store.add("p1")
+    clock.now = 10 ** 9
+
+    assert store.add("p1") is False
+    assert store.stats()["expirations"] == 0
+
+
+def test_capacity_evicts_oldest(clock):
+    store = DedupStore(capacity=3, ttl_seconds=60, clock=clock)
+    for key in ("p1", "p2", "p3", "p4"):
+        store.add(key)
+
+    assert "p1" not in store
+    assert [key for key in ("p2", "p3", "p4") if key in store] == ["p2", "p3", "p4"]
+    assert store.stats() == {
+        "size": 3,
+        "capacity": 3,
+        "hits": 0,
+        "misses": 4,
+        "evictions": 1,
+        "expirations": 0,
+    }
+
+
+def test_discard_allows_key_again(clock):
+    store = DedupStore(capacity=3, ttl_seconds=60, clock=clock)
+    store.add("p1")
+    store.discard("p1")
+    store.discard("missing")
+
+    assert store.add("p1") is True
+    assert store.stats()["misses"] == 2
@@ -0,0 +1,108 @@
+import pytest
+
+from KY_monitor.notifications import DeltaPublisher
+
+
+def prompt(prompt_id, status="running", **fields):
+    entry = {"prompt_id": prompt_id, "status": status}
+    entry.update(fields)
+    return entry
+
+
+def snapshot(*prompts, running=1, waiting=0):
+    return {"queue_status": {"running": running, "waiting": waiting}, "prompts": list(prompts)}
+
+
+@pytest.fixture
+def publisher(clock):
+    return DeltaPublisher(keyframe_seconds=30, clock=clock)
+
+
+def ops(records):
+    return [(r["data"]["op"], r["data"].get("prompt_id")) for r in records]
+
+
+def test_first_diff_is_keyframe(publisher):
+    (record,) = publisher.diff(snapshot(prompt("a")))
+
+    assert record["event"] == "ky_monitor.queue"
+    assert record["data"]["keyframe"] is True
+    assert record["data"]["seq"] == 1
+    assert record["data"]["prompts"] == [prompt("a")]
+
+
+def test_unchanged_snapshot_produces_nothing(publisher, clock):
+    publisher.diff(snapshot(prompt("a")))
+    clock.now = 1
+
+    assert publisher.diff(snapshot(prompt("a"))) == []
+    assert publisher.diff({"error": "队列不可用"}) == []
+
+
+def test_each_op_type(publisher, clock):
+    publisher.diff(snapshot(prompt("a", progress={"percentage": 10}), prompt("b"), prompt("c", extra=1)))
+    clock.now = 1
+
+    records = publisher.diff(snapshot(
+        prompt("a", progress={"percentage": 50}),
+        prompt("b", status="success"),
+        prompt("c", extra=2),
+        prompt("d", status="waiting"),
+        running=2,
+    ))
+
+    assert all(r["event"] == "ky_monitor.delta" for r in records)
+    assert ops(records) == [
+        ("queue_status", None),
+        ("progress", "a"),
+        ("status", "b"),
+        ("changed", "c"),
+        ("added", "d"),
+    ]
+    by_op = {r["data"]["op"]: r["data"] for r in records}
+    assert by_op["queue_status"]["queue_status"] == {"running": 2, "waiting": 0}
+    assert by_op["progress"]["progress"] == {"percentage": 50}
+    assert by_op["status"]["prompt"]["status"] == "success"
+    assert by_op["added"]["prompt"] == prompt("d", status="waiting")
+
+    clock.now = 2
+    assert ops(publisher.diff(snapshot(prompt("a", progress={"percentage": 50}), running=0))) == [
+        ("queue_status", None), ("removed", "b"), ("removed", "c"), ("removed", "d"),
+    ]
+
+
+def test_seq_is_contiguous_across_keyframes_and_deltas(publisher, clock):
+    seqs = []
+    for step in range(40):
+        clock.now = step
+        records = publisher.diff(snapshot(prompt("a", progress={"percentage": step})))
+        seqs.extend(r["data"]["seq"] for r in records)
+
+    assert seqs == list(range(1, len(seqs) + 1))
+
+
+def test_keyframe_cadence(publisher, clock):
+    publisher.diff(snapshot(prompt("a")))
+    assert publisher.seconds_until_keyframe() == 30
+
+    clock.now = 29.5
+    assert publisher.seconds_until_keyframe() == 0.5
+    assert publisher.diff(snapshot(prompt("a"))) == []
+
+    # 到期后即使状态没变也发送关键帧，并从此刻重新计时
+    clock.now = 30
+    assert publisher.seconds_until_keyframe() == 0
+    (record,) = publisher.diff(snapshot(prompt("a")))
+    assert record["data"]["keyframe"] is True
+    assert publisher.seconds_until_keyframe() == 30
+
+
+def test_reset_forces_keyframe(publisher, clock):
+    publisher.diff(snapshot(prompt("a")))
+    clock.now = 1
+    publisher.reset()
+
+    assert publisher.seconds_until_keyframe() == 0
+    (record,) = publisher.diff(snapshot(prompt("a")))
+    assert record["data"]["keyframe"] is True
+    assert record["data"]["seq"] == 2
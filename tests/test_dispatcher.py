@@ -0,0 +1,79 @@
+import threading
+
+from KY_monitor.notifications.dispatcher import ChannelWorker, Dispatcher
+
+
+class RecordingChannel:
+    """记录收到的批次；gate 未打开前阻塞发送，用于在队列中积压记录"""
+
+    def __init__(self, gate=None, fail_on=()):
+        self.received = []
+        self.gate = gate
+        self.fail_on = set(fail_on)
+
+    def send(self, info_data_list):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if info_data_list[0] in self.fail_on:
+            raise RuntimeError("send failed")
+        self.received.append(info_data_list)
+
+
+def test_full_queue_drops_oldest_batch():
+    channel = RecordingChannel()
+    worker = ChannelWorker(channel, maxsize=2)
+
+    # 未启动线程时只入队，第三批挤掉最旧的一批
+    for batch in (["a"], ["b"], ["c"]):
+        worker.submit(batch)
+
+    stats = worker.stats()
+    assert (stats["submitted"], stats["dropped"], stats["depth"]) == (3, 1, 2)
+
+    worker.start()
+    worker.stop()
+    assert channel.received == [["b"], ["c"]]
+
+
+def test_stop_drains_pending_batches():
+    gate = threading.Event()
+    channel = RecordingChannel(gate=gate)
+    dispatcher = Dispatcher([channel], maxsize=10)
+    dispatcher.start()
+
+    for i in range(5):
+        dispatcher.submit([i])
+    gate.set()
+    dispatcher.stop()
+
+    assert channel.received == [[0], [1], [2], [3], [4]]
+    (stats,) = dispatcher.stats()
+    assert (stats["sent"], stats["dropped"], stats["depth"]) == (5, 0, 0)
+    assert stats["channel"] == "RecordingChannel"
+
+
+def test_channel_error_does_not_stop_worker():
+    channel = RecordingChannel(fail_on=["bad"])
+    dispatcher = Dispatcher([channel])
+    dispatcher.start()
+
+    dispatcher.submit(["bad"])
+    dispatcher.submit(["good"])
+    dispatcher.stop()
+
+    assert channel.received == [["good"]]
+    (stats,) = dispatcher.stats()
+    assert (stats["sent"], stats["errors"]) == (2, 1)
+
+
+def test_submit_fans_out_to_every_channel():
+    first, second = RecordingChannel(), RecordingChannel()
+    dispatcher = Dispatcher([first, second])
+    dispatcher.start()
+
+    dispatcher.submit(["a"])
+    dispatcher.stop()
+    # 重复停止是安全的
+    dispatcher.stop()
+
+    assert first.received == second.received == [["a"]]
@@ -0,0 +1,78 @@
+import pytest
+
+from KY_monitor.metrics import METRICS
+from KY_monitor.notifications import manager
+from KY_monitor.notifications.dispatcher import Dispatcher
+from KY_monitor.notifications.encoding import EncodedPayload, PayloadEncoder
+
+
+def records():
+    return [{"event": "ky_monitor.update", "data": {"prompt_id": f"p{i}", "op": "updated"}} for i in range(3)]
+
+
+def test_payload_size_observed_once_per_broadcast():
+    before = METRICS.payload_bytes.count
+    payload = EncodedPayload(records(), PayloadEncoder("json"))
+
+    # pubsub 整体序列化、Stream 逐条序列化，各取两次
+    payload.encoded
+    payload.encoded_records
+    payload.encoded
+    payload.encoded_records
+
+    assert METRICS.payload_bytes.count == before + 1
+
+
+def test_payload_size_observed_for_records_only_broadcast():
+    before_count, before_sum = METRICS.payload_bytes.count, METRICS.payload_bytes.sum
+    payload = EncodedPayload(records(), PayloadEncoder("json"))
+
+    encoded_records = payload.encoded_records
+
+    assert METRICS.payload_bytes.count == before_count + 1
+    assert METRICS.payload_bytes.sum - before_sum == sum(len(encoded) for encoded in encoded_records)
+
+
+class ObjectChannel:
+    """与 PromptServerChannel 一样直接使用Python对象，不取序列化结果"""
+
+    def __init__(self):
+        self.received = []
+
+    def send(self, info_data_list):
+        self.received.append(list(info_data_list))
+
+
+class BytesChannel:
+    def send(self, info_data_list):
+        info_data_list.encoded_records
+
+
+@pytest.mark.parametrize("dispatch_async", [False, True])
+@pytest.mark.parametrize("with_bytes_channel", [False, True])
+def test_broadcast_records_payload_size_once(monkeypatch, dispatch_async, with_bytes_channel):
+    channels = [ObjectChannel()] + ([BytesChannel()] if with_bytes_channel else [])
+    dispatcher = Dispatcher(channels) if dispatch_async else None
+    monkeypatch.setattr(manager, "ACTIVE_CHANNELS", channels)
+    monkeypatch.setattr(manager, "DISPATCHER", dispatcher)
+    monkeypatch.setattr(manager, "INSTANCE_ID", None)
+    before = METRICS.payload_bytes.count
+
+    if dispatcher is not None:
+        dispatcher.start()
+    manager.broadcast_info(records())
+    if dispatcher is not None:
+        dispatcher.stop()
+
+    assert channels[0].received == [records()]
+    assert METRICS.payload_bytes.count == before + 1
+
+
+def test_broadcast_without_channels_records_nothing(monkeypatch):
+    monkeypatch.setattr(manager, "ACTIVE_CHANNELS", [])
+    monkeypatch.setattr(manager, "DISPATCHER", None)
+    before = METRICS.payload_bytes.count
+
+    manager.broadcast_info(records())
+
+    assert METRICS.payload_bytes.count == before
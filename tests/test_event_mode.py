@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import fake_comfy
+import pytest
+
+from KY_monitor import monitor_logic
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.tracking import PromptServerEventHook, TaskStateMachine
+
+
+class HookableServer(fake_comfy.FakePromptServer):
+    def __init__(self, loop=None):
+        super().__init__(loop)
+        self.calls = []
+
+    def send_sync(self, event, data, sid=None):
+        self.calls.append((event, sid))
+
+
+class ServerWithoutSendSync:
+    def __init__(self, loop):
+        self.loop = loop
+        self.prompt_queue = fake_comfy.FakePromptQueue()
+        self.last_node_id = None
+
+
+def test_hook_forwards_watched_events_and_keeps_original():
+    server = HookableServer()
+    received = []
+    hook = PromptServerEventHook(server, lambda event, data: received.append(event))
+
+    assert hook.install()
+    server.send_sync("executing", {"prompt_id": "p1", "node": "3"}, "c1")
+    server.send_sync("custom_event", {"prompt_id": "p1"})
+
+    assert server.calls == [("executing", "c1"), ("custom_event", None)]
+    assert received == ["executing"]
+
+    hook.uninstall()
+    server.send_sync("executing", {"prompt_id": "p1", "node": "4"})
+    assert received == ["executing"]
+    assert "send_sync" not in vars(server)
+
+
+def test_hook_survives_callback_errors():
+    server = HookableServer()
+
+    def fail(event, data):
+        raise RuntimeError("boom")
+    PromptServerEventHook(server, fail).install()
+
+    server.send_sync("execution_start", {"prompt_id": "p1"})
+    assert server.calls == [("execution_start", None)]
+
+
+def test_state_machine_reports_only_real_changes():
+    machine = TaskStateMachine()
+
+    assert machine.apply("execution_start", {"prompt_id": "p1"})
+    assert not machine.apply("execution_start", {"prompt_id": "p1"})
+    assert machine.apply("executing", {"prompt_id": "p1", "node": "3"})
+    assert not machine.apply("executing", {"prompt_id": "p1", "node": "3"})
+    assert machine.apply("progress", {"prompt_id": "p1", "value": 1, "max": 20})
+    assert not machine.apply("progress", {"prompt_id": "p1", "value": 1, "max": 20})
+    assert not machine.apply("executed", {"prompt_id": "p1", "node": "3"})
+    assert machine.apply("execution_success", {"prompt_id": "p1"})
+    # 结束后的事件不再改变状态
+    assert not machine.apply("executing", {"prompt_id": "p1", "node": None})
+    assert machine.get("p1").status == "success"
+    assert machine.apply("status", {"status": {"exec_info": {"queue_remaining": 2}}})
+    assert not machine.apply("status", {"status": {"exec_info": {"queue_remaining": 2}}})
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def make_monitor(monkeypatch, loop, server, min_interval_ms=50):
+    monkeypatch.setattr(APP_CONFIG, "monitor_mode", "event")
+    monkeypatch.setattr(APP_CONFIG, "event_min_interval_ms", min_interval_ms)
+    monkeypatch.setattr(APP_CONFIG, "self_report_seconds", 0)
+    fake_comfy.install_fake_modules(server)
+    monitor = monitor_logic.ComfyMonitor(loop)
+    publishes = []
+
+    async def publish_status():
+        publishes.append(time.monotonic())
+    monitor.publish_status = publish_status
+    return monitor, publishes
+
+
+def test_event_mode_coalesces_bursts(monkeypatch, loop):
+    server = HookableServer(loop)
+    monitor, publishes = make_monitor(monkeypatch, loop, server, min_interval_ms=100)
+    monitor.start()
+    try:
+        assert monitor.mode == "event"
+        # 初始发布与紧接着的一批事件合并为一次
+        for node in ("1", "2", "3"):
+            server.send_sync("executing", {"prompt_id": "p1", "node": node})
+        loop.run_until_complete(asyncio.sleep(0.02))
+        assert len(publishes) == 1
+
+        # 最小间隔内的下一批事件延迟到间隔结束后发布一次
+        for value in range(1, 6):
+            server.send_sync("progress", {"prompt_id": "p1", "value": value, "max": 20})
+        loop.run_until_complete(asyncio.sleep(0.2))
+        assert len(publishes) == 2
+        assert publishes[1] - publishes[0] >= 0.09
+
+        # 不改变状态的事件不触发发布
+        server.send_sync("progress", {"prompt_id": "p1", "value": 5, "max": 20})
+        loop.run_until_complete(asyncio.sleep(0.2))
+        assert len(publishes) == 2
+    finally:
+        monitor.stop()
+        loop.run_until_complete(asyncio.sleep(0))
+
+
+def test_event_mode_falls_back_to_poll_without_send_sync(monkeypatch, loop):
+    server = ServerWithoutSendSync(loop)
+    monitor, publishes = make_monitor(monkeypatch, loop, server)
+    monitor.start()
+    try:
+        loop.run_until_complete(asyncio.sleep(0.05))
+        assert monitor.mode == "poll"
+        assert monitor._event_hook is None
+        # 轮询循环立即发布一次
+        assert len(publishes) == 1
+    finally:
+        monitor.stop()
+        loop.run_until_complete(asyncio.sleep(0.05))
+
+
+def test_event_mode_sends_keyframes_while_idle(monkeypatch, loop):
+    monkeypatch.setattr(APP_CONFIG, "publish_mode", "delta")
+    monkeypatch.setattr(APP_CONFIG, "keyframe_seconds", 0.1)
+    broadcasts = []
+    monkeypatch.setattr(monitor_logic, "broadcast_info", lambda records: records and broadcasts.append(records))
+    server = HookableServer(loop)
+    monkeypatch.setattr(APP_CONFIG, "monitor_mode", "event")
+    monkeypatch.setattr(APP_CONFIG, "event_min_interval_ms", 10)
+    monkeypatch.setattr(APP_CONFIG, "self_report_seconds", 0)
+    fake_comfy.install_fake_modules(server)
+    monitor = monitor_logic.ComfyMonitor(loop)
+    monitor.start()
+    try:
+        # 没有任何事件，仍按 keyframe_seconds 周期发送关键帧
+        loop.run_until_complete(asyncio.sleep(0.35))
+        assert len(broadcasts) >= 3
+        assert all(len(records) == 1 and records[0]["data"]["keyframe"] for records in broadcasts)
+        seqs = [records[0]["data"]["seq"] for records in broadcasts]
+        assert seqs == list(range(1, len(seqs) + 1))
+    finally:
+        monitor.stop()
+        loop.run_until_complete(asyncio.sleep(0.05))
@@ -0,0 +1,124 @@
+import asyncio
+
+import fake_comfy
+
+from KY_monitor import monitor_logic
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.tracking import HistoryCursor
+
+
+class CountingHistory(dict):
+    """记录倒序遍历时实际访问了多少个键"""
+
+    def __init__(self):
+        super().__init__()
+        self.visited = 0
+
+    def __reversed__(self):
+        for key in super().__reversed__():
+            self.visited += 1
+            yield key
+
+
+class FakeQueue:
+    def __init__(self):
+        self.history = CountingHistory()
+
+    def finish(self, *prompt_ids):
+        for prompt_id in prompt_ids:
+            self.history[prompt_id] = {"status": {"status_str": "success"}}
+
+
+def ids(items):
+    return [prompt_id for prompt_id, _ in items]
+
+
+def test_returns_all_completions_since_last_read():
+    queue = FakeQueue()
+    cursor = HistoryCursor(max_backlog=100)
+    queue.finish("a", "b")
+    assert ids(cursor.read_new(queue)) == ["a", "b"]
+
+    # 一个间隔内完成多于5个prompt时全部按完成顺序返回
+    new = [f"n{i}" for i in range(8)]
+    queue.finish(*new)
+    assert ids(cursor.read_new(queue)) == new
+    assert cursor.read_new(queue) == []
+    assert cursor.skipped_scans == 0
+
+
+def test_backlog_cap_keeps_newest():
+    queue = FakeQueue()
+    cursor = HistoryCursor(max_backlog=3)
+    queue.finish("a", "b", "c", "d", "e")
+
+    assert ids(cursor.read_new(queue)) == ["c", "d", "e"]
+    assert cursor.skipped_scans == 1
+
+
+def test_trimming_oldest_history_items():
+    queue = FakeQueue()
+    cursor = HistoryCursor(max_backlog=100)
+    queue.finish("a", "b", "c")
+    cursor.read_new(queue)
+
+    # ComfyUI 超出 max_history 时从最旧的一端删除
+    del queue.history["a"]
+    del queue.history["b"]
+    queue.finish("d")
+    queue.history.visited = 0
+
+    assert ids(cursor.read_new(queue)) == ["d"]
+    assert queue.history.visited == 2
+
+
+def test_deleted_anchor_stops_at_previous_anchor():
+    queue = FakeQueue()
+    cursor = HistoryCursor(max_backlog=100)
+    queue.finish(*[f"h{i}" for i in range(50)])
+    cursor.read_new(queue)
+
+    # delete_history 删除最近的锚点，扫描在上一个锚点停下而不是遍历全部历史
+    del queue.history["h49"]
+    queue.finish("x", "y")
+    queue.history.visited = 0
+
+    assert ids(cursor.read_new(queue)) == ["x", "y"]
+    assert queue.history.visited == 3
+
+
+def test_seek_end_skips_existing_history():
+    queue = FakeQueue()
+    cursor = HistoryCursor(max_backlog=100)
+    queue.finish("a", "b")
+    cursor.seek_end(queue)
+
+    assert cursor.read_new(queue) == []
+    queue.finish("c")
+    assert ids(cursor.read_new(queue)) == ["c"]
+
+
+def test_monitor_start_does_not_reannounce_history(monkeypatch):
+    loop = asyncio.new_event_loop()
+    try:
+        monkeypatch.setattr(APP_CONFIG, "monitor_mode", "poll")
+        monkeypatch.setattr(APP_CONFIG, "publish_mode", "full")
+        monkeypatch.setattr(APP_CONFIG, "self_report_seconds", 0)
+        prompt_server = fake_comfy.FakePromptServer(loop)
+        fake_comfy.install_fake_modules(prompt_server)
+        queue = prompt_server.prompt_queue
+        prompt, _ = fake_comfy.make_workflow(3)
+        for i in range(10):
+            queue.history[f"old{i}"] = fake_comfy.make_history_item(f"old{i}", prompt)
+
+        monitor = monitor_logic.ComfyMonitor(loop)
+        monitor.start()
+        try:
+            assert monitor.get_queue_status()["prompts"] == []
+            queue.task_done("new", fake_comfy.make_history_item("new", prompt))
+            assert [p["prompt_id"] for p in monitor.get_queue_status()["prompts"]] == ["new"]
+        finally:
+            monitor.stop()
+            loop.run_until_complete(asyncio.sleep(0))
+    finally:
+        loop.close()
@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from KY_monitor import monitor_logic, routes
+from KY_monitor.tracking import TaskLifecycle
+
+
+@pytest.fixture
+def lifecycle(clock):
+    """p0..p9 依次排队(updated_at 0..9)，p1/p3/p5 开始运行，p3 完成"""
+    lifecycle = TaskLifecycle(clock=clock)
+    for i in range(10):
+        clock.now = i
+        lifecycle.observe_queued(f"p{i}", f"c{i % 2}", i)
+    clock.now = 10
+    for prompt_id in ("p1", "p3", "p5"):
+        lifecycle.observe_started(prompt_id)
+    clock.now = 11
+    lifecycle.observe_finished("p3", "success")
+    return lifecycle
+
+
+def ids(records):
+    return [record["prompt_id"] for record in records]
+
+
+def walk(lifecycle, **query):
+    """按 cursor 翻页直到结束，返回每页的 prompt_id"""
+    pages, cursor = [], None
+    while True:
+        records, cursor = lifecycle.page(cursor=cursor, **query)
+        pages.append(ids(records))
+        if cursor is None:
+            return pages
+
+
+def test_page_orders_by_latest_update(lifecycle):
+    records, cursor = lifecycle.page(limit=4)
+
+    assert ids(records) == ["p3", "p5", "p1", "p9"]
+    assert cursor == records[-1]["seq"]
+    assert walk(lifecycle, limit=4) == [
+        ["p3", "p5", "p1", "p9"], ["p8", "p7", "p6", "p4"], ["p2", "p0"],
+    ]
+
+
+def test_page_by_status_and_client(lifecycle):
+    assert walk(lifecycle, status="waiting", limit=3) == [["p9", "p8", "p7"], ["p6", "p4", "p2"], ["p0"]]
+    assert walk(lifecycle, status="running") == [["p5", "p1"]]
+    assert walk(lifecycle, client_id="c1", limit=2) == [["p3", "p5"], ["p1", "p9"], ["p7"]]
+    assert walk(lifecycle, client_id="c1", status="running") == [["p5", "p1"]]
+    assert lifecycle.page(status="error") == ([], None)
+    assert lifecycle.page(client_id="nobody") == ([], None)
+
+
+def test_page_since(lifecycle):
+    assert ids(lifecycle.page(since=8)[0]) == ["p3", "p5", "p1", "p9", "p8"]
+    assert ids(lifecycle.page(status="waiting", since=8)[0]) == ["p9", "p8"]
+    assert lifecycle.page(since=100) == ([], None)
+
+
+def test_cursor_seeks_past_stale_entries(lifecycle, clock):
+    # 大量更新使索引中堆积失效条目，cursor 仍按 seq 定位
+    clock.now = 20
+    for i in range(50):
+        prompt_id = f"x{i}"
+        lifecycle.observe_queued(prompt_id, "c0")
+        lifecycle.observe_started(prompt_id)
+        lifecycle.observe_finished(prompt_id, "success")
+    running = lifecycle.page(status="running")[0]
+    waiting, cursor = lifecycle.page(status="waiting", limit=2)
+
+    assert ids(running) == ["p5", "p1"]
+    assert ids(waiting) == ["p9", "p8"]
+    assert ids(lifecycle.page(status="waiting", cursor=cursor)[0]) == ["p7", "p6", "p4", "p2", "p0"]
+    assert len(lifecycle._by_status["success"].seqs) <= 2 * lifecycle._by_status["success"].live + 16
+
+
+def test_capacity_eviction_updates_indexes(clock):
+    lifecycle = TaskLifecycle(capacity=3, clock=clock)
+    for i in range(5):
+        lifecycle.observe_queued(f"p{i}", "c1")
+
+    assert len(lifecycle) == 3
+    assert ids(lifecycle.page(client_id="c1")[0]) == ["p4", "p3", "p2"]
+    assert lifecycle._by_client["c1"].live == 3
+
+
+def test_removed_only_from_active_states(lifecycle):
+    assert lifecycle.observe_removed("p3") is None
+    assert lifecycle.observe_removed("missing") is None
+    assert lifecycle.observe_removed("p0")["status"] == "removed"
+    assert lifecycle.observe_removed("p0") is None
+    assert "p0" not in lifecycle.active_ids()
+    assert ids(lifecycle.page(status="removed")[0]) == ["p0"]
+
+
+def get_tasks(monkeypatch, lifecycle, requests):
+    """依次发送 (query, headers) 请求，返回 (status, etag, body) 列表"""
+    monkeypatch.setattr(monitor_logic, "monitor_instance", type("Monitor", (), {"lifecycle": lifecycle})())
+    prompt_server = type("Server", (), {"routes": web.RouteTableDef()})()
+    routes.register_routes(prompt_server)
+    app = web.Application()
+    app.add_routes(prompt_server.routes)
+
+    async def run():
+        results = []
+        async with TestClient(TestServer(app)) as client:
+            for query, headers in requests:
+                response = await client.get("/ky_monitor/tasks", params=query, headers=headers or {})
+                body = await response.json() if response.status == 200 else None
+                results.append((response.status, response.headers.get("ETag"), body))
+        return results
+    return asyncio.run(run())
+
+
+def test_tasks_route_etag_depends_on_query(monkeypatch, lifecycle):
+    (status, etag, body), = get_tasks(monkeypatch, lifecycle, [({"limit": "2"}, None)])
+    assert status == 200
+    assert ids(body["tasks"]) == ["p3", "p5"]
+    next_cursor = body["next_cursor"]
+
+    results = get_tasks(monkeypatch, lifecycle, [
+        # 相同查询且未变化时返回304
+        ({"limit": "2"}, {"If-None-Match": etag}),
+        # 不同的查询条件即使 version 相同也不能命中缓存
+        ({"limit": "2", "cursor": next_cursor}, {"If-None-Match": etag}),
+        ({"limit": "2", "status": "running"}, {"If-None-Match": etag}),
+        ({"limit": "2", "client_id": "c0"}, {"If-None-Match": etag}),
+        ({"limit": "3"}, {"If-None-Match": etag}),
+        ({"limit": "2", "since": "9"}, {"If-None-Match": etag}),
+    ])
+
+    assert [status for status, _, _ in results] == [304, 200, 200, 200, 200, 200]
+    assert results[0][1] == etag
+    assert len({result_etag for _, result_etag, _ in results[1:]} | {etag}) == 6
+    assert ids(results[1][2]["tasks"]) == ["p1", "p9"]
+    assert ids(results[2][2]["tasks"]) == ["p5", "p1"]
+    assert ids(results[3][2]["tasks"]) == ["p8", "p6"]
+
+
+def test_tasks_route_etag_changes_with_lifecycle(monkeypatch, lifecycle):
+    (_, etag, _), = get_tasks(monkeypatch, lifecycle, [({}, None)])
+    lifecycle.observe_removed("p0")
+
+    (status, new_etag, body), = get_tasks(monkeypatch, lifecycle, [({}, {"If-None-Match": etag})])
+
+    assert status == 200
+    assert new_etag != etag
+    assert body["tasks"][0]["prompt_id"] == "p0"
@@ -0,0 +1,87 @@
+import fake_comfy
+import pytest
+
+from KY_monitor import monitor_logic
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.metrics import METRICS
+
+
+@pytest.fixture
+def prompt_server():
+    prompt_server = fake_comfy.FakePromptServer()
+    fake_comfy.install_fake_modules(prompt_server)
+    return prompt_server
+
+
+def make_monitor(monkeypatch, node_timing):
+    monkeypatch.setattr(APP_CONFIG, "node_timing_enabled", node_timing)
+    monkeypatch.setattr(APP_CONFIG, "publish_mode", "full")
+    return monitor_logic.ComfyMonitor(loop=None)
+
+
+@pytest.mark.parametrize("node_timing", [False, True])
+@pytest.mark.parametrize("status", ["success", "error"])
+def test_finished_prompt_reported(monkeypatch, prompt_server, node_timing, status):
+    monitor = make_monitor(monkeypatch, node_timing)
+    queue = prompt_server.prompt_queue
+    prompt, _ = fake_comfy.make_workflow(5)
+    queue.put((0, "p1", prompt, {"client_id": "c1"}, ["9"]))
+    monitor.get_queue_status()
+    queue.start_next()
+    finished_before = METRICS.prompts_finished.get(status, 0)
+
+    history_item = fake_comfy.make_history_item("p1", prompt, status)
+    history_item["prompt"][3]["client_id"] = "c1"
+    queue.task_done("p1", history_item)
+    prompts = monitor.get_queue_status()["prompts"]
+
+    assert [(p["prompt_id"], p["status"], p["client_id"]) for p in prompts] == [("p1", status, "c1")]
+    assert METRICS.prompts_finished[status] == finished_before + 1
+    assert monitor.lifecycle.get("p1")["status"] == status
+    # 只发送一次
+    assert monitor.get_queue_status()["prompts"] == []
+
+
+def test_non_final_history_entry_is_dropped(monkeypatch, prompt_server):
+    monitor = make_monitor(monkeypatch, False)
+    queue = prompt_server.prompt_queue
+    prompt, _ = fake_comfy.make_workflow(5)
+    history_item = fake_comfy.make_history_item("p1", prompt)
+    history_item["status"]["status_str"] = "interrupted"
+    queue.task_done("p1", history_item)
+
+    assert monitor.get_queue_status()["prompts"] == []
+
+
+def test_deleted_prompts_are_marked_removed(monkeypatch, prompt_server, tmp_path):
+    monkeypatch.setattr(APP_CONFIG, "history_store_enabled", True)
+    monkeypatch.setattr(APP_CONFIG, "history_store_path", str(tmp_path / "history.db"))
+    monitor = make_monitor(monkeypatch, False)
+    monitor.history_store.start()
+    queue = prompt_server.prompt_queue
+    prompt, _ = fake_comfy.make_workflow(5)
+    for prompt_id in ("run", "done", "deleted", "kept"):
+        queue.put((queue.task_counter, prompt_id, prompt, {"client_id": "c1"}, ["9"]))
+    queue.start_next()
+    monitor.get_queue_status()
+    assert sorted(monitor.lifecycle.active_ids()) == ["deleted", "done", "kept", "run"]
+
+    # delete_queue 删除等待中的prompt；另一个prompt正常完成，不应被当作删除
+    queue.queue = [item for item in queue.queue if item[1] != "deleted"]
+    queue.start_next()
+    queue.task_done("done", fake_comfy.make_history_item("done", prompt))
+    monitor.get_queue_status()
+
+    statuses = {prompt_id: monitor.lifecycle.get(prompt_id)["status"] for prompt_id in ("run", "done", "deleted", "kept")}
+    assert statuses == {"run": "running", "done": "success", "deleted": "removed", "kept": "waiting"}
+    assert monitor.lifecycle.get("deleted")["finished_at"] is not None
+    assert sorted(monitor.lifecycle.active_ids()) == ["kept", "run"]
+
+    # 已标记的记录不再重复提交
+    version = monitor.lifecycle.version
+    monitor.get_queue_status()
+    assert monitor.lifecycle.version == version
+
+    monitor.history_store.stop()
+    assert monitor.history_store.get("deleted")["status"] == "removed"
+    assert [r["prompt_id"] for r in monitor.history_store.query(status="removed")] == ["deleted"]
@@ -0,0 +1,48 @@
+import pytest
+
+from KY_monitor.tracking import NodeTimer, ProgressEstimator
+from KY_monitor.tracking.progress import upstream_nodes
+
+
+# 1 -> 2 -> 3(输出)；4 只连到 1，5 没有连线，二者都不在输出节点上游
+GRAPH = {
+    "1": {"class_type": "CheckpointLoader", "inputs": {"ckpt_name": "model.safetensors"}},
+    "2": {"class_type": "KSampler", "inputs": {"model": ["1", 0], "steps": 20}},
+    "3": {"class_type": "SaveImage", "inputs": {"images": ["2", 0], "size": [512, 512]}},
+    "4": {"class_type": "PreviewImage", "inputs": {"images": ["1", 0]}},
+    "5": {"class_type": "Note", "inputs": {"text": "unused"}},
+}
+
+
+def test_upstream_nodes_follows_links_only():
+    assert upstream_nodes(GRAPH, ["3"]) == {"1", "2", "3"}
+    assert upstream_nodes(GRAPH, ["3", "4"]) == {"1", "2", "3", "4"}
+    assert upstream_nodes(GRAPH, ["missing"]) == set()
+
+
+@pytest.mark.parametrize("outputs, eta", [(["3"], 2.0), (None, 4.0)])
+def test_remaining_work_limited_to_output_paths(outputs, eta, clock):
+    timer = NodeTimer(resolve_graph=lambda prompt_id: GRAPH, clock=clock)
+    estimator = ProgressEstimator(timer, clock=clock)
+    timer.apply("execution_start", {"prompt_id": "p1"})
+    timer.apply("executing", {"prompt_id": "p1", "node": "1"})
+    clock.now = 1.0
+    timer.apply("executing", {"prompt_id": "p1", "node": "2"})
+
+    estimate = estimator.estimate("p1", outputs=outputs)
+
+    # 没有历史耗时时每个节点按1秒估算: 当前节点剩余1秒，加上尚未执行的节点
+    assert estimate["eta_seconds"] == eta
+    assert estimate["percentage"] == round(100 / (1 + eta), 2)
+
+
+def test_retain_drops_cached_output_paths(clock):
+    timer = NodeTimer(resolve_graph=lambda prompt_id: GRAPH, clock=clock)
+    estimator = ProgressEstimator(timer, clock=clock)
+    timer.apply("execution_start", {"prompt_id": "p1"})
+    estimator.estimate("p1", outputs=["3"])
+    assert "p1" in estimator._executed_nodes
+
+    estimator.retain(set())
+
+    assert estimator._executed_nodes == {}
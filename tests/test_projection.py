@@ -0,0 +1,120 @@
+import copy
+
+from KY_monitor.notifications import PayloadProjection
+from KY_monitor.notifications.projection import output_refs, summarize_messages
+
+
+MESSAGES = [
+    ["execution_start", {"prompt_id": "p1", "timestamp": 1000}],
+    ["execution_cached", {"nodes": [], "timestamp": 1001}],
+    ["execution_success", {"prompt_id": "p1", "timestamp": 3500}],
+]
+
+OUTPUTS = {
+    "9": {"images": [{"filename": "out.png", "subfolder": "", "type": "output", "width": 512}]},
+    "10": {"text": ["hello"]},
+}
+
+
+def make_entry():
+    return {
+        "prompt_id": "p1",
+        "client_id": "c1",
+        "status": "success",
+        "info": {
+            "prompt_id": "p1",
+            "status": "success",
+            "outputs": copy.deepcopy(OUTPUTS),
+            "messages": copy.deepcopy(MESSAGES),
+            "prompts": [0, "p1", {"9": {"class_type": "SaveImage"}}, {}, ["9"]],
+            "node_timings": {"3": {"seconds": 1.5}, "9": {"seconds": 0.2}},
+        },
+    }
+
+
+def make_snapshot():
+    return {"queue_status": {"running": 0, "waiting": 0, "completed": 1}, "prompts": [make_entry()]}
+
+
+def test_full_profile_is_identity():
+    projection = PayloadProjection("full")
+    snapshot = make_snapshot()
+
+    assert projection.is_identity
+    assert projection.apply_snapshot(snapshot) is snapshot
+
+
+def test_unknown_profile_falls_back_to_full():
+    assert PayloadProjection("huge").profile == "full"
+
+
+def test_standard_profile_drops_prompt_graph():
+    entry = PayloadProjection("standard").apply(make_entry())
+
+    assert "prompts" not in entry["info"]
+    assert entry["info"]["messages"] == MESSAGES
+    assert entry["info"]["outputs"] == OUTPUTS
+
+
+def test_minimal_profile_summarizes():
+    entry = PayloadProjection("minimal").apply(make_entry())
+    info = entry["info"]
+
+    assert "prompts" not in info and "messages" not in info
+    assert info["timings"] == {"started_at": 1000, "finished_at": 3500, "duration_ms": 2500}
+    assert info["outputs"] == {"9": [{"filename": "out.png", "subfolder": "", "type": "output"}]}
+
+
+def test_include_keeps_listed_paths_and_identity_fields():
+    projection = PayloadProjection(include=["info.node_timings.*.seconds", "client_id"])
+
+    assert projection.apply(make_entry()) == {
+        "prompt_id": "p1",
+        "status": "success",
+        "client_id": "c1",
+        "info": {"node_timings": {"3": {"seconds": 1.5}, "9": {"seconds": 0.2}}},
+    }
+
+
+def test_exclude_wildcards_match_keys_and_list_items():
+    projection = PayloadProjection(exclude=["info.outputs.*.images.*.width", "info.messages.*"])
+    entry = projection.apply(make_entry())
+
+    assert entry["info"]["outputs"]["9"]["images"] == [{"filename": "out.png", "subfolder": "", "type": "output"}]
+    assert entry["info"]["outputs"]["10"] == {"text": ["hello"]}
+    assert entry["info"]["messages"] == []
+    # 未命中的路径原样保留
+    assert PayloadProjection(exclude=["info.missing.*"]).apply(make_entry()) == make_entry()
+
+
+def test_max_field_bytes_truncates_large_fields():
+    projection = PayloadProjection(max_field_bytes=100)
+    entry = projection.apply(make_entry())
+
+    assert entry["info"]["messages"]["truncated"] is True
+    assert entry["info"]["messages"]["size"] > 100
+    # 未超限的字段保持原样
+    assert entry["info"]["prompts"] == make_entry()["info"]["prompts"]
+    assert entry["info"]["status"] == "success"
+    assert projection.truncated_fields == 2
+
+
+def test_projection_does_not_mutate_source():
+    snapshot = make_snapshot()
+    original = copy.deepcopy(snapshot)
+
+    for projection in (
+        PayloadProjection("minimal"),
+        PayloadProjection(include=["info.outputs"]),
+        PayloadProjection(exclude=["info.outputs.*.images.*.width", "info.node_timings.*"]),
+        PayloadProjection("standard", max_field_bytes=16),
+    ):
+        projected = projection.apply_snapshot(snapshot)
+        assert projected is not snapshot
+        assert snapshot == original
+
+
+def test_summary_helpers_ignore_malformed_input():
+    assert summarize_messages([["execution_start"], "bad", None]) == {}
+    assert output_refs(None) == {}
+    assert output_refs({"9": "bad", "10": {"images": "bad"}}) == {}
@@ -0,0 +1,49 @@
+import fake_comfy
+import pytest
+
+from KY_monitor import monitor_logic
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.metrics import MonitorMetrics, render_prometheus
+from KY_monitor.scheduler import AdaptiveScheduler
+
+
+def samples(text, name):
+    return [line for line in text.splitlines() if line.startswith(f"ky_monitor_{name} ")]
+
+
+def test_poll_interval_gauge_follows_scheduler(clock):
+    scheduler = AdaptiveScheduler(active_interval=1.0, idle_interval=5.0, idle_max_interval=20.0, clock=clock)
+    metrics = MonitorMetrics()
+
+    scheduler.next_delay(active=True)
+    text = render_prometheus(metrics, scheduler=scheduler.stats())
+    assert "# TYPE ky_monitor_poll_interval_seconds gauge" in text
+    assert samples(text, "poll_interval_seconds") == ["ky_monitor_poll_interval_seconds 1"]
+
+    # 空闲后按倍数退避，导出的间隔随之变化
+    scheduler.next_delay(active=False)
+    scheduler.next_delay(active=False)
+    text = render_prometheus(metrics, scheduler=scheduler.stats())
+    assert samples(text, "poll_interval_seconds") == [f"ky_monitor_poll_interval_seconds {scheduler.interval:g}"]
+    assert scheduler.interval > 5.0
+    assert samples(text, "skipped_ticks_total") == ["ky_monitor_skipped_ticks_total 0"]
+
+
+def test_poll_interval_gauge_absent_without_scheduler():
+    text = render_prometheus(MonitorMetrics())
+    assert "poll_interval_seconds" not in text
+
+
+@pytest.mark.parametrize("mode, exported", [("poll", True), ("event", False)])
+def test_scheduler_metrics_only_in_poll_mode(monkeypatch, mode, exported):
+    monkeypatch.setattr(APP_CONFIG, "monitor_mode", mode)
+    fake_comfy.install_fake_modules(fake_comfy.FakePromptServer())
+    monkeypatch.setattr(monitor_logic, "monitor_instance", monitor_logic.ComfyMonitor(loop=None))
+
+    stats = monitor_logic.get_scheduler_stats()
+    text = render_prometheus(MonitorMetrics(), scheduler=stats)
+
+    assert (stats is not None) == exported
+    assert bool(samples(text, "poll_interval_seconds")) == exported
+    assert bool(samples(text, "skipped_ticks_total")) == exported
+    assert ("scheduler" in monitor_logic.get_metrics()) == exported
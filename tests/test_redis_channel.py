@@ -0,0 +1,112 @@
+import json
+
+import fakeredis
+import pytest
+
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.notifications import RedisChannel
+
+
+class SpyRedis:
+    """包装 fakeredis，记录每个 pipeline 的命令与 execute() 次数"""
+
+    def __init__(self, client):
+        self.client = client
+        self.executes = 0
+        self.commands = []
+
+    def pipeline(self, transaction=False):
+        spy = self
+        pipe = self.client.pipeline(transaction=transaction)
+
+        class Pipeline:
+            def __getattr__(self, name):
+                command = getattr(pipe, name)
+
+                def call(*args, **kwargs):
+                    spy.commands.append((name, args, kwargs))
+                    return command(*args, **kwargs)
+                return call
+
+            def execute(self):
+                spy.executes += 1
+                return pipe.execute()
+        return Pipeline()
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeStrictRedis()
+
+
+def make_channel(monkeypatch, client, mode, maxlen=10000):
+    monkeypatch.setattr(APP_CONFIG, "redis_mode", mode)
+    monkeypatch.setattr(APP_CONFIG, "redis_stream_maxlen", maxlen)
+    monkeypatch.setattr(APP_CONFIG, "topics", [])
+    monkeypatch.setattr(APP_CONFIG, "redis_state_enabled", False)
+    spy = SpyRedis(client)
+    return RedisChannel(client=spy), spy
+
+
+def next_message(pubsub):
+    # 先取出订阅确认，再取发布的消息
+    for _ in range(10):
+        message = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+        if message is not None:
+            return message
+    return None
+
+
+def records(count=3):
+    return [
+        {"event": "ky_monitor.delta", "instance_id": "node-1",
+         "data": {"seq": i, "op": "progress", "prompt_id": f"p{i}", "progress": {"percentage": i}}}
+        for i in range(count)
+    ]
+
+
+def test_pubsub_publishes_whole_list(monkeypatch, redis_client):
+    channel, spy = make_channel(monkeypatch, redis_client, "pubsub")
+    pubsub = redis_client.pubsub()
+    pubsub.subscribe(APP_CONFIG.redis_channel_name)
+    channel.send(records())
+    message = next_message(pubsub)
+    assert json.loads(message["data"]) == records()
+    assert redis_client.exists(APP_CONFIG.redis_stream_name) == 0
+    assert spy.executes == 1
+
+
+def test_stream_xadd_fields_and_trimming(monkeypatch, redis_client):
+    channel, spy = make_channel(monkeypatch, redis_client, "stream", maxlen=100)
+    channel.send(records(3))
+    entries = redis_client.xrange(APP_CONFIG.redis_stream_name)
+    assert len(entries) == 3
+    fields = entries[1][1]
+    assert fields[b"event"] == b"ky_monitor.delta"
+    assert fields[b"prompt_id"] == b"p1"
+    assert fields[b"instance_id"] == b"node-1"
+    assert json.loads(fields[b"data"]) == records(3)[1]
+    # 每条记录一个 XADD MAXLEN ~ 100，全部在同一个 pipeline 中
+    xadds = [kwargs for name, _, kwargs in spy.commands if name == "xadd"]
+    assert xadds == [{"maxlen": 100, "approximate": True}] * 3
+    assert spy.executes == 1
+
+
+def test_stream_is_trimmed_to_maxlen(monkeypatch, redis_client):
+    channel, _ = make_channel(monkeypatch, redis_client, "stream", maxlen=5)
+    for _ in range(10):
+        channel.send(records(3))
+    # 近似裁剪只保证不会无限增长
+    assert redis_client.xlen(APP_CONFIG.redis_stream_name) < 30
+
+
+def test_both_modes_share_one_round_trip(monkeypatch, redis_client):
+    channel, spy = make_channel(monkeypatch, redis_client, "both")
+    pubsub = redis_client.pubsub()
+    pubsub.subscribe(APP_CONFIG.redis_channel_name)
+    channel.send(records(2))
+    channel.send(records(2))
+    assert next_message(pubsub) is not None
+    assert redis_client.xlen(APP_CONFIG.redis_stream_name) == 4
+    assert [name for name, _, _ in spy.commands].count("publish") == 2
+    assert spy.executes == 2
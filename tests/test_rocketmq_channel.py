@@ -0,0 +1,212 @@
+import json
+
+import pytest
+
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.notifications import RocketMQChannel
+
+
+class StubMessage:
+    def __init__(self, topic):
+        self.topic = topic
+        self.keys = None
+        self.tags = None
+        self.body = None
+
+    def set_keys(self, keys):
+        self.keys = keys
+
+    def set_tags(self, tags):
+        self.tags = tags
+
+    def set_body(self, body):
+        self.body = body
+
+    def records(self):
+        return json.loads(self.body)
+
+
+class StubProducer:
+    """记录各发送方式收到的消息，与 rocketmq-client-python 一样没有 send_async"""
+
+    def __init__(self):
+        self.sent = []
+        self.starts = 0
+        self.shutdowns = 0
+
+    def start(self):
+        self.starts += 1
+
+    def shutdown(self):
+        self.shutdowns += 1
+
+    def send_sync(self, msg):
+        self.sent.append(("sync", msg))
+
+    def send_oneway(self, msg):
+        self.sent.append(("oneway", msg))
+
+
+class AsyncStubProducer(StubProducer):
+    def send_async(self, msg, on_success, on_error):
+        self.sent.append(("async", msg))
+        on_success(None)
+
+
+def make_channel(monkeypatch, producer, send_mode="sync", batch_size=0, linger_ms=50, topics=()):
+    monkeypatch.setattr(APP_CONFIG, "rocketmq_send_mode", send_mode)
+    monkeypatch.setattr(APP_CONFIG, "rocketmq_batch_size", batch_size)
+    monkeypatch.setattr(APP_CONFIG, "rocketmq_linger_ms", linger_ms)
+    monkeypatch.setattr(APP_CONFIG, "topics", list(topics))
+    return RocketMQChannel(producer=producer, message_factory=StubMessage)
+
+
+def prompt_record(prompt_id):
+    return {"event": "ky_monitor.update", "data": {"prompt_id": prompt_id, "op": "updated", "seq": 1}}
+
+
+def test_default_send_mode_is_sync():
+    assert APP_CONFIG.rocketmq_send_mode == "sync"
+
+
+@pytest.mark.parametrize("producer_class, send_mode, expected", [
+    (StubProducer, "sync", "sync"),
+    (StubProducer, "oneway", "oneway"),
+    (AsyncStubProducer, "async", "async"),
+    # 客户端没有 send_async 时回退到 oneway
+    (StubProducer, "async", "oneway"),
+])
+def test_send_modes(monkeypatch, producer_class, send_mode, expected):
+    producer = producer_class()
+    channel = make_channel(monkeypatch, producer, send_mode)
+
+    channel.send([prompt_record("p1")])
+
+    assert producer.starts == 1
+    assert [mode for mode, _ in producer.sent] == [expected]
+    assert channel.send_errors == 0
+
+
+def test_message_keys_and_tags(monkeypatch):
+    producer = StubProducer()
+    channel = make_channel(monkeypatch, producer)
+    snapshot = {"event": "ky_monitor.update", "instance_id": "i1", "data": {
+        "queue_status": {}, "prompts": [{"prompt_id": "a"}, {"prompt_id": "b"}, {"prompt_id": "a"}]}}
+
+    channel.send([snapshot, prompt_record("c")])
+    channel.send([{"event": "ky_monitor.self_report", "data": {"uptime_seconds": 1}}])
+
+    (_, first), (_, second) = producer.sent
+    assert first.keys == "a b c"
+    assert first.tags == "comfyui_status"
+    assert first.topic == APP_CONFIG.rocketmq_topic
+    assert first.records() == [snapshot, prompt_record("c")]
+    assert second.keys == RocketMQChannel.DEFAULT_KEY
+
+
+def test_message_keys_are_capped():
+    records = [prompt_record(f"p{i}") for i in range(RocketMQChannel.MAX_KEYS + 5)]
+    assert len(RocketMQChannel.message_keys(records).split(" ")) == RocketMQChannel.MAX_KEYS
+
+
+def test_batches_records_across_sends(monkeypatch):
+    producer = StubProducer()
+    # linger 足够长，只有攒满 batch_size 才发送
+    channel = make_channel(monkeypatch, producer, batch_size=3, linger_ms=60000)
+
+    channel.send([prompt_record("p1")])
+    channel.send([prompt_record("p2")])
+    assert producer.sent == []
+
+    channel.send([prompt_record("p3"), prompt_record("p4")])
+    assert len(producer.sent) == 1
+    message = producer.sent[0][1]
+    assert [r["data"]["prompt_id"] for r in message.records()] == ["p1", "p2", "p3"]
+    assert message.keys == "p1 p2 p3"
+
+    # 剩余的 p4 在关闭时发送，然后关闭生产者
+    channel.shutdown()
+    assert [r["data"]["prompt_id"] for r in producer.sent[1][1].records()] == ["p4"]
+    assert producer.shutdowns == 1
+
+
+def test_linger_flushes_partial_batch(monkeypatch):
+    producer = StubProducer()
+    channel = make_channel(monkeypatch, producer, batch_size=10, linger_ms=10)
+
+    channel.send([prompt_record("p1")])
+    timer = channel._linger_timer
+    assert timer is not None
+    timer.join(5)
+
+    assert len(producer.sent) == 1
+    assert producer.sent[0][1].records() == [prompt_record("p1")]
+    assert channel._linger_timer is None
+
+
+def test_shutdown_stops_sending(monkeypatch):
+    producer = StubProducer()
+    channel = make_channel(monkeypatch, producer)
+
+    channel.shutdown()
+    channel.shutdown()
+    channel.send([prompt_record("p1")])
+
+    assert producer.shutdowns == 1
+    assert producer.sent == []
+
+
+def test_send_error_is_counted(monkeypatch):
+    producer = StubProducer()
+
+    def fail(msg):
+        raise RuntimeError("broker down")
+    producer.send_sync = fail
+    channel = make_channel(monkeypatch, producer)
+
+    channel.send([prompt_record("p1")])
+
+    assert channel.send_errors == 1
+
+
+def client_record(prompt_id, client_id, status="running"):
+    prompt = {"prompt_id": prompt_id, "client_id": client_id, "status": status}
+    return {"event": "ky_monitor.delta", "data": {"prompt_id": prompt_id, "op": "added", "seq": 1, "prompt": prompt}}
+
+
+def test_topic_records_without_batching_sent_per_broadcast(monkeypatch):
+    producer = StubProducer()
+    channel = make_channel(monkeypatch, producer, topics=["client"])
+
+    channel.send([client_record("a", "c1"), client_record("b", "c2")])
+
+    assert [msg.tags for _, msg in producer.sent] == ["comfyui_status", "client:c1", "client:c2"]
+
+
+def test_topic_records_are_batched_per_tag(monkeypatch):
+    producer = StubProducer()
+    channel = make_channel(monkeypatch, producer, batch_size=2, linger_ms=60000, topics=["client", "errors"])
+
+    channel.send([client_record("a", "c1")])
+    channel.send([client_record("b", "c2", "error")])
+    # 主消息攒满2条后发送，各主题的缓冲区尚未攒满
+    assert [(msg.tags, msg.keys) for _, msg in producer.sent] == [("comfyui_status", "a b")]
+
+    channel.send([client_record("c", "c1")])
+    assert [(msg.tags, msg.keys) for _, msg in producer.sent[1:]] == [("client:c1", "a c")]
+
+    # 其余tag的部分批次在关闭时各自发送一条消息
+    channel.shutdown()
+    remaining = sorted((msg.tags, msg.keys) for _, msg in producer.sent[2:])
+    assert remaining == [("client:c2", "b"), ("comfyui_status", "c"), ("errors", "b")]
+    assert channel._buffers == {}
+
+
+def test_linger_flushes_every_tag(monkeypatch):
+    producer = StubProducer()
+    channel = make_channel(monkeypatch, producer, batch_size=10, linger_ms=10, topics=["client"])
+
+    channel.send([client_record("a", "c1")])
+    channel._linger_timer.join(5)
+
+    assert sorted(msg.tags for _, msg in producer.sent) == ["client:c1", "comfyui_status"]
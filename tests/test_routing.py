@@ -0,0 +1,113 @@
+import fake_comfy
+
+from KY_monitor import monitor_logic
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.notifications import DeltaPublisher
+from KY_monitor.notifications.routing import ClientRouter, SUMMARY_EVENT
+
+
+def finished_history(prompt_id, prompt, status, client_id):
+    history_item = fake_comfy.make_history_item(prompt_id, prompt, status)
+    history_item["prompt"][3]["client_id"] = client_id
+    return history_item
+
+
+def test_split_snapshot_delivers_completed_entries_to_owner(monkeypatch):
+    prompt_server = fake_comfy.FakePromptServer()
+    fake_comfy.install_fake_modules(prompt_server)
+    monkeypatch.setattr(APP_CONFIG, "node_timing_enabled", False)
+    monitor = monitor_logic.ComfyMonitor(loop=None)
+    queue = prompt_server.prompt_queue
+    prompt, _ = fake_comfy.make_workflow(5)
+    for number, (prompt_id, client_id) in enumerate([("ok", "c1"), ("bad", "c2"), ("next", "c3")]):
+        queue.put((number, prompt_id, prompt, {"client_id": client_id}, ["9"]))
+    monitor.get_queue_status()
+
+    queue.start_next()
+    queue.task_done("ok", finished_history("ok", prompt, "success", "c1"))
+    queue.start_next()
+    queue.task_done("bad", finished_history("bad", prompt, "error", "c2"))
+    record = {"event": "ky_monitor.queue", "data": monitor.get_queue_status(), "instance_id": "i1"}
+
+    shared, per_client = ClientRouter().split([record])
+
+    assert [r["event"] for r in shared] == [SUMMARY_EVENT]
+    assert "prompts" not in shared[0]["data"]
+    assert set(per_client) == {"c1", "c2", "c3"}
+    [c1_record] = per_client["c1"]
+    assert [(p["prompt_id"], p["status"]) for p in c1_record["data"]["prompts"]] == [("ok", "success")]
+    assert c1_record["data"]["prompts"][0]["info"]["outputs"]
+    [c2_record] = per_client["c2"]
+    assert [(p["prompt_id"], p["status"]) for p in c2_record["data"]["prompts"]] == [("bad", "error")]
+    assert c2_record["data"]["prompts"][0]["info"]["error_node_id"] == "5"
+    assert [p["status"] for p in per_client["c3"][0]["data"]["prompts"]] == ["waiting"]
+    # 拆分后的记录保留 instance_id 与 queue_status
+    assert all(r["instance_id"] == "i1" and "queue_status" in r["data"] for rs in per_client.values() for r in rs)
+
+
+def test_completed_entry_without_client_is_not_delivered():
+    snapshot = {"event": "ky_monitor.queue", "data": {"queue_status": {}, "prompts": [
+        {"prompt_id": "api", "client_id": None, "status": "success", "info": {}},
+        {"prompt_id": "mine", "client_id": "c1", "status": "error", "info": {}},
+    ]}}
+
+    shared, per_client = ClientRouter().split([snapshot])
+
+    assert list(per_client) == ["c1"]
+    assert [p["prompt_id"] for p in per_client["c1"][0]["data"]["prompts"]] == ["mine"]
+    assert len(shared) == 1
+
+
+def test_delta_records_are_renumbered_per_client(clock):
+    publisher = DeltaPublisher(keyframe_seconds=10, clock=clock)
+    router = ClientRouter()
+    received = {}
+    shared_records = []
+
+    def entry(prompt_id, client_id, status="waiting", percentage=None):
+        prompt = {"prompt_id": prompt_id, "client_id": client_id, "status": status}
+        if percentage is not None:
+            prompt["progress"] = {"percentage": percentage}
+        return prompt
+
+    steps = [
+        [entry("a", "c1"), entry("b", "c2"), entry("c", "c1")],
+        [entry("a", "c1", "running", 10), entry("b", "c2"), entry("c", "c1")],
+        [entry("a", "c1", "running", 50), entry("b", "c2"), entry("c", "c1")],
+        [entry("b", "c2", "running", 0), entry("c", "c1"), entry("d", "c2")],
+        [entry("b", "c2", "running", 70), entry("c", "c1", "running"), entry("d", "c2")],
+        # 关键帧
+        [entry("b", "c2", "running", 80), entry("c", "c1", "running"), entry("d", "c2")],
+        [entry("c", "c1", "running"), entry("d", "c2", "running")],
+    ]
+    for step, prompts in enumerate(steps):
+        clock.now = step * 2
+        snapshot = {"queue_status": {"running": 1, "waiting": len(prompts) - 1}, "prompts": prompts}
+        shared, per_client = router.split(publisher.diff(snapshot))
+        shared_records.extend(shared)
+        for client_id, records in per_client.items():
+            received.setdefault(client_id, []).extend(records)
+
+    for client_id in ("c1", "c2"):
+        seqs = [record["data"]["seq"] for record in received[client_id]]
+        assert seqs == list(range(1, len(seqs) + 1)), client_id
+    assert [r["data"].get("op", "keyframe") for r in received["c1"]] == [
+        "keyframe", "status", "progress", "removed", "status", "keyframe"]
+    assert all("seq" not in record["data"] for record in shared_records)
+    assert {record["event"] for record in shared_records} == {SUMMARY_EVENT, "ky_monitor.delta"}
+
+
+def test_client_seq_restarts_after_client_has_no_prompts():
+    router = ClientRouter()
+
+    def keyframe(seq, *prompts):
+        return {"event": "ky_monitor.queue", "data": {"seq": seq, "keyframe": True, "queue_status": {},
+                                                      "prompts": list(prompts)}}
+
+    router.split([keyframe(1, {"prompt_id": "a", "client_id": "c1"})])
+    router.split([keyframe(2, {"prompt_id": "b", "client_id": "c2"})])
+    _, per_client = router.split([keyframe(3, {"prompt_id": "c", "client_id": "c1"},
+                                           {"prompt_id": "b", "client_id": "c2"})])
+
+    assert per_client["c1"][0]["data"]["seq"] == 1
+    assert per_client["c2"][0]["data"]["seq"] == 2
@@ -0,0 +1,84 @@
+import fakeredis
+import pytest
+
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.notifications import RedisChannel
+from KY_monitor.notifications.state_store import RedisStateWriter
+
+
+def snapshot(*prompts):
+    return {"event": "ky_monitor.queue", "instance_id": "i1", "data": {
+        "queue_status": {"running": 1, "waiting": len(prompts) - 1, "completed": 0},
+        "prompts": list(prompts),
+    }}
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeStrictRedis(decode_responses=True)
+
+
+def write(writer, client, records):
+    pipe = client.pipeline(transaction=False)
+    writer.write(pipe, records)
+    pipe.execute()
+
+
+def heartbeat(writer, client):
+    pipe = client.pipeline(transaction=False)
+    written = writer.heartbeat(pipe)
+    pipe.execute()
+    return written
+
+
+def test_heartbeat_keeps_idle_instance_alive(redis_client, clock):
+    writer = RedisStateWriter(instance_ttl=30, prompt_ttl=60, clock=clock)
+    clock.now = 1000
+    write(writer, redis_client, [snapshot({"prompt_id": "a", "client_id": "c1", "status": "running"})])
+    key = writer.instance_key("i1")
+
+    # 刚写入过，心跳不重复写
+    clock.now = 1005
+    assert heartbeat(writer, redis_client) is False
+
+    # 没有广播超过心跳间隔后刷新心跳时间、TTL与索引分数，其余字段保持不变
+    clock.now = 1010
+    redis_client.expire(key, 5)
+    assert heartbeat(writer, redis_client) is True
+    assert float(redis_client.hget(key, "heartbeat")) == 1010
+    assert redis_client.hget(key, "running_prompt_id") == "a"
+    assert redis_client.ttl(key) > 5
+    assert redis_client.zscore(writer.index_key, "i1") == 1010
+
+    # prompt键超过半个TTL后随心跳续期
+    clock.now = 1040
+    redis_client.expire(writer.prompt_key("a"), 5)
+    assert heartbeat(writer, redis_client) is True
+    assert redis_client.ttl(writer.prompt_key("a")) > 5
+
+
+def test_heartbeat_without_instances_writes_nothing(redis_client, clock):
+    writer = RedisStateWriter(instance_ttl=30, clock=clock)
+
+    assert heartbeat(writer, redis_client) is False
+    assert redis_client.keys("*") == []
+
+
+def test_channel_heartbeat_thread(monkeypatch, redis_client):
+    monkeypatch.setattr(APP_CONFIG, "redis_mode", "state")
+    monkeypatch.setattr(APP_CONFIG, "redis_state_ttl_seconds", 1)
+    monkeypatch.setattr(APP_CONFIG, "topics", [])
+    channel = RedisChannel(client=redis_client)
+    try:
+        assert channel._heartbeat_thread is not None
+        channel.send([snapshot({"prompt_id": "a", "client_id": "c1", "status": "running"})])
+        key = channel.state_writer.instance_key("i1")
+        first = float(redis_client.hget(key, "heartbeat"))
+
+        # 没有后续广播，心跳线程仍在TTL到期前刷新实例键
+        channel._heartbeat_stop.wait(1.5)
+        assert redis_client.exists(key)
+        assert float(redis_client.hget(key, "heartbeat")) > first
+    finally:
+        channel.shutdown()
+    assert channel._heartbeat_thread is None
@@ -0,0 +1,198 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from KY_monitor import monitor_logic, routes
+from KY_monitor.config import APP_CONFIG
+from KY_monitor.notifications import channel as channel_module
+from KY_monitor.notifications.channel import PromptServerChannel
+from KY_monitor.notifications.topics import SUBSCRIPTIONS, TopicRouter, forbidden_topics
+from KY_monitor.tracking import TaskLifecycle
+
+
+class RecordingServer:
+    def __init__(self, sids):
+        self.sockets = {sid: object() for sid in sids}
+        self.sent = {}
+        self.routes = web.RouteTableDef()
+
+    def send_sync(self, event, data, sid=None):
+        self.sent.setdefault(sid, []).extend(data)
+
+
+class FlakySockets(dict):
+    """复制时前几次抛出并发修改错误的 sockets"""
+
+    def __init__(self, sids, failures):
+        super().__init__((sid, object()) for sid in sids)
+        self.failures = failures
+
+    def __iter__(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("dictionary changed size during iteration")
+        return super().__iter__()
+
+
+def snapshot(*prompts):
+    return {"event": "ky_monitor.queue", "data": {"queue_status": {}, "prompts": list(prompts)}}
+
+
+def prompt(prompt_id, client_id, status="running"):
+    return {"prompt_id": prompt_id, "client_id": client_id, "status": status}
+
+
+@pytest.fixture(autouse=True)
+def clear_subscriptions():
+    for sid in list(SUBSCRIPTIONS.snapshot()):
+        SUBSCRIPTIONS.remove(sid)
+    yield
+    for sid in list(SUBSCRIPTIONS.snapshot()):
+        SUBSCRIPTIONS.remove(sid)
+
+
+def test_forbidden_topics():
+    owners = {"mine": "c1", "theirs": "c2"}
+    topics = ["client:c1", "client:c2", "prompt:mine", "prompt:theirs", "prompt:unknown", "errors"]
+
+    assert forbidden_topics("c1", topics) == ["client:c2"]
+    assert forbidden_topics("c1", topics, owners.get) == ["client:c2", "prompt:theirs"]
+
+
+def test_filter_with_owner_keeps_only_own_prompts():
+    router = TopicRouter()
+    assigned = router.assign([
+        snapshot(prompt("a", "c1", "error"), prompt("b", "c2", "error"), prompt("c", "c1")),
+        {"event": "ky_monitor.delta", "data": {"op": "progress", "prompt_id": "b", "progress": {}}},
+    ])
+
+    filtered = TopicRouter.filter(assigned, {"errors", "prompt:b"}, owner="c1")
+
+    assert [[p["prompt_id"] for p in r["data"]["prompts"]] for r in filtered] == [["a"]]
+    assert [p["prompt_id"] for p in TopicRouter.filter(assigned, {"errors"})[0]["data"]["prompts"]] == ["a", "b"]
+
+
+def make_channel(monkeypatch, server, delivery):
+    monkeypatch.setattr(APP_CONFIG, "prompt_server_enabled", True)
+    monkeypatch.setattr(APP_CONFIG, "prompt_server_delivery", delivery)
+    monkeypatch.setattr(channel_module, "prompt_server", server)
+    return PromptServerChannel()
+
+
+def test_per_client_subscription_only_receives_own_prompts(monkeypatch):
+    server = RecordingServer(["c1", "c2"])
+    channel = make_channel(monkeypatch, server, "per_client")
+    SUBSCRIPTIONS.set("c1", ["errors"])
+
+    channel.send([snapshot(prompt("a", "c1", "error"), prompt("b", "c2", "error"))])
+
+    assert [[p["prompt_id"] for p in r["data"]["prompts"]] for r in server.sent["c1"]] == [["a"]]
+    # 未注册过滤的连接仍按 per_client 投递: 队列摘要 + 自己的prompt
+    assert [p["prompt_id"] for p in server.sent["c2"][1]["data"]["prompts"]] == ["b"]
+
+
+def test_sockets_snapshot_retries_concurrent_modification(monkeypatch):
+    server = RecordingServer([])
+    server.sockets = FlakySockets(["c1"], failures=2)
+    channel = make_channel(monkeypatch, server, "broadcast")
+    SUBSCRIPTIONS.set("c1", ["client:c1"])
+
+    channel.send([snapshot(prompt("a", "c1"))])
+
+    assert [p["prompt_id"] for p in server.sent["c1"][0]["data"]["prompts"]] == ["a"]
+
+
+def test_sockets_snapshot_falls_back_to_event_loop(monkeypatch):
+    loop = asyncio.new_event_loop()
+    try:
+        server = RecordingServer([])
+        server.sockets = FlakySockets(["c1"], failures=PromptServerChannel.SOCKETS_SNAPSHOT_RETRIES)
+        server.loop = loop
+        channel = make_channel(monkeypatch, server, "broadcast")
+
+        async def snapshot_from_thread():
+            return await loop.run_in_executor(None, channel._connected_sids)
+        assert loop.run_until_complete(snapshot_from_thread()) == ["c1"]
+    finally:
+        loop.close()
+
+
+def subscription_requests(monkeypatch, delivery, requests, sids=("c1", "c2")):
+    """依次发送 (method, path, json, headers)，返回 (status, 响应体) 列表"""
+    monkeypatch.setattr(APP_CONFIG, "prompt_server_enabled", True)
+    monkeypatch.setattr(APP_CONFIG, "prompt_server_delivery", delivery)
+    lifecycle = TaskLifecycle()
+    lifecycle.observe_queued("theirs", "c2")
+    lifecycle.observe_queued("mine", "c1")
+    monkeypatch.setattr(monitor_logic, "monitor_instance", type("Monitor", (), {"lifecycle": lifecycle})())
+    server = RecordingServer(sids)
+    routes.register_routes(server)
+    app = web.Application()
+    app.add_routes(server.routes)
+
+    async def run():
+        results = []
+        async with TestClient(TestServer(app)) as client:
+            for method, path, body, headers in requests:
+                response = await client.request(method, path, json=body, headers=headers or {})
+                text = await response.text()
+                results.append((response.status, json.loads(text) if response.status == 200 else text))
+        return results
+    return asyncio.run(run())
+
+
+def post_subscription(monkeypatch, delivery, body):
+    return subscription_requests(monkeypatch, delivery, [("POST", "/ky_monitor/subscriptions", body, None)])[0]
+
+
+@pytest.mark.parametrize("delivery, topics, status", [
+    ("broadcast", ["client:c1", "errors"], 200),
+    ("broadcast", ["client:c2"], 403),
+    ("broadcast", ["prompt:theirs"], 200),
+    ("per_client", ["prompt:mine", "prompt:unknown", "errors"], 200),
+    ("per_client", ["prompt:theirs"], 403),
+    ("per_client", ["client:c2"], 403),
+])
+def test_subscription_route_rejects_other_clients_topics(monkeypatch, delivery, topics, status):
+    code, text = post_subscription(monkeypatch, delivery, {"client_id": "c1", "topics": topics})
+
+    assert code == status, text
+    assert (SUBSCRIPTIONS.get("c1") is not None) == (status == 200)
+
+
+def token_header(token):
+    return {routes.SUBSCRIPTION_TOKEN_HEADER: token}
+
+
+def test_subscription_is_bound_to_registering_caller(monkeypatch):
+    path = "/ky_monitor/subscriptions"
+    (status, body), = subscription_requests(monkeypatch, "broadcast", [("POST", path, {"client_id": "c1", "topics": ["errors"]}, None)])
+    assert status == 200
+    token = body["token"]
+
+    results = subscription_requests(monkeypatch, "broadcast", [
+        # 没有令牌或令牌错误时不能覆盖、取消或删除
+        ("POST", path, {"client_id": "c1", "topics": ["client:c1"]}, None),
+        ("POST", path, {"client_id": "c1", "topics": []}, token_header("wrong")),
+        ("DELETE", f"{path}/c1", None, None),
+        # 持有令牌的调用方可以修改，令牌不变
+        ("POST", path, {"client_id": "c1", "topics": ["client:c1"]}, token_header(token)),
+        ("GET", f"{path}/c1", None, None),
+        ("DELETE", f"{path}/c1", None, token_header(token)),
+    ])
+
+    assert [status for status, _ in results] == [403, 403, 403, 200, 200, 200]
+    assert results[3][1]["token"] == token
+    assert results[4][1]["topics"] == ["client:c1"]
+    assert results[5][1]["removed"] is True
+    assert SUBSCRIPTIONS.get("c1") is None
+
+
+def test_subscription_requires_connected_websocket(monkeypatch):
+    code, text = post_subscription(monkeypatch, "broadcast", {"client_id": "c3", "topics": ["errors"]})
+
+    assert code == 403, text
+    assert SUBSCRIPTIONS.get("c3") is None
@@ -0,0 +1,120 @@
+import random
+
+import pytest
+
+from KY_monitor.tracking import WaitTimePredictor
+
+
+def graph(kind, steps=20):
+    return {"1": {"class_type": kind, "inputs": {"steps": steps, "seed": 1}}}
+
+
+def item(number, kind="KSampler", steps=20):
+    return (number, f"p{number}", graph(kind, steps), {}, ["1"])
+
+
+def reference(predictor, pending_items):
+    """按编号逐个累加的完整计算"""
+    offsets, elapsed = {}, 0.0
+    for pending in sorted(pending_items, key=lambda i: i[0]):
+        expected = predictor.expected_seconds(pending[1], pending[2])
+        if expected is None:
+            break
+        offsets[pending[1]] = (elapsed, elapsed + expected)
+        elapsed += expected
+    return offsets
+
+
+class CountingPredictor(WaitTimePredictor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimates = 0
+
+    def _estimate(self, fingerprint, prompt_graph):
+        self.estimates += 1
+        return super()._estimate(fingerprint, prompt_graph)
+
+
+def test_unknown_workflows_have_no_prediction():
+    predictor = WaitTimePredictor()
+    assert dict(predictor.predict([item(1), item(2)])) == {}
+
+
+def test_offsets_accumulate_in_queue_order():
+    predictor = WaitTimePredictor()
+    predictor.observe("h1", graph("KSampler"), 10.0)
+    predictor.observe("h2", graph("Upscale"), 4.0)
+    pending = [item(3, "Upscale"), item(1), item(2)]
+
+    offsets = predictor.predict(pending)
+
+    assert dict(offsets) == {"p1": (0.0, 10.0), "p2": (10.0, 20.0), "p3": (20.0, 24.0)}
+
+
+def test_head_start_and_tail_append_are_incremental():
+    predictor = CountingPredictor()
+    predictor.observe("h1", graph("KSampler"), 10.0)
+    pending = [item(n) for n in range(1, 101)]
+    assert predictor.predict(pending)["p100"] == (990.0, 1000.0)
+    assert predictor.estimates == 100
+
+    # 队首开始运行、队尾新增: 已有prompt不重新估算，偏移整体前移
+    pending = pending[1:] + [item(101)]
+    offsets = predictor.predict(pending)
+    assert offsets["p2"] == (0.0, 10.0)
+    assert offsets["p101"] == (990.0, 1000.0)
+    assert predictor.estimates == 101
+    assert dict(offsets) == reference(predictor, pending)
+
+
+def test_observe_reestimates_only_matching_fingerprint():
+    predictor = CountingPredictor()
+    predictor.observe("h1", graph("KSampler"), 10.0)
+    predictor.observe("h2", graph("Upscale"), 4.0)
+    pending = [item(n, "Upscale" if n % 2 else "KSampler") for n in range(1, 11)]
+    dict(predictor.predict(pending))
+    estimates = predictor.estimates
+
+    predictor.observe("h3", graph("Upscale"), 8.0)
+    offsets = predictor.predict(pending)
+
+    assert dict(offsets) == reference(predictor, pending)
+    # Upscale 的平均耗时变为6秒，只有5个Upscale prompt重新估算
+    assert predictor.estimates == estimates + 5
+    assert offsets["p10"] == (70.0, 80.0)
+
+
+def test_random_queue_changes_match_full_recompute():
+    rng = random.Random(7)
+    predictor = WaitTimePredictor()
+    # 让队首指针频繁压缩
+    predictor.COMPACT_THRESHOLD = 4
+    kinds = ["KSampler", "Upscale", "VAEDecode"]
+    pending = {}
+    number = 0
+    for step in range(400):
+        action = rng.random()
+        if action < 0.35 or not pending:
+            number += 1
+            pending[number] = item(number, rng.choice(kinds), rng.choice([10, 20]))
+        elif action < 0.55:
+            # 插队: 编号小于队尾
+            front = min(pending) - rng.randint(1, 3)
+            if front not in pending:
+                pending[front] = item(front, rng.choice(kinds))
+        elif action < 0.75:
+            pending.pop(min(pending))
+        elif action < 0.85:
+            pending.pop(rng.choice(list(pending)))
+        else:
+            predictor.observe(f"h{step}", graph(rng.choice(kinds), rng.choice([10, 20])), rng.uniform(1, 30))
+        items = list(pending.values())
+        rng.shuffle(items)
+        offsets = predictor.predict(items)
+        expected = reference(predictor, items)
+        actual = dict(offsets)
+        assert actual.keys() == expected.keys()
+        for prompt_id, (start, finish) in expected.items():
+            assert actual[prompt_id] == (pytest.approx(start), pytest.approx(finish))
+        predictor.retain(set())
+        assert set(predictor._prompts) == {i[1] for i in items}
@@ -0,0 +1,26 @@
+from .state_machine import TaskStateMachine, TaskState
+from .events import PromptServerEventHook, WATCHED_EVENTS
+from .history_cursor import HistoryCursor, execution_seconds
+from .dedup import DedupStore
+from .node_index import WorkflowNodeIndex, NodeIndexCache
+from .node_timing import NodeTimer
+from .progress import ProgressEstimator
+from .wait_prediction import WaitTimePredictor, workflow_fingerprint
+from .lifecycle import TaskLifecycle
+
+__all__ = [
+    'TaskStateMachine',
+    'TaskState',
+    'PromptServerEventHook',
+    'WATCHED_EVENTS',
+    'HistoryCursor',
+    'execution_seconds',
+    'DedupStore',
+    'WorkflowNodeIndex',
+    'NodeIndexCache',
+    'NodeTimer',
+    'ProgressEstimator',
+    'WaitTimePredictor',
+    'workflow_fingerprint',
+    'TaskLifecycle'
+]
@@ -0,0 +1,70 @@
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("KY_monitor_dedup")
+
+
+class DedupStore:
+    """有界、按TTL淘汰的去重集合，用于保证完成/错误通知至多发送一次
+
+    条目按写入顺序保存在 OrderedDict 中，超过 ttl_seconds 或超出 capacity 时从最旧的一端淘汰。
+    只要保留窗口内完成的prompt数量不超过 capacity，窗口内同一 prompt_id 只会被放行一次。
+    """
+
+    def __init__(self, capacity=10000, ttl_seconds=3600, clock=time.monotonic):
+        self.capacity = max(1, int(capacity))
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        self._expire()
+        return len(self._entries)
+
+    def __contains__(self, key):
+        self._expire()
+        return key in self._entries
+
+    def add(self, key) -> bool:
+        """首次出现返回True并记录；窗口内已存在则返回False"""
+        self._expire()
+        if key in self._entries:
+            self.hits += 1
+            return False
+        self.misses += 1
+        self._entries[key] = self._clock()
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        self._expire()
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _expire(self):
+        if not self.ttl_seconds or self.ttl_seconds <= 0:
+            return
+        deadline = self._clock() - self.ttl_seconds
+        entries = self._entries
+        while entries:
+            key, added_at = next(iter(entries.items()))
+            if added_at > deadline:
+                break
+            entries.popitem(last=False)
+            self.expirations += 1
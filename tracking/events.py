@@ -0,0 +1,68 @@
+import logging
+
+logger = logging.getLogger("KY_monitor_events")
+
+# 需要监听的PromptServer事件
+WATCHED_EVENTS = frozenset({
+    "status",
+    "execution_start",
+    "execution_cached",
+    "executing",
+    "progress",
+    "executed",
+    "execution_error",
+    "execution_interrupted",
+    "execution_success",
+})
+
+
+class PromptServerEventHook:
+    """包装 PromptServer.send_sync，把关注的事件转发给回调
+
+    send_sync 通常在执行线程中被调用，回调需要自行切换到事件循环。
+    """
+
+    def __init__(self, prompt_server, callback, events=WATCHED_EVENTS):
+        self.prompt_server = prompt_server
+        self.callback = callback
+        self.events = events
+        self._original = None
+
+    @property
+    def installed(self) -> bool:
+        return self._original is not None
+
+    def install(self) -> bool:
+        if self.installed:
+            return True
+        if not self.prompt_server or not hasattr(self.prompt_server, "send_sync"):
+            logger.warning("PromptServer不可用或缺少send_sync，无法安装事件钩子")
+            return False
+
+        original = self.prompt_server.send_sync
+        events = self.events
+        callback = self.callback
+
+        def send_sync(event, data, sid=None):
+            original(event, data, sid)
+            if event in events:
+                try:
+                    callback(event, data)
+                except Exception as e:
+                    logger.error(f"处理事件 {event} 失败: {e}", exc_info=True)
+
+        self._original = original
+        self.prompt_server.send_sync = send_sync
+        logger.info("已挂钩PromptServer.send_sync")
+        return True
+
+    def uninstall(self):
+        if not self.installed:
+            return
+        # 实例属性覆盖了类方法，删除即可恢复；若原本就是实例属性则写回
+        if "send_sync" in vars(self.prompt_server) and getattr(self._original, "__self__", None) is self.prompt_server:
+            del self.prompt_server.send_sync
+        else:
+            self.prompt_server.send_sync = self._original
+        self._original = None
+        logger.info("已移除PromptServer.send_sync钩子")
@@ -0,0 +1,91 @@
+import logging
+from collections import OrderedDict
+from contextlib import nullcontext
+
+logger = logging.getLogger("KY_monitor_history")
+
+
+class HistoryCursor:
+    """增量读取 queue.history，每次只遍历上次扫描之后新增的条目
+
+    queue.history 是按插入顺序排列的 dict，新完成的prompt追加在末尾。
+    从末尾向前遍历，遇到最近处理过的任一 prompt_id 即停止，因此单次扫描是 O(新增条目)。
+    记住多个锚点而不是单个游标，使得 ComfyUI 裁剪旧记录或 delete_history 删除锚点时
+    仍能在附近停下；最坏情况下也只会遍历 max_backlog 条。
+    锚点全部被删除时可能重新返回旧条目，发送端的去重负责保证至多一次通知。
+    """
+
+    def __init__(self, max_backlog=100, anchor_size=None):
+        self.max_backlog = max(1, int(max_backlog))
+        self.anchor_size = max(64, self.max_backlog) if anchor_size is None else max(1, int(anchor_size))
+        self._anchors = OrderedDict()
+        self.skipped_scans = 0
+
+    def read_new(self, queue) -> list:
+        """返回新增的 (prompt_id, history_item) 列表，按完成先后排序"""
+        history = getattr(queue, "history", None)
+        if not history:
+            return []
+
+        new_items = []
+        truncated = False
+        with getattr(queue, "mutex", None) or nullcontext():
+            for prompt_id in reversed(history):
+                if prompt_id in self._anchors:
+                    break
+                if len(new_items) >= self.max_backlog:
+                    truncated = True
+                    break
+                new_items.append((prompt_id, history[prompt_id]))
+
+        if truncated:
+            self.skipped_scans += 1
+            logger.warning(f"新增历史记录超过 history_max_items={self.max_backlog}，更早的记录已跳过")
+
+        new_items.reverse()
+        for prompt_id, _ in new_items:
+            self._anchors[prompt_id] = None
+        while len(self._anchors) > self.anchor_size:
+            self._anchors.popitem(last=False)
+        return new_items
+
+    def seek_end(self, queue):
+        """把游标移到当前历史末尾，已有记录不再返回"""
+        history = getattr(queue, "history", None)
+        if not history:
+            return
+        with getattr(queue, "mutex", None) or nullcontext():
+            newest = []
+            for prompt_id in reversed(history):
+                if len(newest) >= self.anchor_size:
+                    break
+                newest.append(prompt_id)
+        self._anchors.clear()
+        for prompt_id in reversed(newest):
+            self._anchors[prompt_id] = None
+
+    def reset(self):
+        self._anchors.clear()
+
+
+# 标志prompt执行结束的状态消息
+FINISH_MESSAGES = ("execution_success", "execution_error", "execution_interrupted")
+
+
+def execution_seconds(status_dict):
+    """根据历史记录 status.messages 中的时间戳(毫秒)计算执行耗时(秒)，缺少时间戳时返回None"""
+    started = finished = None
+    for message in (status_dict or {}).get("messages") or []:
+        try:
+            msg_type, msg_data = message
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(msg_data, dict):
+            continue
+        if msg_type == "execution_start":
+            started = msg_data.get("timestamp")
+        elif msg_type in FINISH_MESSAGES:
+            finished = msg_data.get("timestamp")
+    if not isinstance(started, (int, float)) or not isinstance(finished, (int, float)):
+        return None
+    return max(0.0, (finished - started) / 1000.0)
@@ -0,0 +1,220 @@
+import time
+import bisect
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("KY_monitor_lifecycle")
+
+# 生命周期记录的字段
+RECORD_FIELDS = (
+    "prompt_id", "client_id", "number", "status",
+    "queued_at", "started_at", "finished_at", "duration",
+    "error", "outputs", "updated_at", "seq",
+)
+
+# 尚未结束的状态
+ACTIVE_STATUSES = ("waiting", "running")
+# 未执行完就从队列中消失(delete_queue 删除或被取消)
+STATUS_REMOVED = "removed"
+
+
+class _SeqIndex:
+    """按 seq 递增追加的 (seq, prompt_id) 列表，page() 用二分查找定位 cursor
+
+    记录更新或淘汰后旧条目留在原处、遍历时跳过，失效条目超过一半时整体压缩，均摊 O(1)。
+    """
+
+    __slots__ = ("_records", "seqs", "prompt_ids", "live")
+
+    def __init__(self, records):
+        self._records = records
+        self.seqs = []
+        self.prompt_ids = []
+        self.live = 0
+
+    def append(self, seq, prompt_id):
+        self.seqs.append(seq)
+        self.prompt_ids.append(prompt_id)
+        self.live += 1
+        self._maybe_compact()
+
+    def discard(self):
+        self.live -= 1
+
+    def before(self, cursor=None):
+        """倒序返回 seq 小于 cursor 的有效记录"""
+        self._maybe_compact()
+        records = self._records
+        seqs, prompt_ids = self.seqs, self.prompt_ids
+        end = len(seqs) if cursor is None else bisect.bisect_left(seqs, cursor)
+        for i in range(end - 1, -1, -1):
+            record = records.get(prompt_ids[i])
+            if record is not None and record["seq"] == seqs[i]:
+                yield record
+
+    def _maybe_compact(self):
+        if len(self.seqs) > 2 * self.live + 16:
+            self._compact()
+
+    def _compact(self):
+        records = self._records
+        seqs, prompt_ids = [], []
+        for seq, prompt_id in zip(self.seqs, self.prompt_ids):
+            record = records.get(prompt_id)
+            if record is not None and record["seq"] == seq:
+                seqs.append(seq)
+                prompt_ids.append(prompt_id)
+        self.seqs, self.prompt_ids = seqs, prompt_ids
+        self.live = len(seqs)
+
+
+class TaskLifecycle:
+    """每个prompt的生命周期记录(排队、开始、结束)，按最近更新排序，超出 capacity 时淘汰最旧的记录
+
+    observe_* 只在状态真正变化时返回更新后的记录，重复观察同一状态只做一次字典查找。
+    返回的记录会被后续更新原地修改，需要保存快照的使用方应自行复制。
+    每次更新分配递增的 seq，version 为最新的 seq；按 status、client_id 维护二级索引供分页查询。
+    """
+
+    def __init__(self, capacity=10000, clock=time.time):
+        self.capacity = max(1, int(capacity))
+        self._clock = clock
+        self.records = OrderedDict()
+        self.version = 0
+        self._all = _SeqIndex(self.records)
+        self._by_status = {}
+        self._by_client = {}
+        # prompt_id -> 建立索引时的 (status, client_id)，记录被原地修改后仍能找到旧索引
+        self._indexed = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, prompt_id):
+        return self.records.get(prompt_id)
+
+    def page(self, status=None, client_id=None, since=None, limit=50, cursor=None):
+        """按更新先后倒序分页，返回 (记录列表, 下一页cursor或None)
+
+        cursor 为上一页最后一条记录的 seq；since 为更新时间下限(Unix时间戳)。
+        """
+        if client_id is not None:
+            index = self._by_client.get(client_id)
+        elif status is not None:
+            index = self._by_status.get(status)
+        else:
+            index = self._all
+        if index is None:
+            return [], None
+        limit = max(1, int(limit))
+        items = []
+        for record in index.before(cursor):
+            if since is not None and record["updated_at"] < since:
+                break
+            if status is not None and record["status"] != status:
+                continue
+            if len(items) == limit:
+                return items, items[-1]["seq"]
+            items.append(record)
+        return items, None
+
+    def observe_queued(self, prompt_id, client_id=None, number=None):
+        if prompt_id in self.records:
+            return None
+        now = self._clock()
+        record = dict.fromkeys(RECORD_FIELDS)
+        record.update(prompt_id=prompt_id, client_id=client_id, number=number,
+                      status="waiting", queued_at=now, updated_at=now)
+        return self._store(record)
+
+    def observe_started(self, prompt_id, client_id=None, number=None, started_at=None):
+        record = self.records.get(prompt_id)
+        if record is not None and record["status"] != "waiting":
+            return None
+        if record is None:
+            record = self.observe_queued(prompt_id, client_id, number)
+        record["status"] = "running"
+        record["started_at"] = started_at or self._clock()
+        record["updated_at"] = self._clock()
+        return self._store(record)
+
+    def observe_finished(self, prompt_id, status, finished_at=None, started_at=None, duration=None,
+                         error=None, outputs=None, client_id=None, number=None):
+        record = self.records.get(prompt_id)
+        if record is None:
+            record = self.observe_queued(prompt_id, client_id, number)
+        if record["status"] == status and record["finished_at"] is not None:
+            return None
+        record["status"] = status
+        if client_id is not None and record["client_id"] is None:
+            record["client_id"] = client_id
+        if started_at is not None:
+            record["started_at"] = started_at
+        record["finished_at"] = finished_at or self._clock()
+        if duration is None and record["started_at"] is not None:
+            duration = max(0.0, record["finished_at"] - record["started_at"])
+        record["duration"] = duration
+        record["error"] = error
+        record["outputs"] = outputs
+        record["updated_at"] = self._clock()
+        return self._store(record)
+
+    def active_ids(self) -> list:
+        """状态为 waiting/running 的 prompt_id"""
+        prompt_ids = []
+        for status in ACTIVE_STATUSES:
+            bucket = self._by_status.get(status)
+            if bucket is not None:
+                prompt_ids.extend(record["prompt_id"] for record in bucket.before())
+        return prompt_ids
+
+    def observe_removed(self, prompt_id):
+        """等待或运行中的prompt没有历史记录就离开了队列，标记为 removed"""
+        record = self.records.get(prompt_id)
+        if record is None or record["status"] not in ACTIVE_STATUSES:
+            return None
+        now = self._clock()
+        record["status"] = STATUS_REMOVED
+        record["finished_at"] = now
+        record["updated_at"] = now
+        return self._store(record)
+
+    def _store(self, record):
+        prompt_id = record["prompt_id"]
+        self._unindex(prompt_id)
+        self.version += 1
+        record["seq"] = self.version
+        self.records[prompt_id] = record
+        self.records.move_to_end(prompt_id)
+        self._index(record)
+        while len(self.records) > self.capacity:
+            evicted_id, _ = self.records.popitem(last=False)
+            self._unindex(evicted_id)
+        return record
+
+    def _index(self, record):
+        prompt_id, seq = record["prompt_id"], record["seq"]
+        self._all.append(seq, prompt_id)
+        self._bucket(self._by_status, record["status"]).append(seq, prompt_id)
+        if record["client_id"] is not None:
+            self._bucket(self._by_client, record["client_id"]).append(seq, prompt_id)
+        self._indexed[prompt_id] = (record["status"], record["client_id"])
+
+    def _bucket(self, index, key):
+        bucket = index.get(key)
+        if bucket is None:
+            bucket = index[key] = _SeqIndex(self.records)
+        return bucket
+
+    def _unindex(self, prompt_id):
+        keys = self._indexed.pop(prompt_id, None)
+        if keys is None:
+            return
+        self._all.discard()
+        for index, key in ((self._by_status, keys[0]), (self._by_client, keys[1])):
+            bucket = index.get(key)
+            if bucket is None:
+                continue
+            bucket.discard()
+            if not bucket.live:
+                del index[key]
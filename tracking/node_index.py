@@ -0,0 +1,71 @@
+import logging
+
+logger = logging.getLogger("KY_monitor_node_index")
+
+
+class WorkflowNodeIndex:
+    """工作流节点索引: str(node_id) -> (执行序号(从1开始), 节点类型)"""
+
+    __slots__ = ("total", "nodes")
+
+    def __init__(self, nodes=None):
+        self.nodes = nodes or {}
+        self.total = len(self.nodes)
+
+    @classmethod
+    def from_extra_data(cls, prompt_id, extra_data) -> "WorkflowNodeIndex":
+        """从 extra_data.extra_pnginfo.workflow.nodes 构建索引，按 order 排序"""
+        workflow_nodes = None
+        if isinstance(extra_data, dict):
+            extra_pnginfo = extra_data.get("extra_pnginfo")
+            if isinstance(extra_pnginfo, dict):
+                workflow = extra_pnginfo.get("workflow")
+                if isinstance(workflow, dict):
+                    workflow_nodes = workflow.get("nodes")
+        if not isinstance(workflow_nodes, list):
+            return cls()
+
+        valid_nodes_for_ordering = []
+        for node_data in workflow_nodes:
+            if isinstance(node_data, dict) and "order" in node_data and "id" in node_data:
+                valid_nodes_for_ordering.append(node_data)
+            else:
+                logger.debug(f"节点数据缺少'order'或'id', prompt {prompt_id}: {node_data}")
+
+        valid_nodes_for_ordering.sort(key=lambda n: n["order"])
+        nodes = {}
+        for i, node in enumerate(valid_nodes_for_ordering):
+            nodes.setdefault(str(node["id"]), (i + 1, node.get("type", "Unknown")))
+        index = cls(nodes)
+        index.total = len(valid_nodes_for_ordering)
+        return index
+
+    def lookup(self, node_id):
+        """返回 (执行序号, 节点类型)，未找到返回None"""
+        if node_id is None:
+            return None
+        return self.nodes.get(str(node_id))
+
+
+class NodeIndexCache:
+    """按 prompt_id 缓存工作流节点索引，prompt开始时构建一次，结束后淘汰"""
+
+    def __init__(self):
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def get(self, prompt_id, extra_data) -> WorkflowNodeIndex:
+        index = self._indexes.get(prompt_id)
+        if index is None:
+            index = self._indexes[prompt_id] = WorkflowNodeIndex.from_extra_data(prompt_id, extra_data)
+        return index
+
+    def evict(self, prompt_id):
+        self._indexes.pop(prompt_id, None)
+
+    def retain(self, prompt_ids):
+        """淘汰不在 prompt_ids 中的索引"""
+        for prompt_id in [pid for pid in self._indexes if pid not in prompt_ids]:
+            del self._indexes[prompt_id]
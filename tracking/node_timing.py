@@ -0,0 +1,168 @@
+import time
+import logging
+from collections import OrderedDict
+
+from ..metrics.sketch import QuantileSketch
+
+logger = logging.getLogger("KY_monitor_node_timing")
+
+
+class _PromptTiming:
+    __slots__ = ("graph", "started", "node_id", "node_started", "nodes", "cached")
+
+    def __init__(self, graph, started):
+        self.graph = graph
+        self.started = started
+        self.node_id = None
+        self.node_started = None
+        self.nodes = []
+        self.cached = set()
+
+
+class NodeTimer:
+    """根据 executing 事件记录每个prompt中各节点的耗时，并按节点类型累计跨运行的耗时分布
+
+    节点耗时为收到该节点的 executing 到下一个节点 executing(或 execution_success)之间的时间。
+    出错/中断时正在执行的节点没有完成，不计入统计。
+    resolve_graph(prompt_id) 返回prompt图({node_id: {"class_type": ...}})，用于确定节点类型。
+    """
+
+    def __init__(self, resolve_graph=None, max_finished=256, relative_accuracy=0.01, clock=time.monotonic):
+        self.resolve_graph = resolve_graph
+        self.relative_accuracy = relative_accuracy
+        self._clock = clock
+        self._max_finished = max(1, int(max_finished))
+        self._running = {}
+        self._finished = OrderedDict()
+        self.by_type = {}
+
+    def apply(self, event: str, data, timestamp=None) -> None:
+        if not isinstance(data, dict):
+            return
+        prompt_id = data.get("prompt_id")
+        if prompt_id is None:
+            return
+        now = self._clock() if timestamp is None else timestamp
+
+        if event == "execution_start":
+            self._finished.pop(prompt_id, None)
+            self._running[prompt_id] = _PromptTiming(self._resolve(prompt_id), now)
+            while len(self._running) > self._max_finished:
+                self._running.pop(next(iter(self._running)))
+        elif prompt_id in self._finished:
+            # 结束之后的 executing(node=None) 等事件
+            return
+        elif event == "execution_cached":
+            # 命中缓存的节点不会执行
+            self._timing(prompt_id, now).cached.update(str(node_id) for node_id in data.get("nodes") or ())
+        elif event == "executing":
+            timing = self._timing(prompt_id, now)
+            node_id = data.get("node")
+            if node_id is None:
+                # 旧版ComfyUI以 node=None 表示执行结束
+                self._finish(prompt_id, now, completed=True)
+            elif node_id != timing.node_id:
+                self._close_node(timing, now)
+                timing.node_id = node_id
+                timing.node_started = now
+        elif event == "execution_success":
+            self._finish(prompt_id, now, completed=True)
+        elif event in ("execution_error", "execution_interrupted"):
+            self._finish(prompt_id, now, completed=False)
+
+    def pop_finished(self, prompt_id):
+        """取出已结束prompt的节点耗时列表，未记录时返回None"""
+        return self._finished.pop(prompt_id, None)
+
+    def current(self, prompt_id):
+        """运行中prompt的节点图、已完成节点耗时、命中缓存的节点以及当前节点的已执行时间"""
+        timing = self._running.get(prompt_id)
+        if timing is None:
+            return None
+        now = self._clock()
+        node_elapsed = None
+        if timing.node_started is not None:
+            node_elapsed = now - timing.node_started
+        return {
+            "graph": timing.graph,
+            "elapsed": now - timing.started,
+            "nodes": list(timing.nodes),
+            "cached": timing.cached,
+            "node_id": timing.node_id,
+            "node_elapsed": node_elapsed,
+        }
+
+    def node_type(self, prompt_id, node_id):
+        timing = self._running.get(prompt_id)
+        return self._node_type(timing.graph if timing else None, node_id)
+
+    def expected_seconds(self, node_type, default=None):
+        """某节点类型的平均耗时，没有记录时返回 default"""
+        sketch = self.by_type.get(node_type)
+        if sketch is not None and sketch.count:
+            return sketch.sum / sketch.count
+        return default
+
+    def mean_seconds(self, default=None):
+        """所有节点类型的平均耗时，没有记录时返回 default"""
+        total = count = 0
+        for sketch in self.by_type.values():
+            total += sketch.sum
+            count += sketch.count
+        return total / count if count else default
+
+    def type_stats(self, node_type):
+        """某节点类型的耗时草图，没有记录时返回None"""
+        return self.by_type.get(node_type)
+
+    def stats(self) -> dict:
+        """按累计耗时从高到低排列的节点类型统计"""
+        ordered = sorted(self.by_type.items(), key=lambda item: item[1].sum, reverse=True)
+        return {node_type: sketch.snapshot() for node_type, sketch in ordered}
+
+    def _timing(self, prompt_id, now) -> _PromptTiming:
+        timing = self._running.get(prompt_id)
+        if timing is None:
+            # 监控启动前已经开始执行的prompt
+            timing = self._running[prompt_id] = _PromptTiming(self._resolve(prompt_id), now)
+        return timing
+
+    def _resolve(self, prompt_id):
+        if self.resolve_graph is None:
+            return None
+        try:
+            return self.resolve_graph(prompt_id)
+        except Exception as e:
+            logger.debug(f"获取prompt {prompt_id} 的节点图失败: {e}")
+            return None
+
+    @staticmethod
+    def _node_type(graph, node_id):
+        if isinstance(graph, dict):
+            node = graph.get(str(node_id))
+            if isinstance(node, dict) and node.get("class_type"):
+                return node["class_type"]
+        return "Unknown"
+
+    def _close_node(self, timing, now):
+        if timing.node_id is None or timing.node_started is None:
+            return
+        seconds = max(0.0, now - timing.node_started)
+        node_type = self._node_type(timing.graph, timing.node_id)
+        timing.nodes.append({"node_id": timing.node_id, "node_type": node_type, "seconds": seconds})
+        sketch = self.by_type.get(node_type)
+        if sketch is None:
+            sketch = self.by_type[node_type] = QuantileSketch(self.relative_accuracy)
+        sketch.add(seconds)
+        timing.node_id = None
+        timing.node_started = None
+
+    def _finish(self, prompt_id, now, completed):
+        timing = self._running.pop(prompt_id, None)
+        if timing is None:
+            return
+        if completed:
+            self._close_node(timing, now)
+        self._finished[prompt_id] = timing.nodes
+        while len(self._finished) > self._max_finished:
+            self._finished.popitem(last=False)
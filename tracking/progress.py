@@ -0,0 +1,102 @@
+import time
+import logging
+
+logger = logging.getLogger("KY_monitor_progress")
+
+# 没有任何历史耗时时每个节点的预估耗时(秒)，此时进度退化为按节点数计算
+DEFAULT_NODE_SECONDS = 1.0
+
+
+def upstream_nodes(graph, outputs) -> set:
+    """输出节点及其所有上游节点的ID集合；输入值为 [node_id, output_index] 时视为连线"""
+    pending = [str(node_id) for node_id in outputs]
+    reached = set()
+    while pending:
+        node_id = pending.pop()
+        if node_id in reached or node_id not in graph:
+            continue
+        reached.add(node_id)
+        node = graph[node_id]
+        inputs = node.get("inputs") if isinstance(node, dict) else None
+        if not isinstance(inputs, dict):
+            continue
+        for value in inputs.values():
+            if isinstance(value, list) and len(value) == 2 and isinstance(value[0], (str, int)):
+                pending.append(str(value[0]))
+    return reached
+
+
+class ProgressEstimator:
+    """按耗时加权的进度与剩余时间估算
+
+    已完成节点按实际耗时计入；当前节点有 progress(value/max) 时按步数外推总耗时，
+    否则使用该节点类型的历史平均耗时；尚未执行的节点(排除命中缓存的节点以及不在任何输出节点上游的节点，
+    这些节点不会被执行)使用历史平均耗时，未见过的类型使用所有类型的平均值。
+    同一prompt的百分比不回退，结束前最高为99。
+    """
+
+    def __init__(self, node_timer, default_node_seconds=DEFAULT_NODE_SECONDS, clock=time.time):
+        self.node_timer = node_timer
+        self.default_node_seconds = default_node_seconds
+        self._clock = clock
+        self._last_percentage = {}
+        # prompt_id -> 输出节点上游的节点ID集合，同一prompt的图和输出节点不变，只计算一次
+        self._executed_nodes = {}
+
+    def estimate(self, prompt_id, progress_value=None, progress_max=None, outputs=None):
+        """返回 {percentage, elapsed_seconds, eta_seconds, estimated_finish_at}，没有该prompt的节点记录时返回None
+
+        outputs 为队列条目中的待执行输出节点(第5项)，未提供时按图中所有节点估算。
+        """
+        current = self.node_timer.current(prompt_id)
+        if current is None:
+            return None
+
+        graph = current["graph"] if isinstance(current["graph"], dict) else {}
+        executed = self._executed_nodes.get(prompt_id)
+        if executed is None and outputs and graph:
+            executed = self._executed_nodes[prompt_id] = upstream_nodes(graph, outputs)
+        fallback = self.node_timer.mean_seconds(self.default_node_seconds)
+        expected = self.node_timer.expected_seconds
+
+        done = sum(node["seconds"] for node in current["nodes"])
+        finished_ids = {str(node["node_id"]) for node in current["nodes"]}
+        remaining = 0.0
+
+        node_id = current["node_id"]
+        if node_id is not None:
+            node_elapsed = current["node_elapsed"] or 0.0
+            done += node_elapsed
+            node_expected = expected(self.node_timer.node_type(prompt_id, node_id), fallback)
+            if progress_max and progress_value and 0 < progress_value <= progress_max:
+                # 步数进度外推当前节点总耗时
+                node_expected = node_elapsed * progress_max / progress_value
+            remaining += max(0.0, node_expected - node_elapsed)
+            finished_ids.add(str(node_id))
+
+        cached = current["cached"]
+        for pending_id, node in graph.items():
+            if pending_id in finished_ids or pending_id in cached:
+                continue
+            if executed is not None and pending_id not in executed:
+                continue
+            node_type = node.get("class_type") if isinstance(node, dict) else None
+            remaining += expected(node_type, fallback)
+
+        total = done + remaining
+        percentage = done * 100 / total if total > 0 else 0.0
+        percentage = min(99.0, max(percentage, self._last_percentage.get(prompt_id, 0.0)))
+        self._last_percentage[prompt_id] = percentage
+        return {
+            "percentage": round(percentage, 2),
+            "elapsed_seconds": round(current["elapsed"], 3),
+            "eta_seconds": round(remaining, 3),
+            "estimated_finish_at": round(self._clock() + remaining, 3),
+        }
+
+    def retain(self, prompt_ids):
+        """淘汰不在 prompt_ids 中的prompt"""
+        for prompt_id in [pid for pid in self._last_percentage if pid not in prompt_ids]:
+            del self._last_percentage[prompt_id]
+        for prompt_id in [pid for pid in self._executed_nodes if pid not in prompt_ids]:
+            del self._executed_nodes[prompt_id]
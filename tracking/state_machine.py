@@ -0,0 +1,130 @@
+import time
+import logging
+
+logger = logging.getLogger("KY_monitor_state")
+
+# 任务状态
+STATUS_RUNNING = "running"
+STATUS_SUCCESS = "success"
+STATUS_ERROR = "error"
+STATUS_INTERRUPTED = "interrupted"
+
+FINAL_STATUSES = (STATUS_SUCCESS, STATUS_ERROR, STATUS_INTERRUPTED)
+
+
+class TaskState:
+    """单个prompt的内存状态"""
+
+    __slots__ = ("prompt_id", "status", "node_id", "progress_value", "progress_max",
+                 "started_at", "finished_at", "updated_at")
+
+    def __init__(self, prompt_id):
+        self.prompt_id = prompt_id
+        self.status = STATUS_RUNNING
+        self.node_id = None
+        self.progress_value = None
+        self.progress_max = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.updated_at = self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "prompt_id": self.prompt_id,
+            "status": self.status,
+            "node_id": self.node_id,
+            "progress_value": self.progress_value,
+            "progress_max": self.progress_max,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class TaskStateMachine:
+    """根据PromptServer事件维护任务状态，apply()返回状态是否真正发生变化"""
+
+    def __init__(self, max_finished=256):
+        self.tasks = {}
+        self.queue_remaining = None
+        self._max_finished = max_finished
+
+    def apply(self, event: str, data) -> bool:
+        if not isinstance(data, dict):
+            return False
+
+        if event == "status":
+            exec_info = (data.get("status") or {}).get("exec_info") or {}
+            queue_remaining = exec_info.get("queue_remaining")
+            if queue_remaining == self.queue_remaining:
+                return False
+            self.queue_remaining = queue_remaining
+            return True
+
+        prompt_id = data.get("prompt_id")
+        if prompt_id is None:
+            return False
+
+        task = self.tasks.get(prompt_id)
+        if event == "execution_start":
+            if task is not None and task.status == STATUS_RUNNING:
+                return False
+            self.tasks[prompt_id] = TaskState(prompt_id)
+            self._trim_finished()
+            return True
+
+        if task is None:
+            # 监控启动前已经开始执行的prompt
+            task = self.tasks[prompt_id] = TaskState(prompt_id)
+        elif task.status in FINAL_STATUSES:
+            return False
+
+        if event == "executing":
+            node_id = data.get("node")
+            if node_id is None:
+                # 旧版ComfyUI以 node=None 表示执行结束
+                return self._finish(task, STATUS_SUCCESS)
+            if node_id == task.node_id:
+                return False
+            task.node_id = node_id
+            task.progress_value = None
+            task.progress_max = None
+        elif event == "progress":
+            value, max_value = data.get("value"), data.get("max")
+            if value == task.progress_value and max_value == task.progress_max:
+                return False
+            task.progress_value = value
+            task.progress_max = max_value
+            if data.get("node") is not None:
+                task.node_id = data.get("node")
+        elif event == "executed":
+            # 节点完成本身不改变任务状态，下一次executing会推进node_id
+            return False
+        elif event == "execution_success":
+            return self._finish(task, STATUS_SUCCESS)
+        elif event == "execution_error":
+            return self._finish(task, STATUS_ERROR)
+        elif event == "execution_interrupted":
+            return self._finish(task, STATUS_INTERRUPTED)
+        else:
+            return False
+
+        task.updated_at = time.time()
+        return True
+
+    def running(self) -> list:
+        return [t for t in self.tasks.values() if t.status == STATUS_RUNNING]
+
+    def get(self, prompt_id):
+        return self.tasks.get(prompt_id)
+
+    def _finish(self, task, status) -> bool:
+        if task.status == status:
+            return False
+        task.status = status
+        task.finished_at = task.updated_at = time.time()
+        return True
+
+    def _trim_finished(self):
+        finished = [pid for pid, t in self.tasks.items() if t.status in FINAL_STATUSES]
+        for prompt_id in finished[:max(0, len(finished) - self._max_finished)]:
+            del self.tasks[prompt_id]
@@ -0,0 +1,306 @@
+import json
+import bisect
+import hashlib
+import logging
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from ..metrics.sketch import QuantileSketch
+
+logger = logging.getLogger("KY_monitor_wait_prediction")
+
+# 影响执行耗时的标量输入，参与工作流指纹计算
+KEY_INPUTS = frozenset({
+    "steps", "width", "height", "batch_size", "length", "frames", "num_frames", "video_frames",
+    "denoise", "upscale_by", "scale_by", "megapixels",
+})
+
+
+def workflow_fingerprint(prompt_graph):
+    """由节点类型与关键参数计算稳定的工作流指纹，与节点id、种子和提示词无关"""
+    if not isinstance(prompt_graph, dict):
+        return None
+    nodes = []
+    for node in prompt_graph.values():
+        if not isinstance(node, dict):
+            continue
+        inputs = node.get("inputs") if isinstance(node.get("inputs"), dict) else {}
+        params = sorted(
+            (key, value) for key, value in inputs.items()
+            if key in KEY_INPUTS and isinstance(value, (int, float, str)) and not isinstance(value, bool)
+        )
+        nodes.append([str(node.get("class_type")), params])
+    nodes.sort(key=lambda item: json.dumps(item, sort_keys=True))
+    digest = hashlib.blake2b(json.dumps(nodes, sort_keys=True).encode("utf-8"), digest_size=8)
+    return digest.hexdigest()
+
+
+class _QueueOffsets(Mapping):
+    """predict() 的结果: prompt_id -> (开始偏移, 完成偏移)，按需从预测器的前缀和中读取"""
+
+    def __init__(self, predictor):
+        self._predictor = predictor
+
+    def __getitem__(self, prompt_id):
+        offsets = self._predictor.offsets(prompt_id)
+        if offsets is None:
+            raise KeyError(prompt_id)
+        return offsets
+
+    def get(self, prompt_id, default=None):
+        offsets = self._predictor.offsets(prompt_id)
+        return default if offsets is None else offsets
+
+    def __contains__(self, prompt_id):
+        return self._predictor.offsets(prompt_id) is not None
+
+    def __iter__(self):
+        predictor = self._predictor
+        for prompt_id in predictor._queue[predictor._head:]:
+            if predictor.offsets(prompt_id) is None:
+                # 之后的prompt都无法估计
+                return
+            yield prompt_id
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class WaitTimePredictor:
+    """按工作流指纹学习执行耗时分布，预测等待中prompt的开始/完成时间
+
+    等待队列按提交顺序保存为列表，并维护各位置完成时间的前缀和: 队首prompt开始运行只移动队首指针，
+    新提交的prompt追加在队尾，只有插队、中间删除或某个位置的预估耗时变化时才从该位置起重新累加，
+    且只在读取偏移时按需累加。每个prompt的指纹只在第一次出现时计算；记录新的耗时后只让同一指纹
+    以及使用回退估计的prompt重新估算。
+    未见过的指纹使用 node_timer 中节点类型平均耗时之和，仍无法估计时使用所有指纹的平均耗时。
+    """
+
+    # 队首指针超过该值且超过队列一半时压缩列表
+    COMPACT_THRESHOLD = 1024
+
+    def __init__(self, node_timer=None, capacity=1024, relative_accuracy=0.01):
+        self.node_timer = node_timer
+        self.capacity = max(1, int(capacity))
+        self.relative_accuracy = relative_accuracy
+        self.by_fingerprint = OrderedDict()
+        # prompt_id -> [指纹, 预估耗时, 预估是否有效, prompt图, 队列编号]
+        self._prompts = {}
+        self._by_fingerprint_prompts = {}
+        # 预估耗时来自回退估计(没有该指纹的记录)的prompt
+        self._fallback = set()
+        # 有缓存但不在等待队列中的prompt(运行中等)，由 retain() 淘汰
+        self._detached = set()
+        self._total_seconds = 0.0
+        self._total_count = 0
+        # 等待队列: _queue[_head:] 按编号排序，_finish[i] 为第i个prompt完成时的累计耗时，
+        # 只有 i < _valid 的位置有效；_origin 为队首之前的累计耗时
+        self._queue = []
+        self._numbers = []
+        self._finish = []
+        self._position = {}
+        self._head = 0
+        self._valid = 0
+        self._origin = 0.0
+        self._offsets = _QueueOffsets(self)
+
+    def fingerprint(self, prompt_id, prompt_graph):
+        return self._entry(prompt_id, prompt_graph)[0]
+
+    def _entry(self, prompt_id, prompt_graph):
+        entry = self._prompts.get(prompt_id)
+        if entry is None:
+            fingerprint = workflow_fingerprint(prompt_graph)
+            entry = self._prompts[prompt_id] = [fingerprint, None, False, prompt_graph, None]
+            self._by_fingerprint_prompts.setdefault(fingerprint, set()).add(prompt_id)
+            if prompt_id not in self._position:
+                self._detached.add(prompt_id)
+        return entry
+
+    def _drop(self, prompt_id):
+        entry = self._prompts.pop(prompt_id, None)
+        if entry is None:
+            return
+        prompt_ids = self._by_fingerprint_prompts.get(entry[0])
+        if prompt_ids is not None:
+            prompt_ids.discard(prompt_id)
+            if not prompt_ids:
+                del self._by_fingerprint_prompts[entry[0]]
+        self._fallback.discard(prompt_id)
+        self._detached.discard(prompt_id)
+
+    def observe(self, prompt_id, prompt_graph, seconds):
+        """记录一次成功执行的耗时"""
+        if seconds is None or seconds < 0:
+            return
+        entry = self._prompts.get(prompt_id)
+        fingerprint = entry[0] if entry is not None else workflow_fingerprint(prompt_graph)
+        if prompt_id not in self._position:
+            self._drop(prompt_id)
+        if fingerprint is None:
+            return
+        sketch = self.by_fingerprint.get(fingerprint)
+        if sketch is None:
+            sketch = self.by_fingerprint[fingerprint] = QuantileSketch(self.relative_accuracy)
+            while len(self.by_fingerprint) > self.capacity:
+                self.by_fingerprint.popitem(last=False)
+        else:
+            self.by_fingerprint.move_to_end(fingerprint)
+        sketch.add(seconds)
+        self._total_seconds += seconds
+        self._total_count += 1
+        self._invalidate_prompts(self._by_fingerprint_prompts.get(fingerprint, set()) | self._fallback)
+
+    def _invalidate_prompts(self, prompt_ids):
+        first = None
+        for prompt_id in prompt_ids:
+            self._prompts[prompt_id][2] = False
+            position = self._position.get(prompt_id)
+            if position is not None and (first is None or position < first):
+                first = position
+        if first is not None:
+            self._invalidate_from(first)
+
+    def expected_seconds(self, prompt_id, prompt_graph):
+        """单个prompt的预估执行耗时(秒)，无法估计时返回None"""
+        entry = self._entry(prompt_id, prompt_graph)
+        if not entry[2]:
+            entry[1], fallback = self._estimate(entry[0], prompt_graph)
+            entry[2] = True
+            if fallback:
+                self._fallback.add(prompt_id)
+            else:
+                self._fallback.discard(prompt_id)
+        return entry[1]
+
+    def _estimate(self, fingerprint, prompt_graph):
+        """返回 (预估耗时, 是否为回退估计)"""
+        sketch = self.by_fingerprint.get(fingerprint)
+        if sketch is not None and sketch.count:
+            return sketch.sum / sketch.count, False
+        if self.node_timer is not None and self.node_timer.by_type and isinstance(prompt_graph, dict):
+            fallback = self.node_timer.mean_seconds()
+            return sum(
+                self.node_timer.expected_seconds(node.get("class_type"), fallback)
+                for node in prompt_graph.values() if isinstance(node, dict)
+            ), True
+        if self._total_count:
+            return self._total_seconds / self._total_count, True
+        return None, True
+
+    def predict(self, pending_items):
+        """返回 {prompt_id: (开始偏移, 完成偏移)}，偏移相对于当前运行prompt结束的时间(秒)
+
+        pending_items 为等待队列条目 (number, prompt_id, prompt, extra_data, outputs)，顺序不限。
+        返回的映射按需计算，读取时反映最近一次 predict() 的队列。
+        """
+        items = {item[1]: item for item in pending_items}
+        removed = self._position.keys() - items.keys()
+        added = items.keys() - self._position.keys()
+        if removed:
+            self._remove(removed)
+        if added:
+            self._add(sorted((items[prompt_id] for prompt_id in added), key=lambda item: item[0]))
+        return self._offsets
+
+    def offsets(self, prompt_id):
+        """等待中prompt的 (开始偏移, 完成偏移)，不在队列中或无法估计时返回None"""
+        position = self._position.get(prompt_id)
+        if position is None:
+            return None
+        self._accumulate(position)
+        finish = self._finish[position]
+        if finish is None:
+            return None
+        start = self._finish[position - 1] if position > self._head else self._origin
+        return start - self._origin, finish - self._origin
+
+    def _accumulate(self, position):
+        """把前缀和累加到 position(含)"""
+        index = self._valid
+        if index > position:
+            return
+        total = self._finish[index - 1] if index > self._head else self._origin
+        while index <= position:
+            if total is not None:
+                prompt_id = self._queue[index]
+                expected = self.expected_seconds(prompt_id, self._prompts[prompt_id][3])
+                # 无法估计时之后的prompt都无法估计
+                total = None if expected is None else total + expected
+            self._finish[index] = total
+            index += 1
+        self._valid = index
+
+    def _invalidate_from(self, position):
+        self._valid = max(self._head, min(self._valid, position))
+
+    def _remove(self, removed):
+        positions = sorted(self._position[prompt_id] for prompt_id in removed)
+        for prompt_id in removed:
+            del self._position[prompt_id]
+            if prompt_id in self._prompts:
+                self._detached.add(prompt_id)
+        if positions[-1] - positions[0] + 1 == len(positions) and positions[0] == self._head:
+            # 队首的prompt开始运行: 只移动队首指针
+            new_head = positions[-1] + 1
+            if self._valid >= new_head:
+                self._origin = self._finish[new_head - 1]
+            else:
+                self._origin = 0.0
+            self._head = new_head
+            self._valid = max(self._valid, new_head)
+            if self._origin is None:
+                # 被移除的prompt无法估计，之后的偏移需要重新累加
+                self._origin = 0.0
+                self._valid = new_head
+            self._compact()
+            return
+        first = positions[0]
+        tail = [prompt_id for prompt_id in self._queue[first:] if prompt_id in self._position]
+        self._replace_tail(first, tail)
+
+    def _add(self, items):
+        for item in items:
+            entry = self._entry(item[1], item[2] if len(item) > 2 else None)
+            entry[4] = item[0]
+            self._detached.discard(item[1])
+        if self._head == len(self._queue) or items[0][0] > self._numbers[-1]:
+            # 新提交的prompt追加在队尾
+            for item in items:
+                self._position[item[1]] = len(self._queue)
+                self._queue.append(item[1])
+                self._numbers.append(item[0])
+                self._finish.append(None)
+            return
+        # 插队(编号小于队尾)，从插入位置起重建
+        first = max(self._head, bisect.bisect_right(self._numbers, items[0][0], self._head))
+        tail = self._queue[first:] + [item[1] for item in items]
+        tail.sort(key=lambda prompt_id: self._prompts[prompt_id][4])
+        self._replace_tail(first, tail)
+
+    def _replace_tail(self, first, tail):
+        del self._queue[first:], self._numbers[first:], self._finish[first:]
+        for prompt_id in tail:
+            self._position[prompt_id] = len(self._queue)
+            self._queue.append(prompt_id)
+            self._numbers.append(self._prompts[prompt_id][4])
+            self._finish.append(None)
+        self._invalidate_from(first)
+
+    def _compact(self):
+        head = self._head
+        if head < self.COMPACT_THRESHOLD or head * 2 < len(self._queue):
+            return
+        del self._queue[:head], self._numbers[:head], self._finish[:head]
+        for index, prompt_id in enumerate(self._queue):
+            self._position[prompt_id] = index
+        self._valid -= head
+        self._head = 0
+
+    def retain(self, prompt_ids):
+        """淘汰既不在等待队列中、也不在 prompt_ids(运行中的prompt)中的缓存"""
+        for prompt_id in [pid for pid in self._detached if pid not in prompt_ids]:
+            self._drop(prompt_id)
+
+    def stats(self) -> dict:
+        return {fingerprint: sketch.snapshot() for fingerprint, sketch in self.by_fingerprint.items()}